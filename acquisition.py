@@ -0,0 +1,196 @@
+"""
+Catalog-wide cheapest-acquisition table.
+
+For every item and price mode, the table holds the cheapest way to get one
++0 item and where it comes from:
+
+  market  the buy price for the mode (see EnhancementCalculator._get_buy_price)
+  craft   the item's recipe, every input and the upgrade item acquired at
+          their own cheapest price (artisan tea reduces input counts)
+  vendor  the item's vendor price, only when it can neither be bought nor
+          crafted (trainee charms are always TRAINEE_CHARM_PRICE)
+  fixed   coins (1 each)
+
+Craft is cheaper than market only when strictly cheaper. A recipe with an
+input that has no price at all cannot be crafted. Only equipment (and the
+philosopher's mirror) is crafted, as before.
+
+The whole table comes from one pass over the craftable items in
+topological order (inputs before the items made from them). So every
+recipe sees its inputs' final cheapest prices, with no recursion and no
+depth cap. Recipes caught in a cycle, which the game data does not have,
+are priced last from market/vendor prices for the items they wait on.
+
+Tables depend on the market, the game data and the artisan tea multiplier.
+They are memoized on the MarketSnapshot (see
+EnhancementCalculator.get_acquisition_table) and written into prices.js by
+generate_prices.py.
+"""
+
+import numpy as np
+
+# Source codes stored in the table, indexed by code
+SOURCES = ('none', 'market', 'craft', 'vendor', 'fixed')
+NONE, MARKET, CRAFT, VENDOR, FIXED = range(len(SOURCES))
+
+# Enhancelator hardcodes trainee charms at this vendor price
+TRAINEE_CHARM_PRICE = 250000
+
+
+class AcquisitionTable:
+    """Cheapest +0 acquisition of every item under every price mode.
+
+    price, source and craft are (modes, items) arrays: the cheapest price,
+    its SOURCES code and the crafting cost (0 where the item cannot be
+    crafted). Items without game data are unknown and read as unpriced.
+    """
+    __slots__ = ('modes', 'artisan_mult', 'hrids', 'ids', 'price', 'source', 'craft')
+
+    def __init__(self, modes, artisan_mult, hrids, price, source, craft):
+        self.modes = {mode: m for m, mode in enumerate(modes)}
+        self.artisan_mult = artisan_mult
+        self.hrids = hrids
+        self.ids = {hrid: i for i, hrid in enumerate(hrids)}
+        self.price = price
+        self.source = source
+        self.craft = craft
+
+    def lookup(self, hrid, mode):
+        """Get (price, source) for one item, (0, 'none') when it has no price."""
+        i = self.ids.get(hrid)
+        if i is None:
+            return 0, 'none'
+        m = self.modes[mode]
+        source = SOURCES[self.source[m, i]]
+        return self.price[m, i].item() if source != 'none' else 0, source
+
+    def craft_cost(self, hrid, mode):
+        """Get the crafting cost of one item, 0 when it cannot be crafted."""
+        i = self.ids.get(hrid)
+        if i is None:
+            return 0
+        return self.craft[self.modes[mode], i].item()
+
+    def to_json(self, modes=None):
+        """Get the prices.js shape.
+
+        {artisan, modes: {mode: {hrid: [price, source, craft_cost]}}}, with
+        only the items that have a price or a crafting cost, for modes
+        (default every mode in the table).
+        """
+        rows_by_mode = {}
+        for mode in (self.modes if modes is None else modes):
+            m = self.modes[mode]
+            rows = {}
+            for i in np.flatnonzero((self.source[m] != NONE) | (self.craft[m] > 0)).tolist():
+                rows[self.hrids[i]] = [
+                    _compact(self.price[m, i].item()), SOURCES[self.source[m, i]], _compact(self.craft[m, i].item()),
+                ]
+            rows_by_mode[mode.value] = rows
+        return {'artisan': self.artisan_mult, 'modes': rows_by_mode}
+
+
+def _compact(value):
+    """Write whole-coin floats as ints in JSON."""
+    return int(value) if value == int(value) else round(value, 4)
+
+
+def craft_order(calc):
+    """Get the craftable items with inputs before the items made from them.
+
+    Returns (order, recipes) where recipes maps each craftable hrid to its
+    input (hrid, count) pairs and upgrade hrid (or None). Items on a cycle
+    come last.
+    """
+    recipes = {}
+    for hrid in calc.item_detail_map:
+        action = calc.get_recipe(hrid)
+        if action:
+            inputs = [(inp['itemHrid'], inp['count']) for inp in action.get('inputItems', [])]
+            recipes[hrid] = (inputs, action.get('upgradeItemHrid') or None)
+
+    # Kahn's algorithm over craftable -> craftable edges
+    waiting = {}
+    users = {}
+    for hrid, (inputs, upgrade) in recipes.items():
+        needs = {input_hrid for input_hrid, _ in inputs}
+        if upgrade:
+            needs.add(upgrade)
+        needs &= recipes.keys()
+        waiting[hrid] = len(needs)
+        for need in needs:
+            users.setdefault(need, []).append(hrid)
+
+    order = [hrid for hrid, count in waiting.items() if count == 0]
+    for hrid in order:
+        for user in users.get(hrid, ()):
+            waiting[user] -= 1
+            if waiting[user] == 0:
+                order.append(user)
+    if len(order) < len(recipes):
+        placed = set(order)
+        order.extend(hrid for hrid in recipes if hrid not in placed)
+    return order, recipes
+
+
+def build_acquisition_table(calc, market_data, modes):
+    """Build the AcquisitionTable for a calculator's game data and artisan tea."""
+    hrids = list(calc.item_detail_map)
+    ids = {hrid: i for i, hrid in enumerate(hrids)}
+    order, recipes = craft_order(calc)
+    artisan_mult = calc.get_artisan_tea_multiplier()
+
+    vendor = np.array([calc.get_vendor_price(hrid) for hrid in hrids], dtype=float)
+
+    # Coins and trainee charms are priced regardless of the market
+    fixed = np.zeros(len(hrids))
+    fixed_code = np.zeros(len(hrids), dtype=np.int8)
+    for hrid, i in ids.items():
+        if hrid == '/items/coin':
+            fixed[i], fixed_code[i] = 1, FIXED
+        elif 'trainee' in hrid and 'charm' in hrid:
+            fixed[i], fixed_code[i] = TRAINEE_CHARM_PRICE, VENDOR
+    special = fixed > 0
+
+    price = np.zeros((len(modes), len(hrids)))
+    source = np.zeros((len(modes), len(hrids)), dtype=np.int8)
+    craft = np.zeros((len(modes), len(hrids)))
+    steps = [
+        ([(ids[input_hrid] if input_hrid in ids else None, count * artisan_mult) for input_hrid, count in inputs]
+         + ([(ids.get(upgrade), 1)] if upgrade else []), ids[hrid])
+        for hrid, (inputs, upgrade) in ((hrid, recipes[hrid]) for hrid in order)
+        if not special[ids[hrid]]
+    ]
+
+    for m, mode in enumerate(modes):
+        market = np.array([calc._get_buy_price(hrid, 0, market_data, mode) for hrid in hrids], dtype=float)
+
+        # Before crafting: market, else vendor
+        best = np.where(market > 0, market, vendor)
+        code = np.where(market > 0, MARKET, np.where(vendor > 0, VENDOR, NONE)).astype(np.int8)
+        best[code == NONE] = 0
+        best[special] = fixed[special]
+        code[special] = fixed_code[special]
+
+        # Recipes in topological order, each reading its inputs' final prices
+        best_list = best.tolist()
+        code_list = code.tolist()
+        market_list = market.tolist()
+        craft_list = [0.0] * len(hrids)
+        for parts, i in steps:
+            cost = 0.0
+            for j, count in parts:
+                if j is None or code_list[j] == NONE:
+                    break
+                cost += count * best_list[j]
+            else:
+                craft_list[i] = cost
+                if cost > 0 and (market_list[i] <= 0 or cost < market_list[i]):
+                    best_list[i] = cost
+                    code_list[i] = CRAFT
+
+        price[m] = best_list
+        source[m] = code_list
+        craft[m] = craft_list
+
+    return AcquisitionTable(modes, artisan_mult, hrids, price, source, craft)
@@ -0,0 +1,197 @@
+"""
+Start-level arbitrage scan.
+
+calculate_profit assumes every enhancement starts from a +0 item. The market
+also quotes enhanced items, and buying one at +N and enhancing it to +M is
+often cheaper. Row N of a chain's fundamental matrix gives the expected
+attempts, protections and XP starting from +N, and the calculator's start
+tables hold every row for every (target, protect_at) chain of an item level
+from the same batched pass as its row-0 chain table, so scanning every
+(start, target) pair costs no extra matrix work per start level.
+
+For each item, start level +N (bought at the market) and target +M (sold at
+the market), the route runs the target's optimal per-level protection
+policy (_optimize_protection; the optimal policy is the same from every
+start level) and is compared with starting from +0. Opportunities are
+ranked across the catalog; a route only counts as one if it saves at least
+MIN_SAVINGS_PCT of the +0 route's cost, so a few coins saved on a large
+job do not crowd out real savings.
+
+Usage:
+  python arbitrage.py [init_client_info.json] [marketplace.json]
+"""
+
+import json
+import sys
+import numpy as np
+from enhance_calc import MARKET_FEE, EnhancementCalculator, PriceMode, SUCCESS_RATE
+
+MAX_LEVEL = len(SUCCESS_RATE)
+
+# Savings over the +0 route, in percent of its total cost, for a route to be cheaper
+MIN_SAVINGS_PCT = 5.0
+
+# Metrics computed for every (start, target) cell, in output order
+FIELDS = (
+    'buy_price', 'enhance_cost', 'total_cost', 'sell_price', 'profit', 'profit_after_fee',
+    'roi', 'savings', 'savings_pct', 'actions', 'protect_count', 'protect_at', 'total_xp', 'time_days',
+    'profit_per_day',
+)
+
+
+def evaluate_item(calc, hrid, market_data, mode, start_levels, target_levels):
+    """Get {field: (start, target) array} for one item, or None without priced inputs.
+
+    Cells that cannot be traded (no market price for the start item, no
+    sell price, start at or above target) are NaN. savings is the +0 route's
+    total cost minus this route's and savings_pct the same in percent of the
+    +0 route's, both NaN where the +0 route has no result.
+    'protect_levels' is a list aligned with target_levels of each policy's
+    protected levels (None below +2).
+    """
+    inputs = calc.get_enhancement_inputs(hrid, market_data, mode)
+    if not inputs:
+        return None
+
+    # Start +0 is always evaluated for the savings baseline
+    starts = [0] + [level for level in start_levels if level != 0]
+    rows = np.array(starts)
+    policies = calc._optimize_protection(target_levels, inputs)
+    solved = np.full((4, len(starts), len(target_levels)), np.nan)
+    protect_at = np.full(solved.shape[1:], np.nan)
+    for t, policy in enumerate(policies):
+        if policy:
+            solved[:, :, t] = policy['starts'][:, rows]
+            protect_at[:, t] = policy['protect_at']
+    actions, protect_count, enhance_cost, total_xp = solved
+
+    buy_price = np.array([
+        inputs['base_price'] if level == 0 else calc._get_buy_price(hrid, level, market_data, mode)
+        for level in starts
+    ], dtype=float)
+    buy_price[buy_price <= 0] = np.nan
+    sell_price = np.array([calc.get_sell_price(hrid, target, market_data, mode) for target in target_levels],
+                          dtype=float)
+    sell_price[sell_price <= 0] = np.nan
+
+    result = {
+        'buy_price': np.broadcast_to(buy_price[:, None], actions.shape),
+        'enhance_cost': enhance_cost,
+        'sell_price': np.broadcast_to(sell_price[None, :], actions.shape),
+        'actions': actions,
+        'protect_count': protect_count,
+        'protect_at': protect_at,
+        'total_xp': total_xp,
+    }
+    total_cost = result['buy_price'] + result['enhance_cost']
+    tradable = ~np.isnan(total_cost) & ~np.isnan(result['sell_price'])
+    result['total_cost'] = total_cost
+    result['profit'] = result['sell_price'] - total_cost
+    result['profit_after_fee'] = result['profit'] - result['sell_price'] * MARKET_FEE
+    result['savings'] = total_cost[0][None, :] - total_cost
+    result['time_days'] = result['actions'] * calc.get_attempt_time(inputs['item_level']) / 86400
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['roi'] = np.where(total_cost > 0, result['profit'] / total_cost * 100, 0.0)
+        result['savings_pct'] = result['savings'] / total_cost[0][None, :] * 100
+        result['profit_per_day'] = np.where(result['time_days'] > 0, result['profit'] / result['time_days'], 0.0)
+
+    # Drop the baseline row unless it was asked for
+    keep = [i for i, level in enumerate(starts) if level in start_levels]
+    evaluated = {field: np.where(tradable, result[field], np.nan)[keep] for field in FIELDS}
+    evaluated['protect_levels'] = [policy and policy['protect_levels'] for policy in policies]
+    return evaluated
+
+
+def scan_start_levels(calc, market_data, mode=PriceMode.PESSIMISTIC, start_levels=None, target_levels=None,
+                      sort_by='profit', top_k=50, min_profit=None, max_roi=None, only_cheaper=True,
+                      min_savings_pct=MIN_SAVINGS_PCT, items=None):
+    """Rank buy-at-+N / sell-at-+M opportunities across the catalog.
+
+    start_levels defaults to +1..+19 and target_levels to +2..+20; items to
+    every get_profit_items() item. Returns up to top_k dicts (item_hrid,
+    item_name, start_level, target_level, FIELDS and protect_levels), best
+    sort_by first, ties in item/start/target order. min_profit and max_roi
+    filter like get_all_profits. With only_cheaper, routes must save more
+    than min_savings_pct percent of the cost of starting from +0 (or have
+    no +0 route at all); sort_by='savings' or 'savings_pct' ranks by how
+    much cheaper a route is instead of by its profit.
+    """
+    if start_levels is None:
+        start_levels = range(1, MAX_LEVEL)
+    if target_levels is None:
+        target_levels = range(2, MAX_LEVEL + 1)
+    start_levels = sorted(set(start_levels))
+    target_levels = list(target_levels)
+    if items is None:
+        items = [item['hrid'] for item in calc.get_profit_items()]
+
+    calc._prime_chain_tables(
+        [calc.item_detail_map.get(hrid, {}).get('itemLevel', 1) for hrid in items], all_starts=True
+    )
+
+    cells = []
+    for hrid in items:
+        result = evaluate_item(calc, hrid, market_data, mode, start_levels, target_levels)
+        if result is None:
+            continue
+        valid = ~np.isnan(result['profit'])
+        if min_profit is not None:
+            valid &= result['profit'] > min_profit
+        if max_roi is not None:
+            valid &= result['roi'] < max_roi
+        if only_cheaper:
+            valid &= ~(result['savings_pct'] <= max(min_savings_pct, 0))
+        for s, t in zip(*valid.nonzero()):
+            cells.append((hrid, s, t, result))
+
+    keys = np.array([result[sort_by][s, t] for _, s, t, result in cells])
+    order = np.argsort(-keys, kind='stable')[:top_k]
+
+    rows = []
+    for index in order.tolist():
+        hrid, s, t, result = cells[index]
+        row = {
+            'item_hrid': hrid,
+            'item_name': calc.item_detail_map.get(hrid, {}).get('name', hrid),
+            'start_level': start_levels[s],
+            'target_level': target_levels[t],
+        }
+        for field in FIELDS:
+            row[field] = float(result[field][s, t])
+        row['protect_at'] = int(row['protect_at'])
+        row['protect_levels'] = result['protect_levels'][t]
+        rows.append(row)
+    return rows
+
+
+def main(game_data_path='init_client_info.json', market_path=None):
+    from generate_site import MAX_ROI, format_coins
+
+    if market_path:
+        with open(market_path, encoding='utf-8') as f:
+            market_data = json.load(f)
+    else:
+        import requests
+        resp = requests.get('https://www.milkywayidle.com/game_data/marketplace.json')
+        market_data = resp.json()
+
+    calc = EnhancementCalculator(game_data_path)
+    rows = scan_start_levels(calc, market_data, sort_by='savings', top_k=30, min_profit=0, max_roi=MAX_ROI)
+
+    if not rows:
+        print(f"No profitable route saves more than {MIN_SAVINGS_PCT:g}% over starting from +0")
+        return
+
+    print(f"{'Item':<36} {'Route':>9} {'Buy':>8} {'Cost':>8} {'Sell':>8} {'Profit':>8} {'Saves':>8} {'%':>6}")
+    for r in rows:
+        route = f"+{r['start_level']}->+{r['target_level']}"
+        savings = format_coins(r['savings']) if not np.isnan(r['savings']) else '-'
+        share = f"{r['savings_pct']:.1f}" if not np.isnan(r['savings_pct']) else '-'
+        print(f"{r['item_name']:<36} {route:>9} {format_coins(r['buy_price']):>8} "
+              f"{format_coins(r['total_cost']):>8} {format_coins(r['sell_price']):>8} "
+              f"{format_coins(r['profit']):>8} {savings:>8} {share:>6}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
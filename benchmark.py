@@ -0,0 +1,205 @@
+"""
+Offline calculator benchmarks.
+
+Times the calculator against the checked-in fixtures in fixtures/ (no
+network), writes the timings as JSON and compares them with a stored
+baseline:
+
+  markov_enhance  solve + price every (target, protect_at) chain, +1..+20,
+                  for one item level, from a cold chain cache
+  crafting_cost   crafting cost of every recipe output, cold price memo
+  calculate_profit  calculate_profit for every profit item at TARGET_LEVELS
+                  in one mode, cold caches
+  all_modes       get_all_profits_all_modes at TARGET_LEVELS, cold caches
+
+Each benchmark runs --repeat times; the minimum is compared against the
+baseline. The run fails (exit 1) if any benchmark is slower than baseline
+by more than --threshold (a fraction, default 0.25). Baselines are
+machine-specific: record one with --save-baseline on the machine that runs
+the comparison.
+
+Usage:
+  python benchmark.py [--repeat 5] [--threshold 0.25] [--output bench_results.json]
+  python benchmark.py --save-baseline
+  python benchmark.py --make-fixtures
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+import numpy as np
+from enhance_calc import EnhancementCalculator, PriceMode, SUCCESS_RATE
+
+ROOT = Path(__file__).parent
+FIXTURES_DIR = ROOT / 'fixtures'
+GAME_DATA_FIXTURE = FIXTURES_DIR / 'init_client_info.json'
+MARKET_FIXTURE = FIXTURES_DIR / 'marketplace.json'
+BASELINE_FILE = FIXTURES_DIR / 'bench_baseline.json'
+OUTPUT_FILE = ROOT / 'bench_results.json'
+
+TARGET_LEVELS = [8, 10, 12, 14]
+MARKOV_ITEM_LEVEL = 100
+DEFAULT_THRESHOLD = 0.25
+
+
+def load_fixtures():
+    """Get (calculator, market_data) built from the fixture files."""
+    calc = EnhancementCalculator(GAME_DATA_FIXTURE, use_cache=False)
+    with open(MARKET_FIXTURE, encoding='utf-8') as f:
+        market_data = json.load(f)
+    return calc, market_data
+
+
+def bench_markov_enhance(calc, market_data):
+    calc.clear_caches()
+    total_bonus, use_blessed, guzzling = calc._get_chain_params(MARKOV_ITEM_LEVEL)
+    mat_prices = [(1, 1000.0), (2, 50.0)]
+    for target in range(1, len(SUCCESS_RATE) + 1):
+        for prot_level in range(2, target + 1):
+            calc._markov_enhance(target, prot_level, total_bonus, mat_prices, 100, 5e6, 1e7,
+                                 use_blessed, guzzling, MARKOV_ITEM_LEVEL)
+
+
+def bench_crafting_cost(calc, market_data):
+    calc.clear_caches()
+    for mode in PriceMode:
+        for hrid in calc.recipe_index:
+            calc.get_crafting_cost(hrid, market_data, mode)
+
+
+def bench_calculate_profit(calc, market_data):
+    calc.clear_caches()
+    for item in calc.get_profit_items():
+        for target in TARGET_LEVELS:
+            calc.calculate_profit(item['hrid'], target, market_data, PriceMode.PESSIMISTIC)
+
+
+def bench_all_modes(calc, market_data):
+    calc.clear_caches()
+    calc.get_all_profits_all_modes(market_data, TARGET_LEVELS)
+
+
+BENCHMARKS = {
+    'markov_enhance': bench_markov_enhance,
+    'crafting_cost': bench_crafting_cost,
+    'calculate_profit': bench_calculate_profit,
+    'all_modes': bench_all_modes,
+}
+
+
+def run_benchmarks(repeat=5, names=None):
+    """Run benchmarks and return the results dict written to the output file."""
+    calc, market_data = load_fixtures()
+    timings = {}
+    for name in names or BENCHMARKS:
+        bench = BENCHMARKS[name]
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            bench(calc, market_data)
+            runs.append(time.perf_counter() - start)
+        timings[name] = {
+            'min': min(runs),
+            'median': statistics.median(runs),
+            'repeat': repeat,
+        }
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'generated': int(time.time()),
+        'benchmarks': timings,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Get (name, current, baseline, ratio) for benchmarks slower than baseline * (1 + threshold)."""
+    regressions = []
+    for name, timing in results['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not base or base['min'] <= 0:
+            continue
+        ratio = timing['min'] / base['min']
+        if ratio > 1 + threshold:
+            regressions.append((name, timing['min'], base['min'], ratio))
+    return regressions
+
+
+def make_fixtures():
+    """Rebuild the fixture files from the repo's published game-data.js and prices.js.
+
+    Uses a local init_client_info.json instead of game-data.js if there is one.
+    """
+    from game_data_cache import extract_game_data, read_static_game_data
+
+    local_game_data = ROOT / 'init_client_info.json'
+    if local_game_data.exists():
+        with open(local_game_data, encoding='utf-8') as f:
+            game_data = extract_game_data(json.load(f))
+    else:
+        game_data = read_static_game_data(ROOT / 'game-data.js')
+
+    raw = (ROOT / 'prices.js').read_text(encoding='utf-8')
+    prices = json.loads(raw[len('window.PRICES = '):-1])
+    market_data = {'timestamp': prices['ts'], 'marketData': prices['market']}
+
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for path, data in ((GAME_DATA_FIXTURE, game_data), (MARKET_FIXTURE, market_data)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        print(f"Wrote {path} ({path.stat().st_size / 1024:.1f} KB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline calculator benchmarks.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown vs baseline as a fraction (default 0.25)')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='run only these benchmarks')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--make-fixtures', action='store_true', help='rebuild fixtures/ and exit')
+    args = parser.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures()
+        return 0
+
+    results = run_benchmarks(args.repeat, args.only)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'Benchmark':<18} {'min':>10} {'median':>10}")
+    for name, timing in results['benchmarks'].items():
+        print(f"{name:<18} {timing['min'] * 1000:>8.1f}ms {timing['median'] * 1000:>8.1f}ms")
+    print(f"Wrote {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}, skipping comparison")
+        return 0
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, current, base, ratio in regressions:
+        print(f"REGRESSION {name}: {current * 1000:.1f}ms vs baseline {base * 1000:.1f}ms ({ratio:.2f}x)")
+    if regressions:
+        return 1
+    print(f"OK: no benchmark slower than baseline by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,613 @@
+"""
+Differential check of every enhancement engine against the reference path.
+
+Runs every enhanceable item x target +1..+20 x price mode against a market
+snapshot (the fixtures in fixtures/ by default) through:
+
+  reference   the threshold search: find_best_protection over
+              _markov_enhance, one matrix inversion per chain
+  batched     the same path with the chain cache primed by one batched solve
+              (solve_chains_batched)
+  recurrence  the same path with the O(n) recurrence (solve_chain_recurrence)
+  all_targets calculate_all_targets, every target from one chain table pass
+  matrix      ProfitMatrix arrays (profit items only)
+  policy      optimize_protection's per-level policy (what calculate_profit
+              uses); it can only differ where a non-threshold policy is cheaper
+  js          enhance-calc.js simulate() under node, fed the Python-resolved
+              prices and USER_CONFIG mapped to the JS config
+
+Price resolution is shared, so differences come from the chain math, the
+protection choice or (for js) the gear formulas. Results are gathered into
+(item, target, mode, field) arrays and compared with one vectorized relative
+tolerance check per engine. Cells an engine does not cover are skipped; a
+cell that has a result in one engine and not the other is a mismatch.
+
+KNOWN_DIFFERENCES lists fields where an engine is known to use a different
+model (js counts enhancer tool and charm XP, which the Python XP model does
+not). They are still reported but do not fail the check unless --strict.
+
+Usage:
+  python check_engines.py [--engines batched recurrence all_targets matrix policy js] [--tolerance 1e-6]
+                          [--top 20] [--fields total_cost actions ...]
+                          [--game-data PATH] [--market PATH] [--strict]
+
+Exits 1 if any engine has a mismatch outside KNOWN_DIFFERENCES.
+"""
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+from enhance_calc import EnhancementCalculator, SUCCESS_RATE, USER_CONFIG, base_xp_per_action, protected_mask
+from profit_matrix import MODES, ProfitMatrix
+
+ROOT = Path(__file__).parent
+GAME_DATA_FIXTURE = ROOT / 'fixtures' / 'init_client_info.json'
+MARKET_FIXTURE = ROOT / 'fixtures' / 'marketplace.json'
+JS_CALCULATOR = ROOT / 'enhance-calc.js'
+
+# Same reasoning as check_solvers.py: unprotected +20 chains are ill-conditioned
+TOLERANCE = 1e-6
+TARGETS = list(range(1, len(SUCCESS_RATE) + 1))
+FIELDS = ('actions', 'protect_count', 'protect_at', 'mat_cost', 'total_cost', 'total_xp', 'time_days', 'profit')
+
+# Engine -> fields that differ by design and do not fail the check by default
+KNOWN_DIFFERENCES = {
+    'js': ('total_xp',),
+}
+
+# Reads {config, items, cases: [[itemLevel, target, prices]]} on stdin and
+# writes one [actions, protectCount, protectAt, matCost, totalCost, totalXp,
+# attemptTime] row (or null) per case.
+JS_DRIVER = """
+const { EnhanceCalculator } = require(process.argv[1]);
+let input = '';
+process.stdin.on('data', chunk => { input += chunk; });
+process.stdin.on('end', () => {
+    const request = JSON.parse(input);
+    const calc = new EnhanceCalculator({ items: request.items }, request.config);
+    const rows = request.cases.map(([itemLevel, target, prices]) => {
+        const r = calc.simulate(prices, target, itemLevel);
+        return r && [r.actions, r.protectCount, r.protectAt, r.matCost, r.totalCost, r.totalXp, r.attemptTime];
+    });
+    process.stdout.write(JSON.stringify(rows));
+});
+"""
+
+
+# Reference implementations the calculator no longer uses: the threshold
+# search, batched priming of its per-chain cache and the O(n) recurrence
+# solver. Production pricing goes through the chain tables and
+# _optimize_protection; these engines check it independently.
+
+
+def find_best_protection(calc, target_level, inputs):
+    """Run the chain for every protect_at from +2 to target and keep the cheapest (threshold search).
+
+    Returns the _markov_enhance result with 'protect_at' set, or None.
+    """
+    item_level = inputs['item_level']
+    total_bonus, use_blessed, guzzling = calc._get_chain_params(item_level)
+
+    best_result = None
+    best_total = float('inf')
+
+    for prot_level in range(2, target_level + 1):
+        result = calc._markov_enhance(
+            target_level, prot_level, total_bonus, 
+            inputs['mat_prices'], inputs['coin_cost'], inputs['protect_price'], inputs['base_price'],
+            use_blessed, guzzling, item_level
+        )
+
+        if result['total_cost'] < best_total:
+            best_total = result['total_cost']
+            best_result = result
+            best_result['protect_at'] = prot_level
+
+    return best_result
+
+
+def prime_chain_cache(calc, item_levels, target_levels, solve_systems):
+    """Solve every (item level, target, protection level) chain not yet cached.
+
+    solve_systems(calc, keys) returns the solutions of a list of chain cache
+    keys: solve_chains_batched stacks them into one batched solve,
+    solve_chains_recurrence runs the O(n) recurrence per chain. Later
+    _markov_enhance calls read the primed cache instead of inverting.
+    """
+    systems = []
+    for item_level in sorted(set(item_levels)):
+        total_bonus, use_blessed, guzzling = calc._get_chain_params(item_level)
+        for target in target_levels:
+            for prot_level in range(2, target + 1):
+                key = (item_level, target, prot_level, total_bonus, use_blessed, guzzling)
+                if key not in calc._chain_cache:
+                    systems.append(key)
+
+    if systems:
+        for key, solution in zip(systems, solve_systems(calc, systems)):
+            calc._chain_cache[key] = solution
+
+
+def solve_chains_batched(calc, systems):
+    """Solve many chains at once with a batched np.linalg.solve.
+
+    Each system is a chain cache key. Systems smaller than the largest
+    target are padded with an identity block, which leaves their solution
+    unchanged. Only row 0 of each fundamental matrix is needed, so we solve
+    (I - Q)^T x = e0 instead of inverting.
+    """
+    count = len(systems)
+    size = max(key[1] for key in systems)
+
+    stop_at = np.array([key[1] for key in systems])[:, None]
+    protect_at = np.array([key[2] for key in systems])[:, None]
+    total_bonus = np.array([key[3] for key in systems], dtype=float)[:, None]
+    use_blessed = np.array([bool(key[4]) for key in systems])[:, None]
+    guzzling = np.array([key[5] for key in systems], dtype=float)[:, None]
+
+    levels = np.arange(size)[None, :]
+    valid = levels < stop_at
+
+    success = np.minimum(np.array(SUCCESS_RATE[:size]) / 100.0 * total_bonus, 1.0)
+    blessed = np.where(use_blessed & (levels + 2 <= stop_at), success * 0.01 * guzzling, 0.0)
+    remaining = success - blessed
+    fail = 1.0 - success
+
+    destination = np.where(levels >= protect_at, np.maximum(levels - 1, 0), 0)
+
+    Q = np.zeros((count, size, size + 2))
+    batch = np.arange(count)[:, None].repeat(size, axis=1)
+    rows = levels.repeat(count, axis=0)
+    Q[batch, rows, rows + 2] = np.where(levels + 2 < stop_at, blessed, 0.0)
+    Q[batch, rows, rows + 1] = np.where(levels + 1 < stop_at, remaining, 0.0)
+    Q[batch, rows, destination] += np.where(valid, fail, 0.0)
+    Q = Q[:, :, :size]
+
+    A = np.eye(size)[None, :, :] - Q
+    e0 = np.zeros((count, size, 1))
+    e0[:, 0, 0] = 1.0
+    try:
+        visits = np.linalg.solve(A.transpose(0, 2, 1), e0)[:, :, 0]
+    except np.linalg.LinAlgError:
+        return [calc._solve_chain_matrix(key[1], key[2], key[3], key[4], key[5], key[0]) for key in systems]
+
+    visits = np.where(valid, visits, 0.0)
+
+    # Base XP per action only depends on item level and current enhance level
+    item_level = np.array([key[0] for key in systems], dtype=float)[:, None]
+    xp_per_action = 1.4 * (1 + levels) * (10 + item_level)
+
+    attempts = visits.sum(axis=1)
+    protect_count = np.where(levels >= protect_at, visits * fail, 0.0).sum(axis=1)
+    total_xp = (visits * xp_per_action * (success + 0.1 * (1 - success))).sum(axis=1)
+
+    return [
+        (float(attempts[b]), float(protect_count[b]), float(total_xp[b]))
+        for b in range(count)
+    ]
+
+
+def solve_chain_recurrence(stop_at, protect_at, total_bonus, use_blessed, guzzling, item_level):
+    """Solve one chain in O(n) without building a matrix.
+
+    Expected visits v satisfy v = e0 + v Q. Transitions only go +1, +2,
+    -1 (protected) or back to 0, so for levels >= 1 the balance equations
+    are banded (two below the diagonal, one above) once v[0] is fixed.
+    We solve them with v[0] = 1 by band elimination, then rescale using
+    the balance equation of level 0, which collects every reset.
+    """
+    protected = protected_mask(protect_at, stop_at).tolist()
+    success = []
+    blessed = []
+    fail = []
+    for i in range(stop_at):
+        success_chance = min((SUCCESS_RATE[i] / 100.0) * total_bonus, 1.0)
+        blessed_chance = 0.0
+        if use_blessed and i + 2 <= stop_at:
+            blessed_chance = success_chance * 0.01 * guzzling
+        success.append(success_chance)
+        blessed.append(blessed_chance)
+        fail.append(1.0 - success_chance)
+
+    def up_one(i):
+        return success[i] - blessed[i] if i + 1 < stop_at else 0.0
+
+    def up_two(i):
+        return blessed[i] if i + 2 < stop_at else 0.0
+
+    def down_one(i):
+        # Protected failure from i lands on i - 1 (level 0 is handled by the reset row)
+        return fail[i] if protected[i] and i - 1 >= 1 else 0.0
+
+    # Balance equation for level j >= 1:
+    #   v[j] - up_two(j-2) v[j-2] - up_one(j-1) v[j-1] - down_one(j+1) v[j+1] = 0
+    # with v[0] = 1 moved to the right-hand side.
+    diag = [1.0] * stop_at
+    sub1 = [0.0] * stop_at
+    sub2 = [0.0] * stop_at
+    sup1 = [0.0] * stop_at
+    rhs = [0.0] * stop_at
+    for j in range(1, stop_at):
+        coef_prev = up_one(j - 1)
+        coef_prev2 = up_two(j - 2) if j >= 2 else 0.0
+        if j + 1 < stop_at:
+            sup1[j] = -down_one(j + 1)
+        if j - 1 == 0:
+            rhs[j] += coef_prev
+        else:
+            sub1[j] = -coef_prev
+        if j - 2 == 0:
+            rhs[j] += coef_prev2
+        elif j >= 3:
+            sub2[j] = -coef_prev2
+
+    # Forward elimination; without pivoting the upper band stays one wide
+    for k in range(1, stop_at):
+        if k + 1 < stop_at and sub1[k + 1]:
+            factor = sub1[k + 1] / diag[k]
+            diag[k + 1] -= factor * sup1[k]
+            rhs[k + 1] -= factor * rhs[k]
+        if k + 2 < stop_at and sub2[k + 2]:
+            factor = sub2[k + 2] / diag[k]
+            sub1[k + 2] -= factor * sup1[k]
+            rhs[k + 2] -= factor * rhs[k]
+
+    visits = [1.0] * stop_at
+    for k in range(stop_at - 1, 0, -1):
+        above = sup1[k] * visits[k + 1] if k + 1 < stop_at else 0.0
+        visits[k] = (rhs[k] - above) / diag[k]
+
+    # Level 0 receives every unprotected failure plus any failure from +0 or +1
+    returns = 0.0
+    for i in range(stop_at):
+        if not protected[i] or i <= 1:
+            returns += visits[i] * fail[i]
+    scale = 1.0 / (1.0 - returns)
+
+    attempts = 0.0
+    protect_count = 0.0
+    total_xp = 0.0
+    for i in range(stop_at):
+        v = visits[i] * scale
+        attempts += v
+        if protected[i]:
+            protect_count += v * fail[i]
+        xp_per_action = base_xp_per_action(item_level, i)
+        total_xp += v * xp_per_action * (success[i] + 0.1 * fail[i])
+
+    return attempts, protect_count, total_xp
+
+
+def solve_chains_recurrence(calc, systems):
+    """solve_chain_recurrence for a list of chain cache keys (see prime_chain_cache)."""
+    return [solve_chain_recurrence(key[1], key[2], key[3], key[4], key[5], key[0]) for key in systems]
+
+
+def load_calculator(game_data_path):
+    return EnhancementCalculator(game_data_path, use_cache=False)
+
+
+def new_table(n_items):
+    return np.full((n_items, len(TARGETS), len(MODES), len(FIELDS)), np.nan)
+
+
+def result_row(result, attempt_time, sell_price):
+    """FIELDS values of a find_best_protection-shaped result."""
+    return (
+        result['actions'], result['protect_count'], result['protect_at'],
+        result['mat_cost'], result['total_cost'], result['total_xp'],
+        result['actions'] * attempt_time / 86400,
+        sell_price - result['total_cost'] if sell_price > 0 else np.nan,
+    )
+
+
+def run_path(calc, market_data, items, solve_systems=None):
+    """Evaluate every cell through the find_best_protection threshold search.
+
+    With solve_systems, the chain cache is primed through it first (see
+    prime_chain_cache); otherwise chains are inverted one at a time. Unlike
+    calculate_profit, rows without a sell price are kept (profit NaN) so
+    cost fields are checked for the whole catalog.
+    """
+    if solve_systems is not None:
+        levels = [calc.item_detail_map[hrid].get('itemLevel', 1) for hrid in items]
+        prime_chain_cache(calc, levels, TARGETS, solve_systems)
+
+    table = new_table(len(items))
+    for i, hrid in enumerate(items):
+        for m, mode in enumerate(MODES):
+            inputs = calc.get_enhancement_inputs(hrid, market_data, mode)
+            if not inputs:
+                continue
+            attempt_time = calc.get_attempt_time(inputs['item_level'])
+            for t, target in enumerate(TARGETS):
+                result = find_best_protection(calc, target, inputs)
+                if not result:
+                    continue
+                sell_price = calc.get_sell_price(hrid, target, market_data, mode)
+                table[i, t, m] = result_row(result, attempt_time, sell_price)
+    return items, table
+
+
+def engine_reference(game_data_path, market_data, items):
+    return run_path(load_calculator(game_data_path), market_data, items)
+
+
+def engine_batched(game_data_path, market_data, items):
+    return run_path(load_calculator(game_data_path), market_data, items, solve_chains_batched)
+
+
+def engine_recurrence(game_data_path, market_data, items):
+    return run_path(load_calculator(game_data_path), market_data, items, solve_chains_recurrence)
+
+
+def engine_all_targets(game_data_path, market_data, items):
+    calc = load_calculator(game_data_path)
+    table = new_table(len(items))
+    for i, hrid in enumerate(items):
+        for m, mode in enumerate(MODES):
+            inputs = calc.get_enhancement_inputs(hrid, market_data, mode)
+            if not inputs:
+                continue
+            # Rows without a sell price come back as None, so price those cells directly
+            results = calc.calculate_all_targets(hrid, market_data, mode, TARGETS)
+            chain = calc._get_chain_table(inputs['item_level'])
+            per_attempt = sum(count * price for count, price in inputs['mat_prices']) + inputs['coin_cost']
+            for t, result in enumerate(results):
+                if result is not None:
+                    table[i, t, m] = [getattr(result, field) for field in FIELDS]
+                    continue
+                actions, protect_count, total_xp = chain[:, t]
+                mat_cost = per_attempt * actions + inputs['protect_price'] * protect_count
+                total_cost = inputs['base_price'] + mat_cost
+                if np.all(np.isnan(total_cost)):
+                    continue
+                p = int(np.nanargmin(total_cost))
+                table[i, t, m] = (
+                    actions[p], protect_count[p], p + 2, mat_cost[p], total_cost[p], total_xp[p],
+                    actions[p] * calc.get_attempt_time(inputs['item_level']) / 86400, np.nan,
+                )
+    return items, table
+
+
+def engine_matrix(game_data_path, market_data, items):
+    matrix = ProfitMatrix(load_calculator(game_data_path), market_data, TARGETS)
+    present = matrix.has_inputs[:, None, :] & np.isfinite(matrix.total_cost)
+    with np.errstate(invalid='ignore'):
+        profit = np.where(matrix.sell_price > 0, matrix.profit, np.nan)
+    columns = (
+        matrix.actions, matrix.protect_count, matrix.protect_at, matrix.mat_cost,
+        matrix.total_cost, matrix.total_xp, matrix.time_days, profit,
+    )
+    table = np.stack([np.asarray(column, dtype=float) for column in columns], axis=-1)
+    table[~present] = np.nan
+    return matrix.items, table
+
+
+def engine_policy(game_data_path, market_data, items):
+    calc = load_calculator(game_data_path)
+    table = new_table(len(items))
+    for i, hrid in enumerate(items):
+        for m, mode in enumerate(MODES):
+            results = calc.optimize_protection(hrid, market_data, mode, TARGETS)
+            if results is None:
+                continue
+            attempt_time = calc.get_attempt_time(calc.item_detail_map[hrid].get('itemLevel', 1))
+            for t, (target, result) in enumerate(zip(TARGETS, results)):
+                if result is None:
+                    continue
+                sell_price = calc.get_sell_price(hrid, target, market_data, mode)
+                table[i, t, m] = result_row(result, attempt_time, sell_price)
+    return items, table
+
+
+def js_config(config):
+    """Map a Python USER_CONFIG dict to enhance-calc.js config keys."""
+    return {
+        'enhancingLevel': config['enhancing_level'],
+        'observatoryLevel': config['observatory_level'],
+        'enchantedGlovesLevel': config['enchanted_gloves_level'],
+        'enchantedGlovesEquipped': config['enchanted_gloves_level'] > 0,
+        'guzzlingPouchLevel': config['guzzling_pouch_level'],
+        'guzzlingPouchEquipped': config['guzzling_pouch_level'] > 0,
+        'enhancerTopLevel': config['enhancer_top_level'],
+        'enhancerTopEquipped': config['enhancer_top_level'] > 0,
+        'enhancerBotLevel': config['enhancer_bot_level'],
+        'enhancerBotEquipped': config['enhancer_bot_level'] > 0,
+        'neckType': 'philo',
+        'philoNeckLevel': config['philo_neck_level'],
+        'philoNeckEquipped': config['philo_neck_level'] > 0,
+        'speedNeckLevel': 0,
+        'speedNeckEquipped': False,
+        'capeLevel': 0,
+        'capeEquipped': False,
+        'charmLevel': config.get('charm_level', 0),
+        'charmTier': config.get('charm_tier', 'none'),
+        'enhancingBuffLevel': config['enhancing_buff_level'],
+        'experienceBuffLevel': config['experience_buff_level'],
+        'enhancer': config['enhancer'],
+        'enhancerLevel': config['enhancer_level'],
+        'enhancerEquipped': True,
+        'teaEnhancing': config['tea_enhancing'],
+        'teaSuperEnhancing': config['tea_super_enhancing'],
+        'teaUltraEnhancing': config['tea_ultra_enhancing'],
+        'teaBlessed': config['tea_blessed'],
+        'teaWisdom': config['tea_wisdom'],
+        'artisanTea': config['artisan_tea'],
+        'achievementSuccessBonus': config.get('achievement_success_bonus', 0),
+    }
+
+
+def engine_js(game_data_path, market_data, items):
+    node = shutil.which('node')
+    if not node:
+        print("node not found, skipping js")
+        return None
+
+    calc = load_calculator(game_data_path)
+    js_items = {}
+    for hrid, item in calc.item_detail_map.items():
+        stats = item.get('equipmentDetail', {}).get('noncombatStats')
+        if stats:
+            js_items[hrid] = {'stats': stats}
+
+    cases, cells, sell_prices = [], [], []
+    for i, hrid in enumerate(items):
+        for m, mode in enumerate(MODES):
+            inputs = calc.get_enhancement_inputs(hrid, market_data, mode)
+            if not inputs:
+                continue
+            prices = {
+                'matPrices': [list(pair) for pair in inputs['mat_prices']],
+                'coinCost': inputs['coin_cost'],
+                'basePrice': inputs['base_price'],
+                'protectPrice': inputs['protect_price'],
+            }
+            for t, target in enumerate(TARGETS):
+                cases.append([inputs['item_level'], target, prices])
+                cells.append((i, t, m))
+                sell_prices.append(calc.get_sell_price(hrid, target, market_data, mode))
+
+    request = {'config': js_config(USER_CONFIG), 'items': js_items, 'cases': cases}
+    completed = subprocess.run(
+        [node, '-e', JS_DRIVER, str(JS_CALCULATOR.resolve())],
+        input=json.dumps(request), capture_output=True, text=True, check=True,
+    )
+
+    table = new_table(len(items))
+    for (i, t, m), sell_price, row in zip(cells, sell_prices, json.loads(completed.stdout)):
+        if row is None:
+            continue
+        actions, protect_count, protect_at, mat_cost, total_cost, total_xp, attempt_time = row
+        table[i, t, m] = (
+            actions, protect_count, protect_at, mat_cost, total_cost, total_xp,
+            actions * attempt_time / 86400,
+            sell_price - total_cost if sell_price > 0 else np.nan,
+        )
+    return items, table
+
+
+ENGINES = {
+    'batched': engine_batched,
+    'recurrence': engine_recurrence,
+    'all_targets': engine_all_targets,
+    'matrix': engine_matrix,
+    'policy': engine_policy,
+    'js': engine_js,
+}
+
+
+def align(reference_items, items, table):
+    """Reindex an engine's table to the reference item order; get (table, covered)."""
+    index = {hrid: i for i, hrid in enumerate(items)}
+    rows = np.array([index.get(hrid, -1) for hrid in reference_items])
+    covered = rows >= 0
+    aligned = new_table(len(reference_items))
+    aligned[covered] = table[rows[covered]]
+    return aligned, covered
+
+
+def compare(reference, other, covered, fields, tolerance):
+    """Vectorized comparison of two aligned tables.
+
+    Returns (relative error array with NaN for skipped cells, presence
+    mismatch mask over (item, target, mode), number of compared cells).
+    """
+    field_index = [FIELDS.index(field) for field in fields]
+    ref = reference[..., field_index]
+    oth = other[..., field_index]
+
+    ref_present = ~np.isnan(reference[..., FIELDS.index('total_cost')])
+    oth_present = ~np.isnan(other[..., FIELDS.index('total_cost')])
+    presence = covered[:, None, None] & (ref_present != oth_present)
+
+    both = (covered[:, None, None] & ref_present & oth_present)[..., None] & ~np.isnan(ref) & ~np.isnan(oth)
+    with np.errstate(invalid='ignore'):
+        error = np.abs(oth - ref) / np.maximum(1.0, np.abs(ref))
+    error = np.where(both, error, np.nan)
+    # inf == inf is a match, not a NaN error
+    error[both & (ref == oth)] = 0.0
+    return error, presence, int(np.count_nonzero(covered[:, None, None] & ref_present))
+
+
+def report(name, items, reference, other, error, presence, compared, fields, tolerance, top, known=()):
+    """Print one engine's summary and worst mismatches; get the number of failures.
+
+    Fields in known are summarized but neither counted nor listed.
+    """
+    bad = np.nan_to_num(error, nan=0.0) > tolerance
+    counted = np.array([field not in known for field in fields])
+    bad_counted = bad & counted
+    failures = int(np.count_nonzero(bad_counted)) + int(np.count_nonzero(presence))
+
+    print(f"\n== {name}: {compared} cells, {failures} mismatches")
+    for f, field in enumerate(fields):
+        column = error[..., f]
+        if np.all(np.isnan(column)):
+            continue
+        worst = np.nanmax(column)
+        note = '  (known difference, not counted)' if field in known else ''
+        print(f"  {field:<14} worst {worst:.3e}  over tolerance {int(np.count_nonzero(bad[..., f]))}{note}")
+
+    for i, t, m in np.argwhere(presence)[:top]:
+        has = 'reference' if np.isnan(other[i, t, m, 0]) else name
+        print(f"  only {has} has a result: {items[i]} +{TARGETS[t]} {MODES[m].value}")
+
+    flat = np.where(counted, np.nan_to_num(error, nan=-1.0), -1.0).ravel()
+    count = min(top, int(np.count_nonzero(bad_counted)))
+    if count:
+        order = np.argpartition(-flat, count - 1)[:count]
+        order = order[np.argsort(-flat[order])]
+        print(f"  worst {count}:")
+        field_index = [FIELDS.index(field) for field in fields]
+        for i, t, m, f in zip(*np.unravel_index(order, error.shape)):
+            ref_value = reference[i, t, m, field_index[f]]
+            other_value = other[i, t, m, field_index[f]]
+            print(f"    {items[i]} +{TARGETS[t]} {MODES[m].value} {fields[f]}: "
+                  f"{ref_value:.6g} vs {other_value:.6g} ({error[i, t, m, f]:.3e})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Differential check of enhancement engines.')
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument('--fields', nargs='+', choices=FIELDS, default=list(FIELDS))
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--top', type=int, default=20, help='worst mismatches to list per engine')
+    parser.add_argument('--game-data', default=GAME_DATA_FIXTURE)
+    parser.add_argument('--market', default=MARKET_FIXTURE)
+    parser.add_argument('--strict', action='store_true', help='also fail on KNOWN_DIFFERENCES')
+    args = parser.parse_args()
+
+    with open(args.market, encoding='utf-8') as f:
+        market_data = json.load(f)
+
+    calc = load_calculator(args.game_data)
+    items = [item['hrid'] for item in calc.enhanceable_items if item.get('hrid')]
+    items, reference = engine_reference(args.game_data, market_data, items)
+    print(f"Reference: {len(items)} items x {len(TARGETS)} targets x {len(MODES)} modes")
+
+    failures = 0
+    for name in args.engines:
+        result = ENGINES[name](args.game_data, market_data, items)
+        if result is None:
+            continue
+        other, covered = align(items, *result)
+        error, presence, compared = compare(reference, other, covered, args.fields, args.tolerance)
+        known = () if args.strict else KNOWN_DIFFERENCES.get(name, ())
+        failures += report(name, items, reference, other, error, presence, compared,
+                           args.fields, args.tolerance, args.top, known)
+
+    if failures:
+        print("\nFAIL")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
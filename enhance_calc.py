@@ -4,10 +4,14 @@ Implements the same Markov chain math as Enhancelator
 https://doh-nuts.github.io/Enhancelator/
 """
 
-import json
+import copy
+import functools
+import heapq
 import numpy as np
 from pathlib import Path
 from enum import Enum
+from game_data_cache import load_game_data
+from market_snapshot import MarketSnapshot
 
 # Enhancement bonus multipliers for levels +0 to +20
 ENHANCE_BONUS = [
@@ -24,6 +28,13 @@ SUCCESS_RATE = [
     30, 30, 30, 30, 30, 30, 30, 30, 30, 30   # +11 to +20
 ]
 
+# Marketplace fee, as a fraction of the sell price
+MARKET_FEE = 0.02
+
+# Start tables (about 180KB each) kept across profiles, least recently used
+# evicted first; a gear sweep would otherwise keep one per variant and item level
+START_TABLE_CACHE_SIZE = 64
+
 
 class PriceMode(Enum):
     """Price mode for calculations."""
@@ -69,19 +80,378 @@ USER_CONFIG = {
 }
 
 
+def _get_noncombat_stat(item_detail_map, hrid, stat_name):
+    """Get a noncombat stat from an item."""
+    item = item_detail_map.get(hrid, {})
+    equip_detail = item.get('equipmentDetail', {})
+    noncombat = equip_detail.get('noncombatStats', {})
+    return noncombat.get(stat_name, 0)
+
+
+class GearProfile:
+    """Compiled, immutable gear configuration.
+    
+    Built once from a USER_CONFIG-shaped dict and the game's item stats.
+    Every gear-derived number the calculator needs is computed up front,
+    including success bonus and attempt time per item level and the XP
+    multiplier, so the hot path never re-reads the config or item data.
+    """
+    __slots__ = (
+        'config', 'guzzling', 'artisan_multiplier', 'enhancer_bonus',
+        'achievement_bonus', 'effective_level', 'observatory', 'tea_speed',
+        'gloves_speed', 'top_speed', 'bot_speed', 'neck_speed', 'buff_speed',
+        'item_speed_bonus', 'xp_multiplier', 'use_blessed', 'blessed_guzzling',
+        'success_bonus_table', 'attempt_time_table',
+    )
+    
+    def __init__(self, config, item_detail_map, max_item_level=None):
+        def stat(hrid, stat_name):
+            return _get_noncombat_stat(item_detail_map, hrid, stat_name)
+        
+        def init(name, value):
+            object.__setattr__(self, name, value)
+        
+        config = dict(config)
+        init('config', config)
+        
+        # Guzzling pouch concentration bonus
+        base = stat('/items/guzzling_pouch', 'drinkConcentration')
+        guzzling = 1 + base * 100 * ENHANCE_BONUS[config['guzzling_pouch_level']] / 100
+        init('guzzling', guzzling)
+        
+        # Artisan tea: 10% material reduction, boosted by guzzling
+        init('artisan_multiplier', 1.0 - 0.10 * guzzling if config.get('artisan_tea') else 1.0)
+        
+        # Enhancer tool success bonus
+        base = stat(f"/items/{config['enhancer']}", 'enhancingSuccess')
+        init('enhancer_bonus', base * 100 * ENHANCE_BONUS[config['enhancer_level']])
+        init('achievement_bonus', config.get('achievement_success_bonus', 0))
+        
+        # Effective enhancing level including tea bonuses
+        level = config['enhancing_level']
+        if config.get('tea_enhancing'):
+            level += 3 * guzzling
+        if config.get('tea_super_enhancing'):
+            level += 6 * guzzling
+        if config.get('tea_ultra_enhancing'):
+            level += 8 * guzzling
+        init('effective_level', level)
+        init('observatory', config['observatory_level'])
+        
+        # Speed bonuses from teas
+        tea_speed = 0
+        if config.get('tea_enhancing'):
+            tea_speed = 2 * guzzling
+        elif config.get('tea_super_enhancing'):
+            tea_speed = 4 * guzzling
+        elif config.get('tea_ultra_enhancing'):
+            tea_speed = 6 * guzzling
+        init('tea_speed', tea_speed)
+        
+        # Item gear speed bonuses
+        gloves_speed = top_speed = bot_speed = neck_speed = buff_speed = 0
+        if config.get('enchanted_gloves_level'):
+            gloves_speed = stat('/items/enchanted_gloves', 'enhancingSpeed') * 100 * ENHANCE_BONUS[config['enchanted_gloves_level']]
+        if config.get('enhancer_top_level'):
+            top_speed = stat('/items/enhancers_top', 'enhancingSpeed') * 100 * ENHANCE_BONUS[config['enhancer_top_level']]
+        if config.get('enhancer_bot_level'):
+            bot_speed = stat('/items/enhancers_bottoms', 'enhancingSpeed') * 100 * ENHANCE_BONUS[config['enhancer_bot_level']]
+        if config.get('philo_neck_level'):
+            # Philosopher's necklace uses 5x scaling
+            base = stat('/items/philosophers_necklace', 'skillingSpeed')
+            neck_speed = base * 100 * (((ENHANCE_BONUS[config['philo_neck_level']] - 1) * 5) + 1)
+        if config.get('enhancing_buff_level'):
+            buff_speed = 19.5 + config['enhancing_buff_level'] * 0.5
+        init('gloves_speed', gloves_speed)
+        init('top_speed', top_speed)
+        init('bot_speed', bot_speed)
+        init('neck_speed', neck_speed)
+        init('buff_speed', buff_speed)
+        init('item_speed_bonus', gloves_speed + top_speed + bot_speed + neck_speed + buff_speed)
+        
+        # XP bonuses
+        xp_bonus = 0
+        if config.get('tea_wisdom'):
+            xp_bonus += 0.12 * guzzling
+        if config.get('enhancer_bot_level'):
+            base = stat('/items/enhancers_bottoms', 'enhancingExperience')
+            xp_bonus += base * ENHANCE_BONUS[config['enhancer_bot_level']]
+        if config.get('philo_neck_level'):
+            # Philosopher's necklace (skilling XP, 5x scaling)
+            base = stat('/items/philosophers_necklace', 'skillingExperience')
+            xp_bonus += base * (((ENHANCE_BONUS[config['philo_neck_level']] - 1) * 5) + 1)
+        if config.get('experience_buff_level'):
+            xp_bonus += 0.195 + config['experience_buff_level'] * 0.005
+        init('xp_multiplier', 1 + xp_bonus)
+        
+        # Blessed tea: +1% chance (boosted by guzzling) for double success
+        use_blessed = config.get('tea_blessed', False)
+        init('use_blessed', use_blessed)
+        init('blessed_guzzling', guzzling if use_blessed else 1)
+        
+        if max_item_level is None:
+            max_item_level = max((item.get('itemLevel', 1) for item in item_detail_map.values()), default=1)
+        levels = range(max_item_level + 1)
+        init('success_bonus_table', tuple(self._compute_success_bonus(level) for level in levels))
+        init('attempt_time_table', tuple(self._compute_attempt_time(level) for level in levels))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+    
+    def __reduce__(self):
+        # Immutability blocks the default slot-by-slot unpickling
+        state = {name: getattr(self, name) for name in self.__slots__}
+        return (_rebuild_gear_profile, (state,))
+    
+    def _compute_success_bonus(self, item_level):
+        total_tool_bonus = self.enhancer_bonus + self.achievement_bonus
+        effective_level = self.effective_level
+        observatory = self.observatory
+        
+        if effective_level >= item_level:
+            return 1 + (0.05 * (effective_level + observatory - item_level) + total_tool_bonus) / 100
+        return (1 - (0.5 * (1 - effective_level / item_level))) + (0.05 * observatory + total_tool_bonus) / 100
+    
+    def _compute_attempt_time(self, item_level):
+        # Base time is 12 seconds
+        if self.effective_level > item_level:
+            speed_bonus = (self.effective_level + self.observatory - item_level) + self.item_speed_bonus + self.tea_speed
+        else:
+            speed_bonus = self.observatory + self.item_speed_bonus + self.tea_speed
+        return 12 / (1 + speed_bonus / 100)
+    
+    def success_bonus(self, item_level):
+        """Total success rate multiplier for an item level."""
+        if 0 <= item_level < len(self.success_bonus_table):
+            return self.success_bonus_table[item_level]
+        return self._compute_success_bonus(item_level)
+    
+    def attempt_time(self, item_level):
+        """Time per enhancement attempt in seconds for an item level."""
+        if 0 <= item_level < len(self.attempt_time_table):
+            return self.attempt_time_table[item_level]
+        return self._compute_attempt_time(item_level)
+    
+    def xp_per_action(self, item_level, enhance_level):
+        """XP for one successful action at an enhance level."""
+        return base_xp_per_action(item_level, enhance_level) * self.xp_multiplier
+
+
+def _rebuild_gear_profile(state):
+    profile = object.__new__(GearProfile)
+    for name, value in state.items():
+        object.__setattr__(profile, name, value)
+    return profile
+
+
+def base_xp_per_action(item_level, enhance_level):
+    """XP per successful action before gear bonuses."""
+    return 1.4 * (1 + enhance_level) * (10 + item_level)
+
+
+def protected_mask(protect_at, stop_at):
+    """Get which levels 0..stop_at-1 have their failures protected.
+    
+    protect_at is a threshold (every level >= protect_at) or a tuple of the
+    protected levels of a per-level policy (see _optimize_protection).
+    """
+    levels = np.arange(stop_at)
+    if isinstance(protect_at, tuple):
+        return np.isin(levels, protect_at)
+    return levels >= protect_at
+
+
+def protect_argument(protect_levels, target_level):
+    """Get the chain protect_at argument for a list of protected levels.
+    
+    A threshold policy (every level from its lowest up to the target) gives
+    the plain int protect_at, so it shares chain and spread cache entries
+    with the threshold search; no protection gives the target. Any other
+    policy gives the tuple of levels.
+    """
+    protect_levels = tuple(protect_levels)
+    if not protect_levels:
+        return target_level
+    if protect_levels == tuple(range(protect_levels[0], target_level)):
+        return protect_levels[0]
+    return protect_levels
+
+
+# Keys of a profit result, in the order data.js rows have always used
+PROFIT_FIELDS = (
+    'item_hrid', 'item_name', 'target_level', 'base_price', 'base_source',
+    'alt_price', 'alt_source', 'mat_cost', 'total_cost', 'sell_price',
+    'market_fee', 'profit', 'profit_after_fee', 'roi', 'roi_after_fee',
+    'profit_per_day', 'profit_per_day_after_fee', 'xp_per_day', 'total_xp',
+    'actions', 'time_hours', 'time_days', 'protect_count', 'protect_at',
+    'protect_hrid', 'protect_name', 'protect_price', 'materials', 'coin_cost',
+    'craft_materials', 'mode',
+) + (
+    # Spread of cost and time around the expected values (see _markov_enhance)
+    'cost_std', 'cost_p10', 'cost_p50', 'cost_p90',
+    'time_std_days', 'time_p10_days', 'time_p50_days', 'time_p90_days',
+) + (
+    # Protected levels of the per-level protection policy (see _optimize_protection)
+    'protect_levels',
+)
+
+# Percentiles reported by _markov_enhance(spread=True)
+SPREAD_QUANTILES = (0.1, 0.5, 0.9)
+
+# Fields stored on every ProfitResult, in constructor order (all numeric
+# except the protect_levels list)
+PROFIT_METRICS = (
+    'mat_cost', 'total_cost', 'sell_price', 'market_fee', 'profit',
+    'profit_after_fee', 'roi', 'roi_after_fee', 'profit_per_day',
+    'profit_per_day_after_fee', 'xp_per_day', 'total_xp', 'actions',
+    'time_hours', 'time_days', 'protect_count', 'protect_at', 'protect_levels',
+)
+
+
+class ProfitResult:
+    """One profit row (item, target level, price mode).
+    
+    Numeric fields are plain slots. Price inputs (base price, protection,
+    coin cost) are read from the shared get_enhancement_inputs() dict, and
+    the material/craft breakdown (materials, craft_materials, alt_price,
+    alt_source) is built by load_detail on first access, so rows that are
+    filtered out never build those lists. The cost/time spread (cost_std,
+    cost_p10..p90, time_*_days) is likewise priced by load_spread on first
+    access.
+    
+    Rows read like the old result dicts: r['profit'], r.get('key'), and
+    r['key'] = value for extra output fields. to_dict() serializes a row to
+    the data.js shape.
+    """
+    __slots__ = ('item_hrid', 'item_name', 'target_level', 'mode', 'inputs',
+                 '_load_detail', '_detail', '_load_spread', '_spread', '_extra') + PROFIT_METRICS
+    
+    def __init__(self, item_hrid, item_name, target_level, mode, inputs, load_detail, metrics, load_spread=None):
+        self.item_hrid = item_hrid
+        self.item_name = item_name
+        self.target_level = target_level
+        self.mode = mode
+        self.inputs = inputs
+        self._load_detail = load_detail
+        self._detail = None
+        self._load_spread = load_spread
+        self._spread = None
+        self._extra = None
+        for name, value in zip(PROFIT_METRICS, metrics):
+            setattr(self, name, value)
+    
+    @property
+    def detail(self):
+        """The get_enhancement_detail() dict, built on first access."""
+        if self._detail is None:
+            self._detail = self._load_detail()
+        return self._detail
+    
+    @property
+    def spread(self):
+        """The (cost_std, cost_p10, cost_p50, cost_p90, time_std_days, time_p10_days,
+        time_p50_days, time_p90_days) tuple, priced on first access."""
+        if self._spread is None:
+            self._spread = self._load_spread()
+        return self._spread
+    
+    base_price = property(lambda self: self.inputs['base_price'])
+    base_source = property(lambda self: self.inputs['base_source'])
+    protect_hrid = property(lambda self: self.inputs['protect_hrid'])
+    protect_name = property(lambda self: self.inputs['protect_name'])
+    protect_price = property(lambda self: self.inputs['protect_price'])
+    coin_cost = property(lambda self: self.inputs['coin_cost'])
+    alt_price = property(lambda self: self.detail['alt_price'])
+    alt_source = property(lambda self: self.detail['alt_source'])
+    materials = property(lambda self: self.detail['materials'])
+    craft_materials = property(lambda self: self.detail['craft_materials'])
+    cost_std = property(lambda self: self.spread[0])
+    cost_p10 = property(lambda self: self.spread[1])
+    cost_p50 = property(lambda self: self.spread[2])
+    cost_p90 = property(lambda self: self.spread[3])
+    time_std_days = property(lambda self: self.spread[4])
+    time_p10_days = property(lambda self: self.spread[5])
+    time_p50_days = property(lambda self: self.spread[6])
+    time_p90_days = property(lambda self: self.spread[7])
+    
+    def __getitem__(self, key):
+        if key in PROFIT_FIELDS:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key in PROFIT_FIELDS:
+            raise KeyError(f"{key!r} is a computed field")
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+    
+    def __contains__(self, key):
+        return key in PROFIT_FIELDS or (self._extra is not None and key in self._extra)
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def to_dict(self):
+        """Serialize to the data.js row dict (calculate_profit's historical shape plus extra fields)."""
+        row = {key: getattr(self, key) for key in PROFIT_FIELDS}
+        if self._extra:
+            row.update(self._extra)
+        return row
+    
+    def __getstate__(self):
+        # The detail and spread loaders are bound to a calculator; the
+        # unpickling side re-attaches its own (see parallel_profits)
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['_load_detail'] = None
+        state['_load_spread'] = None
+        return None, state
+    
+    def __repr__(self):
+        return f"<ProfitResult {self.item_hrid} +{self.target_level} {self.mode} profit={self.profit:,.0f}>"
+
+
 class EnhancementCalculator:
-    def __init__(self, game_data_path='init_client_info.json'):
+    def __init__(self, game_data_path='init_client_info.json', profile=None, use_cache=True):
+        """Load game data and compile the gear profile.
+        
+        profile may be a GearProfile or a USER_CONFIG-shaped dict; it defaults
+        to USER_CONFIG. use_cache=False parses game_data_path directly instead
+        of going through the version-keyed game data cache.
+        """
+        self.game_data_path = game_data_path
+        self.use_cache = use_cache
         self.game_data = None
         self.game_version = ''
         self.item_detail_map = {}
         self.action_detail_map = {}
         self.enhanceable_items = []
+        self.recipe_index = {}
+        # Caches are held in shared containers so with_profile() copies reuse them
+        self._price_memo = {'market': None, 'snapshot': None, 'entries': {}}
+        self._chain_cache = {}
+        self._chain_tables = {}
+        self._start_tables = {}
+        self._spread_cache = {}
+        self._dependency_index = None
+        # Instrumentation counters, see enable_stats()
+        self.stats = None
         self._load_game_data(game_data_path)
+        
+        if profile is None:
+            profile = USER_CONFIG
+        if not isinstance(profile, GearProfile):
+            profile = GearProfile(profile, self.item_detail_map)
+        self.profile = profile
     
     def _load_game_data(self, path):
-        """Load and parse game data, extracting only what we need."""
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        """Load game data, extracting only what we need (via the game_data_cache cache)."""
+        data = load_game_data(path, use_cache=self.use_cache)
         
         self.game_version = data.get('gameVersion', '')
         self.item_detail_map = data.get('itemDetailMap', {})
@@ -95,211 +465,158 @@ class EnhancementCalculator:
         
         # Sort by sortIndex
         self.enhanceable_items.sort(key=lambda x: x.get('sortIndex', 0))
+        
+        # Index production actions by output item (first match wins, like a linear scan)
+        self.recipe_index = {}
+        for act in self.action_detail_map.values():
+            if act.get('function') != '/action_functions/production':
+                continue
+            outputs = act.get('outputItems')
+            if not outputs:
+                continue
+            self.recipe_index.setdefault(outputs[0].get('itemHrid'), act)
+    
+    def _get_price_cache(self, market_data):
+        """Get the resolved-price memo for a market snapshot.
+        
+        The memo is keyed on the identity of market_data, so passing a new
+        snapshot starts a fresh memo. Mutating a snapshot in place is not detected.
+        """
+        memo = self._price_memo
+        if market_data is not memo['market']:
+            memo['market'] = market_data
+            memo['snapshot'] = MarketSnapshot.coerce(market_data)
+            memo['entries'] = {}
+        return memo['entries']
+    
+    def get_snapshot(self, market_data):
+        """Get the MarketSnapshot for market_data (a snapshot or marketplace.json dict).
+        
+        Dicts are converted once and memoized alongside resolved prices.
+        """
+        if isinstance(market_data, MarketSnapshot):
+            return market_data
+        self._get_price_cache(market_data)
+        return self._price_memo['snapshot']
+    
+    def clear_caches(self):
+        """Drop memoized prices and chain solutions (shared with with_profile() copies)."""
+        self._price_memo.update(market=None, snapshot=None, entries={})
+        self._chain_cache.clear()
+        self._chain_tables.clear()
+        self._start_tables.clear()
+        self._spread_cache.clear()
+    
+    def enable_stats(self, stats=None):
+        """Start collecting instrumentation counters and timers (see instrumentation.py).
+        
+        Returns the CalcStats being filled in. with_profile() copies made while
+        enabled report into the same object. Disabled calculators run the
+        plain methods, so instrumentation costs nothing unless enabled.
+        """
+        from instrumentation import instrument
+        return instrument(self, stats)
+    
+    def disable_stats(self):
+        """Stop collecting instrumentation; returns the collected CalcStats (or None)."""
+        from instrumentation import uninstrument
+        return uninstrument(self)
+    
+    def with_profile(self, profile):
+        """Get a calculator for another gear profile that shares this one's state.
+        
+        Game data, the recipe index, the price memo and the chain cache are
+        shared, so evaluating several profiles against one market snapshot
+        resolves crafting costs and solves each chain only once.
+        """
+        other = copy.copy(self)
+        if not isinstance(profile, GearProfile):
+            profile = GearProfile(profile, self.item_detail_map)
+        other.profile = profile
+        return other
     
     def _get_noncombat_stat(self, hrid, stat_name):
         """Get a noncombat stat from an item."""
-        item = self.item_detail_map.get(hrid, {})
-        equip_detail = item.get('equipmentDetail', {})
-        noncombat = equip_detail.get('noncombatStats', {})
-        return noncombat.get(stat_name, 0)
+        return _get_noncombat_stat(self.item_detail_map, hrid, stat_name)
     
     def get_guzzling_bonus(self):
         """Calculate guzzling pouch concentration bonus."""
-        base = self._get_noncombat_stat('/items/guzzling_pouch', 'drinkConcentration')
-        level = USER_CONFIG['guzzling_pouch_level']
-        bonus = base * 100 * ENHANCE_BONUS[level]
-        return 1 + bonus / 100
+        return self.profile.guzzling
     
     def get_artisan_tea_multiplier(self):
         """Get material cost multiplier from artisan tea."""
-        if not USER_CONFIG.get('artisan_tea'):
-            return 1.0
-        guzzling = self.get_guzzling_bonus()
-        # 10% reduction, boosted by guzzling
-        reduction = 0.10 * guzzling
-        return 1.0 - reduction
+        return self.profile.artisan_multiplier
     
     def get_enhancer_bonus(self):
         """Calculate enhancer tool success bonus."""
-        enhancer_hrid = f"/items/{USER_CONFIG['enhancer']}"
-        base = self._get_noncombat_stat(enhancer_hrid, 'enhancingSuccess')
-        level = USER_CONFIG['enhancer_level']
-        return base * 100 * ENHANCE_BONUS[level]
+        return self.profile.enhancer_bonus
     
     def get_effective_level(self):
         """Get effective enhancing level including tea bonuses."""
-        level = USER_CONFIG['enhancing_level']
-        guzzling = self.get_guzzling_bonus()
-        
-        if USER_CONFIG.get('tea_enhancing'):
-            level += 3 * guzzling
-        if USER_CONFIG.get('tea_super_enhancing'):
-            level += 6 * guzzling
-        if USER_CONFIG.get('tea_ultra_enhancing'):
-            level += 8 * guzzling
-        
-        return level
+        return self.profile.effective_level
     
     def get_total_bonus(self, item_level):
         """Calculate total success rate multiplier for an item level."""
-        enhancer_bonus = self.get_enhancer_bonus()
-        achievement_bonus = USER_CONFIG.get('achievement_success_bonus', 0)
-        total_tool_bonus = enhancer_bonus + achievement_bonus
-        
-        effective_level = self.get_effective_level()
-        observatory = USER_CONFIG['observatory_level']
-        
-        if effective_level >= item_level:
-            bonus = 1 + (0.05 * (effective_level + observatory - item_level) + total_tool_bonus) / 100
-        else:
-            bonus = (1 - (0.5 * (1 - effective_level / item_level))) + (0.05 * observatory + total_tool_bonus) / 100
-        
-        return bonus
+        return self.profile.success_bonus(item_level)
     
     def get_attempt_time(self, item_level):
         """Calculate time per enhancement attempt in seconds."""
-        guzzling = self.get_guzzling_bonus()
-        effective_level = self.get_effective_level()
-        observatory = USER_CONFIG['observatory_level']
-        
-        # Speed bonuses from teas
-        tea_speed = 0
-        if USER_CONFIG.get('tea_enhancing'):
-            tea_speed = 2 * guzzling
-        elif USER_CONFIG.get('tea_super_enhancing'):
-            tea_speed = 4 * guzzling
-        elif USER_CONFIG.get('tea_ultra_enhancing'):
-            tea_speed = 6 * guzzling
-        
-        # Item gear speed bonuses
-        item_bonus = 0
-        if USER_CONFIG.get('enchanted_gloves_level'):
-            item_bonus += self._get_noncombat_stat('/items/enchanted_gloves', 'enhancingSpeed') * 100 * ENHANCE_BONUS[USER_CONFIG['enchanted_gloves_level']]
-        if USER_CONFIG.get('enhancer_top_level'):
-            item_bonus += self._get_noncombat_stat('/items/enhancers_top', 'enhancingSpeed') * 100 * ENHANCE_BONUS[USER_CONFIG['enhancer_top_level']]
-        if USER_CONFIG.get('enhancer_bot_level'):
-            item_bonus += self._get_noncombat_stat('/items/enhancers_bottoms', 'enhancingSpeed') * 100 * ENHANCE_BONUS[USER_CONFIG['enhancer_bot_level']]
-        if USER_CONFIG.get('philo_neck_level'):
-            # Philosopher's necklace uses 5x scaling
-            base = self._get_noncombat_stat('/items/philosophers_necklace', 'skillingSpeed')
-            item_bonus += base * 100 * (((ENHANCE_BONUS[USER_CONFIG['philo_neck_level']] - 1) * 5) + 1)
-        
-        # Enhancing buff
-        if USER_CONFIG.get('enhancing_buff_level'):
-            item_bonus += 19.5 + USER_CONFIG['enhancing_buff_level'] * 0.5
-        
-        # Base time is 12 seconds
-        if effective_level > item_level:
-            speed_bonus = (effective_level + observatory - item_level) + item_bonus + tea_speed
-        else:
-            speed_bonus = observatory + item_bonus + tea_speed
-        
-        return 12 / (1 + speed_bonus / 100)
+        return self.profile.attempt_time(item_level)
     
     def get_xp_per_action(self, item_level, enhance_level):
         """Calculate XP per enhancement action."""
-        guzzling = self.get_guzzling_bonus()
-        
-        # Base XP formula
-        base_xp = 1.4 * (1 + enhance_level) * (10 + item_level)
-        
-        # XP bonuses
-        xp_bonus = 0
-        
-        # Wisdom tea
-        if USER_CONFIG.get('tea_wisdom'):
-            xp_bonus += 0.12 * guzzling
-        
-        # Enhancer bottoms XP bonus
-        if USER_CONFIG.get('enhancer_bot_level'):
-            base = self._get_noncombat_stat('/items/enhancers_bottoms', 'enhancingExperience')
-            xp_bonus += base * ENHANCE_BONUS[USER_CONFIG['enhancer_bot_level']]
-        
-        # Philosopher's necklace (skilling XP, 5x scaling)
-        if USER_CONFIG.get('philo_neck_level'):
-            base = self._get_noncombat_stat('/items/philosophers_necklace', 'skillingExperience')
-            xp_bonus += base * (((ENHANCE_BONUS[USER_CONFIG['philo_neck_level']] - 1) * 5) + 1)
-        
-        # Experience buff
-        if USER_CONFIG.get('experience_buff_level'):
-            xp_bonus += 0.195 + USER_CONFIG['experience_buff_level'] * 0.005
-        
-        return base_xp * (1 + xp_bonus)
+        return self.profile.xp_per_action(item_level, enhance_level)
     
     def get_vendor_price(self, hrid):
         """Get vendor sell price for an item."""
         item = self.item_detail_map.get(hrid, {})
         return item.get('sellPrice', 0)
     
-    def get_crafting_cost(self, hrid, market_data, mode=PriceMode.MIDPOINT, depth=0):
-        """Calculate the crafting cost of an item (recursive).
+    def get_recipe(self, hrid):
+        """Get the production action that crafts hrid, or None if it is not crafted.
         
-        Uses pessimistic pricing for materials regardless of mode.
+        Only equipment and the philosopher's mirror are priced as crafts.
         """
-        if depth > 10:
-            return 0
-        if hrid == '/items/coin':
-            return 1
-        
         item = self.item_detail_map.get(hrid, {})
         category = item.get('categoryHrid', '')
-        
-        # Only calculate crafting cost for equipment and special items
         if category != '/item_categories/equipment' and hrid != '/items/philosophers_mirror':
-            return 0
-        
-        # Find the crafting action for this item
-        action = None
-        for act in self.action_detail_map.values():
-            if (act.get('function') == '/action_functions/production' and
-                act.get('outputItems') and
-                act['outputItems'][0].get('itemHrid') == hrid):
-                action = act
-                break
-        
-        if not action:
-            return 0
-        
-        cost = 0
-        artisan_mult = self.get_artisan_tea_multiplier()
+            return None
+        return self.recipe_index.get(hrid)
+    
+    def get_acquisition_table(self, market_data):
+        """Get the cheapest-acquisition table for a market snapshot (see acquisition.py).
         
-        # Add input materials cost (affected by artisan tea)
-        # Always use PESSIMISTIC for crafting costs (buy at ask)
-        for input_item in action.get('inputItems', []):
-            input_hrid = input_item['itemHrid']
-            count = input_item['count'] * artisan_mult
-            
-            # Get ask price for materials
-            input_price = self._get_buy_price(input_hrid, 0, market_data, mode)
-            if input_price <= 0:
-                input_price = self.get_crafting_cost(input_hrid, market_data, mode, depth + 1)
-            if input_price <= 0:
-                input_price = self.get_vendor_price(input_hrid)
-            cost += count * input_price
-        
-        # Add upgrade item cost (NOT affected by artisan tea - it's the base item)
-        upgrade_hrid = action.get('upgradeItemHrid', '')
-        if upgrade_hrid:
-            upgrade_price = self._get_buy_price(upgrade_hrid, 0, market_data, mode)
-            if upgrade_price <= 0:
-                upgrade_price = self.get_crafting_cost(upgrade_hrid, market_data, mode, depth + 1)
-            if upgrade_price <= 0:
-                upgrade_price = self.get_vendor_price(upgrade_hrid)
-            cost += upgrade_price
+        Built once per snapshot, game data and artisan tea multiplier, and
+        memoized on the snapshot itself.
+        """
+        snapshot = self.get_snapshot(market_data)
+        key = (str(self.game_data_path), self.game_version, self.get_artisan_tea_multiplier())
+        table = snapshot.acquisition.get(key)
+        if table is None:
+            table = self._build_acquisition_table(snapshot)
+            snapshot.acquisition[key] = table
+        return table
+    
+    def _build_acquisition_table(self, snapshot):
+        from acquisition import build_acquisition_table
+        return build_acquisition_table(self, snapshot, list(PriceMode))
+    
+    def get_crafting_cost(self, hrid, market_data, mode=PriceMode.MIDPOINT):
+        """Get the crafting cost of an item, 0 if it is not crafted.
         
-        return cost
+        Every recipe input is priced at its own cheapest acquisition (market,
+        craft or vendor), read from the acquisition table.
+        """
+        if hrid == '/items/coin':
+            return 1
+        return self.get_acquisition_table(market_data).craft_cost(hrid, mode)
     
     def _get_buy_price(self, hrid, enhancement_level, market_data, mode=PriceMode.MIDPOINT):
         """Get market price for BUYING an item (what you'd pay)."""
         if hrid == '/items/coin':
             return 1
         
-        market = market_data.get('marketData', {})
-        item_market = market.get(hrid, {})
-        level_data = item_market.get(str(enhancement_level), {})
-        
-        ask = level_data.get('a', -1)
-        bid = level_data.get('b', -1)
+        ask, bid = self.get_snapshot(market_data).quote(hrid, enhancement_level)
         
         if ask == -1 and bid == -1:
             return 0
@@ -329,8 +646,9 @@ class EnhancementCalculator:
     def get_item_price(self, hrid, enhancement_level, market_data, mode=PriceMode.MIDPOINT):
         """Get price for buying an item.
         
-        For craftable items, uses LOWER of market price or crafting cost.
-        Falls back to vendor price if no market/craft price.
+        +0 prices come from the acquisition table: the LOWER of market price
+        or crafting cost, falling back to vendor price if neither exists.
+        Enhanced levels use the market price with the same vendor fallback.
         
         Returns (price, source) tuple where source is 'market', 'craft', or 'vendor'.
         """
@@ -341,23 +659,19 @@ class EnhancementCalculator:
         if 'trainee' in hrid and 'charm' in hrid:
             return 250000, 'vendor'
         
-        market_price = self._get_buy_price(hrid, enhancement_level, market_data, mode)
-        
-        # For +0 items, check crafting cost
         if enhancement_level == 0:
-            crafting_cost = self.get_crafting_cost(hrid, market_data, mode)
-            
-            if market_price > 0 and crafting_cost > 0:
-                # Use LOWER of market or craft
-                if crafting_cost < market_price:
-                    return crafting_cost, 'craft'
-                else:
-                    return market_price, 'market'
-            elif market_price > 0:
-                return market_price, 'market'
-            elif crafting_cost > 0:
-                return crafting_cost, 'craft'
-        elif market_price > 0:
+            return self.get_acquisition_table(market_data).lookup(hrid, mode)
+        
+        cache = self._get_price_cache(market_data)
+        cache_key = ('item', hrid, enhancement_level, mode, self.get_artisan_tea_multiplier())
+        if cache_key not in cache:
+            cache[cache_key] = self._resolve_item_price(hrid, enhancement_level, market_data, mode)
+        return cache[cache_key]
+    
+    def _resolve_item_price(self, hrid, enhancement_level, market_data, mode):
+        """Resolve the (price, source) pair behind get_item_price for enhanced levels."""
+        market_price = self._get_buy_price(hrid, enhancement_level, market_data, mode)
+        if market_price > 0:
             return market_price, 'market'
         
         # Fallback to vendor price
@@ -372,12 +686,7 @@ class EnhancementCalculator:
         if hrid == '/items/coin':
             return 1
         
-        market = market_data.get('marketData', {})
-        item_market = market.get(hrid, {})
-        level_data = item_market.get(str(enhancement_level), {})
-        
-        ask = level_data.get('a', -1)
-        bid = level_data.get('b', -1)
+        ask, bid = self.get_snapshot(market_data).quote(hrid, enhancement_level)
         
         if ask == -1 and bid == -1:
             return 0
@@ -406,68 +715,72 @@ class EnhancementCalculator:
     
     def get_player_stats(self):
         """Get all computed player stats for display."""
-        guzzling = self.get_guzzling_bonus()
-        enhancer_bonus = self.get_enhancer_bonus()
-        achievement_bonus = USER_CONFIG.get('achievement_success_bonus', 0)
+        profile = self.profile
+        config = profile.config
+        guzzling = profile.guzzling
         
         # Tea speed
         tea_speed = 0
         tea_name = None
-        if USER_CONFIG.get('tea_ultra_enhancing'):
+        if config.get('tea_ultra_enhancing'):
             tea_speed = 6 * guzzling
             tea_name = 'Ultra Enhancing'
-        elif USER_CONFIG.get('tea_super_enhancing'):
+        elif config.get('tea_super_enhancing'):
             tea_speed = 4 * guzzling
             tea_name = 'Super Enhancing'
-        elif USER_CONFIG.get('tea_enhancing'):
+        elif config.get('tea_enhancing'):
             tea_speed = 2 * guzzling
             tea_name = 'Enhancing'
         
-        # Gear speed bonuses
-        gloves_speed = self._get_noncombat_stat('/items/enchanted_gloves', 'enhancingSpeed') * 100 * ENHANCE_BONUS[USER_CONFIG.get('enchanted_gloves_level', 0)] if USER_CONFIG.get('enchanted_gloves_level') else 0
-        top_speed = self._get_noncombat_stat('/items/enhancers_top', 'enhancingSpeed') * 100 * ENHANCE_BONUS[USER_CONFIG.get('enhancer_top_level', 0)] if USER_CONFIG.get('enhancer_top_level') else 0
-        bot_speed = self._get_noncombat_stat('/items/enhancers_bottoms', 'enhancingSpeed') * 100 * ENHANCE_BONUS[USER_CONFIG.get('enhancer_bot_level', 0)] if USER_CONFIG.get('enhancer_bot_level') else 0
-        neck_speed = 0
-        if USER_CONFIG.get('philo_neck_level'):
-            base = self._get_noncombat_stat('/items/philosophers_necklace', 'skillingSpeed')
-            neck_speed = base * 100 * (((ENHANCE_BONUS[USER_CONFIG['philo_neck_level']] - 1) * 5) + 1)
-        
-        buff_speed = 19.5 + USER_CONFIG.get('enhancing_buff_level', 0) * 0.5 if USER_CONFIG.get('enhancing_buff_level') else 0
-        
-        artisan_reduction = (1 - self.get_artisan_tea_multiplier()) * 100
+        artisan_reduction = (1 - profile.artisan_multiplier) * 100
         
         return {
-            'enhancing_level': USER_CONFIG['enhancing_level'],
-            'effective_level': self.get_effective_level(),
-            'observatory': USER_CONFIG['observatory_level'],
+            'enhancing_level': config['enhancing_level'],
+            'effective_level': profile.effective_level,
+            'observatory': profile.observatory,
             'guzzling_bonus': guzzling,
-            'enhancer': USER_CONFIG['enhancer'].replace('_', ' ').title(),
-            'enhancer_level': USER_CONFIG['enhancer_level'],
-            'enhancer_success': enhancer_bonus,
-            'achievement_success': achievement_bonus,
-            'total_success_bonus': enhancer_bonus + achievement_bonus,
-            'gloves_level': USER_CONFIG.get('enchanted_gloves_level', 0),
-            'gloves_speed': gloves_speed,
-            'top_level': USER_CONFIG.get('enhancer_top_level', 0),
-            'top_speed': top_speed,
-            'bot_level': USER_CONFIG.get('enhancer_bot_level', 0),
-            'bot_speed': bot_speed,
-            'neck_level': USER_CONFIG.get('philo_neck_level', 0),
-            'neck_speed': neck_speed,
-            'charm_level': USER_CONFIG.get('charm_level', 0),
-            'charm_tier': USER_CONFIG.get('charm_tier', ''),
-            'buff_level': USER_CONFIG.get('enhancing_buff_level', 0),
-            'buff_speed': buff_speed,
+            'enhancer': config['enhancer'].replace('_', ' ').title(),
+            'enhancer_level': config['enhancer_level'],
+            'enhancer_success': profile.enhancer_bonus,
+            'achievement_success': profile.achievement_bonus,
+            'total_success_bonus': profile.enhancer_bonus + profile.achievement_bonus,
+            'gloves_level': config.get('enchanted_gloves_level', 0),
+            'gloves_speed': profile.gloves_speed,
+            'top_level': config.get('enhancer_top_level', 0),
+            'top_speed': profile.top_speed,
+            'bot_level': config.get('enhancer_bot_level', 0),
+            'bot_speed': profile.bot_speed,
+            'neck_level': config.get('philo_neck_level', 0),
+            'neck_speed': profile.neck_speed,
+            'charm_level': config.get('charm_level', 0),
+            'charm_tier': config.get('charm_tier', ''),
+            'buff_level': config.get('enhancing_buff_level', 0),
+            'buff_speed': profile.buff_speed,
             'tea_name': tea_name,
             'tea_speed': tea_speed,
-            'tea_blessed': USER_CONFIG.get('tea_blessed', False),
-            'tea_wisdom': USER_CONFIG.get('tea_wisdom', False),
-            'artisan_tea': USER_CONFIG.get('artisan_tea', False),
+            'tea_blessed': config.get('tea_blessed', False),
+            'tea_wisdom': config.get('tea_wisdom', False),
+            'artisan_tea': config.get('artisan_tea', False),
             'artisan_reduction': artisan_reduction,
         }
     
-    def calculate_enhancement_cost(self, item_hrid, target_level, market_data, mode=PriceMode.MIDPOINT):
-        """Calculate expected enhancement cost using Markov chain."""
+    def get_enhancement_inputs(self, item_hrid, market_data, mode=PriceMode.MIDPOINT):
+        """Get the priced inputs of enhancing an item, independent of target level.
+        
+        Returns a dict with item_level, mat_hrids, mat_prices [(count, price)],
+        coin_cost, base price/source and the cheapest protection, or None if the
+        item is unknown or has no priced protection option. Results are
+        memoized per snapshot and shared by every target level; treat them
+        as read-only.
+        """
+        cache = self._get_price_cache(market_data)
+        cache_key = ('inputs', item_hrid, mode, self.get_artisan_tea_multiplier())
+        if cache_key not in cache:
+            cache[cache_key] = self._resolve_enhancement_inputs(item_hrid, market_data, mode)
+        return cache[cache_key]
+    
+    def _resolve_enhancement_inputs(self, item_hrid, market_data, mode):
+        """Build the get_enhancement_inputs dict."""
         item = self.item_detail_map.get(item_hrid, {})
         if not item:
             return None
@@ -476,11 +789,10 @@ class EnhancementCalculator:
         enhancement_costs = item.get('enhancementCosts', [])
         
         # Parse enhancement costs - NO reduction on enhancement materials
-        mat_costs = []
+        mat_hrids = []
+        mat_prices = []
         coin_cost = 0
         
-        # Build detailed materials list
-        materials_detail = []
         for cost in enhancement_costs:
             if cost['itemHrid'] == '/items/coin':
                 coin_cost = cost['count']
@@ -488,13 +800,51 @@ class EnhancementCalculator:
                 # Enhancement materials have NO reduction (artisan tea only affects crafting)
                 mat_hrid = cost['itemHrid']
                 mat_count = cost['count']
-                mat_costs.append((mat_hrid, mat_count))
+                mat_hrids.append(mat_hrid)
+                mat_prices.append((mat_count, self.get_full_item_price(mat_hrid, market_data, mode)))
         
-        # Get material prices and build detail
-        mat_prices = []
-        for hrid, count in mat_costs:
-            price = self.get_full_item_price(hrid, market_data, mode)
-            mat_prices.append((count, price))
+        # Get base item price
+        base_price, base_source = self.get_item_price(item_hrid, 0, market_data, mode)
+        
+        # Get protection options
+        mirror_price = self.get_full_item_price('/items/mirror_of_protection', market_data, mode)
+        
+        protect_hrids = item.get('protectionItemHrids', [])
+        protect_options = [('/items/mirror_of_protection', mirror_price)]
+        protect_options.append((item_hrid, base_price))
+        
+        for phrid in protect_hrids:
+            if '_refined' not in phrid:
+                pprice = self.get_full_item_price(phrid, market_data, mode)
+                if pprice > 0:
+                    protect_options.append((phrid, pprice))
+        
+        # Find cheapest valid protection
+        valid_protects = [(h, p) for h, p in protect_options if p > 0]
+        if not valid_protects:
+            return None
+        
+        cheapest_protect = min(valid_protects, key=lambda x: x[1])
+        protect_hrid = cheapest_protect[0]
+        protect_price = cheapest_protect[1]
+        protect_name = self.item_detail_map.get(protect_hrid, {}).get('name', protect_hrid.split('/')[-1])
+        
+        return {
+            'item_level': item_level,
+            'mat_hrids': mat_hrids,
+            'mat_prices': mat_prices,
+            'coin_cost': coin_cost,
+            'base_price': base_price,
+            'base_source': base_source,
+            'protect_hrid': protect_hrid,
+            'protect_price': protect_price,
+            'protect_name': protect_name,
+        }
+    
+    def get_enhancement_detail(self, item_hrid, inputs, market_data, mode=PriceMode.MIDPOINT):
+        """Get display-only detail for an item: material list, alternative base price, craft materials."""
+        materials_detail = []
+        for hrid, (count, price) in zip(inputs['mat_hrids'], inputs['mat_prices']):
             mat_name = self.item_detail_map.get(hrid, {}).get('name', hrid.split('/')[-1])
             materials_detail.append({
                 'hrid': hrid,
@@ -503,10 +853,8 @@ class EnhancementCalculator:
                 'price': price,
             })
         
-        # Get base item price and alternative
-        base_price, base_source = self.get_item_price(item_hrid, 0, market_data, mode)
-        
         # Get alternative price (market if craft, craft if market)
+        base_source = inputs['base_source']
         market_price = self._get_buy_price(item_hrid, 0, market_data, mode)
         craft_price = self.get_crafting_cost(item_hrid, market_data, mode)
         
@@ -525,127 +873,512 @@ class EnhancementCalculator:
         if craft_price > 0:
             craft_materials = self._get_crafting_materials(item_hrid, market_data, mode)
         
-        # Get protection options
-        mirror_price = self.get_full_item_price('/items/mirror_of_protection', market_data, mode)
+        return {
+            'materials': materials_detail,
+            'alt_price': alt_price,
+            'alt_source': alt_source,
+            'craft_materials': craft_materials,
+        }
+    
+    def optimize_protection(self, item_hrid, market_data, mode=PriceMode.MIDPOINT, target_levels=None):
+        """Get the cheapest per-level protection policy for every target of an item.
         
-        protect_hrids = item.get('protectionItemHrids', [])
-        protect_options = [('/items/mirror_of_protection', mirror_price)]
-        protect_options.append((item_hrid, base_price))
+        Returns a list aligned with target_levels (default +1..+20) of
+        _optimize_protection results, or None without priced inputs.
+        """
+        if target_levels is None:
+            target_levels = range(1, len(SUCCESS_RATE) + 1)
+        inputs = self.get_enhancement_inputs(item_hrid, market_data, mode)
+        if not inputs:
+            return None
+        return self._optimize_protection(list(target_levels), inputs)
+    
+    def _optimize_protection(self, target_levels, inputs):
+        """Choose, for every level separately, whether to protect it.
+        
+        Every protection item has the same effect (a failure drops one level
+        instead of resetting), so the per-level item choice is always the
+        cheapest one and a policy is the set of protected levels. The
+        threshold search only covers the sets "every level >= protect_at".
+        
+        With V the expected remaining cost from each level, a failure at i
+        should be protected exactly when protect_price + V[i-1] < V[0]. The
+        item level's start table already holds V for every threshold policy
+        (costs are linear in prices), so the best threshold is priced for
+        all targets at once and checked against that condition. A threshold
+        that passes is optimal over all policies, with no further solve.
+        Targets that fail the check continue by policy iteration
+        (_iterate_protection_policy) from the improved policy.
+        
+        Returns a list aligned with target_levels of dicts with actions,
+        protect_count, mat_cost, total_cost, total_xp, protect_at and
+        'protect_levels' (the protected levels, ascending). 'protect_at' is
+        the lowest protected level, or the target when nothing is protected.
+        Targets below +2 give None.
+        
+        The optimal policy is the same from every start level, so each result
+        also has 'starts': a (4, 20) array of (actions, protect_count,
+        mat_cost, total_xp) for the policy started from +0..+19, NaN from the
+        target up (see arbitrage).
+        """
+        protect_price = inputs['protect_price']
+        per_attempt = sum(count * price for count, price in inputs['mat_prices']) + inputs['coin_cost']
+        columns = np.array(target_levels) - 1
+        table = self._load_start_table(inputs['item_level'])
+        
+        # Cheapest threshold from +0, then that threshold's rows from every start level
+        cost = table[:2, 0, columns]
+        cost = per_attempt * cost[0] + protect_price * cost[1]
+        best = np.argmin(np.where(np.isnan(cost), np.inf, cost), axis=1)
+        starts = table[:, :, columns, best][[0, 1, 0, 2]]
+        starts[2] *= per_attempt
+        starts[2] += protect_price * starts[1]
+        starts[3] *= self.profile.xp_multiplier
+        
+        # NaN values from the target up never trigger protection
+        levels = np.arange(len(SUCCESS_RATE) + 1)
+        transient = levels < columns[:, None] + 1
+        value = np.zeros((len(target_levels), len(levels)))
+        value[:, :-1] = starts[2].T
+        protect = transient & (levels >= best[:, None] + 2)
+        improved = self._improve_protection(value, protect, transient, protect_price)
+        
+        base_price = inputs['base_price']
+        certified = (improved == protect).all(axis=1).tolist()
+        row = zip(*starts[:, 0].tolist())
+        results = []
+        pending = []
+        for t, (target, p, column, start) in enumerate(zip(target_levels, best.tolist(), row, starts.transpose(2, 0, 1))):
+            if target < 2:
+                results.append(None)
+            elif certified[t]:
+                results.append({
+                    'actions': column[0],
+                    'protect_count': column[1],
+                    'mat_cost': column[2],
+                    'total_cost': base_price + column[2],
+                    'total_xp': column[3],
+                    'protect_at': p + 2,
+                    'protect_levels': list(range(p + 2, target)),
+                    'starts': start,
+                })
+            else:
+                results.append(None)
+                pending.append(t)
         
-        for phrid in protect_hrids:
-            if '_refined' not in phrid:
-                pprice = self.get_full_item_price(phrid, market_data, mode)
-                if pprice > 0:
-                    protect_options.append((phrid, pprice))
+        if pending:
+            iterated = self._iterate_protection_policy(
+                [target_levels[t] for t in pending], improved[pending], inputs
+            )
+            for t, result in zip(pending, iterated):
+                results[t] = result
+        return results
+    
+    def _improve_protection(self, value, protect, transient, protect_price):
+        """One policy improvement step: protect each level whose drop beats a reset.
         
-        # Find cheapest valid protection
-        valid_protects = [(h, p) for h, p in protect_options if p > 0]
-        if not valid_protects:
-            return None
+        value and protect are (target, level) arrays for the current policy.
+        Near-ties keep the current choice, so policy iteration cannot cycle.
+        """
+        # A failure at level i >= 2 drops to i - 1 if protected, else resets to 0
+        reset = value[:, :1]
+        protected = protect_price + value[:, 1:-1]
+        tie = np.abs(protected - reset) <= 1e-9 * np.abs(reset)
+        improved = np.zeros_like(protect)
+        improved[:, 2:] = transient[:, 2:] & np.where(tie, protect[:, 2:], protected < reset)
+        return improved
+    
+    def _iterate_protection_policy(self, target_levels, protect, inputs):
+        """Policy iteration from a (target, level) protect mask to the optimal policy.
         
-        cheapest_protect = min(valid_protects, key=lambda x: x[1])
-        protect_hrid = cheapest_protect[0]
-        protect_price = cheapest_protect[1]
-        protect_name = self.item_detail_map.get(protect_hrid, {}).get('name', protect_hrid.split('/')[-1])
+        Each round evaluates every target's policy with one batched linear
+        solve (chains padded to +20, levels at or above a target cost
+        nothing) and applies _improve_protection until nothing changes.
+        Returns _optimize_protection results for target_levels.
+        """
+        item_level = inputs['item_level']
+        total_bonus, use_blessed, guzzling = self._get_chain_params(item_level)
+        protect_price = inputs['protect_price']
+        per_attempt = sum(count * price for count, price in inputs['mat_prices']) + inputs['coin_cost']
+        
+        targets = np.array(target_levels)[:, None]
+        size = len(SUCCESS_RATE) + 1
+        levels = np.arange(size)
+        transient = levels < targets
+        
+        rates = np.minimum(np.array(SUCCESS_RATE + [0]) / 100.0 * total_bonus, 1.0)
+        success = np.where(transient, rates, 0.0)
+        blessed = np.zeros_like(success)
+        if use_blessed:
+            blessed = np.where(levels + 2 <= targets, success * 0.01 * guzzling, 0.0)
+        fail = np.where(transient, 1.0 - rates, 0.0)
+        xp = np.array([base_xp_per_action(item_level, i) for i in range(size)])
+        xp = np.where(transient, xp * (success + 0.1 * fail), 0.0)
+        
+        # Success moves of every chain; failures are added per policy
+        advance = np.zeros((len(target_levels), size, size))
+        advance[:, levels[:-1], levels[:-1] + 1] = (success - blessed)[:, :-1]
+        advance[:, levels[:-2], levels[:-2] + 2] = blessed[:, :-2]
+        identity = np.eye(size)
+        
+        for _ in range(size):
+            protected_fail = np.where(protect, fail, 0.0)
+            Q = advance.copy()
+            Q[:, :, 0] += fail - protected_fail
+            Q[:, levels[1:], levels[:-1]] += protected_fail[:, 1:]
+            
+            # Columns: remaining cost, attempts, protections, XP
+            rewards = np.stack([per_attempt * transient + protect_price * protected_fail,
+                                transient.astype(float), protected_fail, xp], axis=2)
+            try:
+                solution = np.linalg.solve(identity - Q, rewards)
+            except np.linalg.LinAlgError:
+                if self.stats is not None:
+                    self.stats.count('pinv_fallbacks')
+                solution = np.linalg.pinv(identity - Q) @ rewards
+            policy = protect
+            
+            protect = self._improve_protection(solution[:, :, 0], policy, transient, protect_price)
+            if np.array_equal(protect, policy):
+                break
         
-        total_bonus = self.get_total_bonus(item_level)
-        attempt_time = self.get_attempt_time(item_level)
+        base_price = inputs['base_price']
+        xp_multiplier = self.profile.xp_multiplier
+        results = []
+        # (target, field, start) in the 'starts' layout, NaN from the target up
+        starts = solution[:, :-1, [1, 2, 0, 3]].transpose(0, 2, 1) * np.array([1.0, 1.0, 1.0, xp_multiplier])[:, None]
+        starts = np.where(transient[:, None, :-1], starts, np.nan)
+        for t, target in enumerate(target_levels):
+            mat_cost, attempts, protect_count, total_xp = solution[t, 0].tolist()
+            protect_levels = levels[policy[t]].tolist()
+            results.append({
+                'actions': attempts,
+                'protect_count': protect_count,
+                'mat_cost': mat_cost,
+                'total_cost': base_price + mat_cost,
+                'total_xp': total_xp * xp_multiplier,
+                'protect_at': protect_levels[0] if protect_levels else target,
+                'protect_levels': protect_levels,
+                'starts': starts[t],
+            })
+        return results
+    
+    def _get_cached_detail(self, item_hrid, market_data, mode):
+        """get_enhancement_detail for an item's memoized inputs, memoized alongside them."""
+        cache = self._get_price_cache(market_data)
+        cache_key = ('detail', item_hrid, mode, self.get_artisan_tea_multiplier())
+        if cache_key not in cache:
+            inputs = self.get_enhancement_inputs(item_hrid, market_data, mode)
+            cache[cache_key] = self.get_enhancement_detail(item_hrid, inputs, market_data, mode)
+        return cache[cache_key]
+    
+    def _get_cached_policies(self, item_hrid, inputs, market_data, mode):
+        """_optimize_protection for every target +1..+20 of an item's memoized inputs, memoized alongside them."""
+        cache = self._get_price_cache(market_data)
+        item_level = inputs['item_level']
+        cache_key = ('policies', item_hrid, mode, self.get_artisan_tea_multiplier(),
+                     tuple(self._get_chain_params(item_level)), self.profile.xp_multiplier)
+        if cache_key not in cache:
+            cache[cache_key] = self._optimize_protection(list(range(1, len(SUCCESS_RATE) + 1)), inputs)
+        return cache[cache_key]
+    
+    def calculate_enhancement_cost(self, item_hrid, target_level, market_data, mode=PriceMode.MIDPOINT):
+        """Calculate expected enhancement cost using Markov chain."""
+        inputs = self.get_enhancement_inputs(item_hrid, market_data, mode)
+        if not inputs:
+            return None
         
-        # Check for blessed tea (+1% chance for double success)
-        use_blessed = USER_CONFIG.get('tea_blessed', False)
-        guzzling = self.get_guzzling_bonus() if use_blessed else 1
+        item_level = inputs['item_level']
+        attempt_time = self.get_attempt_time(item_level)
         
-        # Find optimal protection level
+        # Find the optimal per-level protection policy
         best_result = None
-        best_total = float('inf')
-        
-        for prot_level in range(2, target_level + 1):
-            result = self._markov_enhance(
-                target_level, prot_level, total_bonus, 
-                mat_prices, coin_cost, protect_price, base_price,
-                use_blessed, guzzling, item_level
-            )
-            
-            if result['total_cost'] < best_total:
-                best_total = result['total_cost']
-                best_result = result
-                best_result['protect_at'] = prot_level
+        if target_level >= 2:
+            best_result = dict(self._get_cached_policies(item_hrid, inputs, market_data, mode)[target_level - 1])
         
         if best_result:
+            detail = self.get_enhancement_detail(item_hrid, inputs, market_data, mode)
             best_result['item_hrid'] = item_hrid
             best_result['item_level'] = item_level
-            best_result['protect_price'] = protect_price
-            best_result['protect_hrid'] = protect_hrid
-            best_result['protect_name'] = protect_name
-            best_result['base_price'] = base_price
-            best_result['base_source'] = base_source
-            best_result['alt_price'] = alt_price
-            best_result['alt_source'] = alt_source
+            best_result['protect_price'] = inputs['protect_price']
+            best_result['protect_hrid'] = inputs['protect_hrid']
+            best_result['protect_name'] = inputs['protect_name']
+            best_result['base_price'] = inputs['base_price']
+            best_result['base_source'] = inputs['base_source']
+            best_result['alt_price'] = detail['alt_price']
+            best_result['alt_source'] = detail['alt_source']
             best_result['attempt_time'] = attempt_time
-            best_result['materials'] = materials_detail
-            best_result['coin_cost'] = coin_cost
-            best_result['craft_materials'] = craft_materials
+            best_result['materials'] = detail['materials']
+            best_result['coin_cost'] = inputs['coin_cost']
+            best_result['craft_materials'] = detail['craft_materials']
         
         return best_result
     
     def _get_crafting_materials(self, hrid, market_data, mode=PriceMode.MIDPOINT):
-        """Get the list of crafting materials for an item."""
-        item = self.item_detail_map.get(hrid, {})
-        category = item.get('categoryHrid', '')
-        
-        if category != '/item_categories/equipment' and hrid != '/items/philosophers_mirror':
-            return []
-        
-        # Find the crafting action for this item
-        action = None
-        for act in self.action_detail_map.values():
-            if (act.get('function') == '/action_functions/production' and
-                act.get('outputItems') and
-                act['outputItems'][0].get('itemHrid') == hrid):
-                action = act
-                break
-        
+        """Get the list of crafting materials for an item, priced like get_crafting_cost."""
+        action = self.get_recipe(hrid)
         if not action:
             return []
         
         materials = []
         artisan_mult = self.get_artisan_tea_multiplier()
+        table = self.get_acquisition_table(market_data)
         
         for input_item in action.get('inputItems', []):
             input_hrid = input_item['itemHrid']
             count = input_item['count'] * artisan_mult
-            price = self._get_buy_price(input_hrid, 0, market_data, mode)
-            if price <= 0:
-                price = self.get_vendor_price(input_hrid)
+            price, source = table.lookup(input_hrid, mode)
             mat_name = self.item_detail_map.get(input_hrid, {}).get('name', input_hrid.split('/')[-1])
             materials.append({
                 'hrid': input_hrid,
                 'name': mat_name,
                 'count': count,
                 'price': price,
+                'source': source,
             })
         
         # Add upgrade item if present
         upgrade_hrid = action.get('upgradeItemHrid', '')
         if upgrade_hrid:
-            upgrade_price = self._get_buy_price(upgrade_hrid, 0, market_data, mode)
-            if upgrade_price <= 0:
-                upgrade_price = self.get_vendor_price(upgrade_hrid)
+            upgrade_price, upgrade_source = table.lookup(upgrade_hrid, mode)
             upgrade_name = self.item_detail_map.get(upgrade_hrid, {}).get('name', upgrade_hrid.split('/')[-1])
             materials.append({
                 'hrid': upgrade_hrid,
                 'name': upgrade_name,
                 'count': 1,
                 'price': upgrade_price,
+                'source': upgrade_source,
                 'is_upgrade': True,
             })
         
         return materials
     
-    def _markov_enhance(self, stop_at, protect_at, total_bonus, mat_prices, coin_cost, protect_price, base_price, use_blessed=False, guzzling=1, item_level=1):
-        """Use Markov chain to calculate expected enhancement attempts."""
-        n = stop_at + 1
+    def _get_chain_params(self, item_level):
+        """Get the (total_bonus, use_blessed, guzzling) gear inputs of a chain."""
+        profile = self.profile
+        return profile.success_bonus(item_level), profile.use_blessed, profile.blessed_guzzling
+    
+    def _get_chain_table(self, item_level):
+        """Get chain solutions for every target and protection level of an item level.
+        
+        Returns an array of shape (3, 20, 19) indexed by [field, target - 1,
+        protect_at - 2] with fields (actions, protect_count, total_xp), NaN
+        where protect_at > target. Tables are cached per item level and gear
+        with XP before gear bonuses; the profile's XP multiplier is applied here.
+        """
+        total_bonus, use_blessed, guzzling = self._get_chain_params(item_level)
+        key = (item_level, total_bonus, use_blessed, guzzling)
+        table = self._chain_tables.get(key)
+        if table is None:
+            self._prime_chain_tables([item_level])
+            table = self._chain_tables[key]
+        return table * np.array([1.0, 1.0, self.profile.xp_multiplier])[:, None, None]
+    
+    def _get_start_table(self, item_level):
+        """Get chain solutions for every start level, target and protection level.
+        
+        Like _get_chain_table with a start level axis: shape (3, 20, 20, 19)
+        indexed by [field, start_level, target - 1, protect_at - 2], from the
+        rows of each fundamental matrix instead of row 0 only. NaN where
+        start_level >= target or protect_at > target.
+        """
+        table = self._load_start_table(item_level)
+        return table * np.array([1.0, 1.0, self.profile.xp_multiplier])[:, None, None, None]
+    
+    def _load_start_table(self, item_level):
+        """Get the cached start table of an item level, XP before gear bonuses (read-only)."""
+        key = (item_level,) + tuple(self._get_chain_params(item_level))
+        table = self._start_tables.pop(key, None)
+        if table is None:
+            self._prime_chain_tables([item_level], all_starts=True)
+            table = self._start_tables.pop(key)
+        # Reinsert as most recently used
+        self._start_tables[key] = table
+        return table
+    
+    def _prime_chain_tables(self, item_levels, all_starts=False):
+        """Build the chain (or start) table of every item level not yet cached, in one batched pass.
+        
+        Start tables are bounded by START_TABLE_CACHE_SIZE; the tables of
+        item_levels are the most recently built or used ones on return.
+        """
+        cache = self._start_tables if all_starts else self._chain_tables
+        keys = []
+        for item_level in sorted(set(item_levels)):
+            key = (item_level,) + tuple(self._get_chain_params(item_level))
+            if key not in cache:
+                keys.append(key)
+            elif all_starts:
+                cache[key] = cache.pop(key)
+        
+        if keys:
+            for key, table in zip(keys, self._solve_chain_tables(keys, all_starts)):
+                cache[key] = table
+                if all_starts:
+                    # Row 0 of a start table is the chain table; copied so an
+                    # evicted start table is not kept alive through it
+                    self._chain_tables.setdefault(key, table[:, 0].copy())
+        
+        if all_starts:
+            # Evict least recently used start tables, never ones this call needs
+            while len(cache) > max(START_TABLE_CACHE_SIZE, len(set(item_levels))):
+                del cache[next(iter(cache))]
+    
+    def _solve_chain_tables(self, keys, all_starts=False):
+        """Solve the chains to every target +1..+20 for every protection level at once.
+        
+        Each key is (item_level, total_bonus, use_blessed, guzzling). The chain
+        to +(T+1) is the chain to +T with one more transient state, so its
+        fundamental matrix M = (I - Q)^-1 follows from the previous one by a
+        bordered (Schur complement) update instead of a fresh inversion:
+        
+          I - Q' = [[I - Q, u], [v, 1]],  s = 1 - v M u
+          M'     = [[M + (M u)(v M) / s, -M u / s], [-v M / s, 1 / s]]
+        
+        u holds the transitions into the new state (+1 from T-1, blessed +2
+        from T-2) and v its failure transition (to T-1 if protected, else 0).
+        Rows below T-1 are the same in every longer chain; row T-1 only gains
+        its blessed split, which lands beyond the new state. One pass of 19
+        updates, batched over keys and protection levels, yields row 0 of M
+        for all 190 (target, protect_at) chains of every key.
+        
+        Returns an array of shape (len(keys), 3, 20, 19) laid out as in
+        _get_chain_table, with XP before gear bonuses. With all_starts, every
+        row of each M is kept, giving (len(keys), 3, 20, 20, 19) laid out as
+        in _get_start_table; row s is the chain started from +s.
+        """
+        size = len(SUCCESS_RATE)
+        count = len(keys)
+        protect_levels = np.arange(2, size + 1)
+        n_protect = len(protect_levels)
+        
+        total_bonus = np.array([key[1] for key in keys], dtype=float)[:, None]
+        use_blessed = np.array([bool(key[2]) for key in keys])[:, None]
+        guzzling = np.array([key[3] for key in keys], dtype=float)[:, None]
+        item_level = np.array([key[0] for key in keys], dtype=float)[:, None]
+        
+        levels = np.arange(size)
+        success = np.minimum(np.array(SUCCESS_RATE) / 100.0 * total_bonus, 1.0)
+        blessed = np.where(use_blessed, success * 0.01 * guzzling, 0.0)
+        fail = 1.0 - success
+        xp_weight = 1.4 * (1 + levels) * (10 + item_level) * (success + 0.1 * fail)
+        # Failures counted as protections, per (key, protect level, level)
+        protected_fail = np.where(levels[None, :] >= protect_levels[:, None], fail[:, None, :], 0.0)
+        # Per-visit weights of (actions, protect_count, total_xp), per (key, protect level, level)
+        weights = np.stack(np.broadcast_arrays(1.0, protected_fail, xp_weight[:, None, :]), axis=3)
+        
+        starts = size if all_starts else 1
+        tables = np.full((count, 3, starts, size, n_protect), np.nan)
+        
+        # Chain to +1: a single state whose failures return to itself
+        M = np.zeros((count, n_protect, size, size))
+        M[:, :, 0, 0] = 1.0 / success[:, :1]
+        
+        batch = np.arange(n_protect)
+        for T in range(1, size):
+            u = np.zeros((count, T))
+            u[:, T - 1] = -(success[:, T - 1] - blessed[:, T - 1])
+            if T >= 2:
+                u[:, T - 2] = -blessed[:, T - 2]
+            destination = np.where(T >= protect_levels, T - 1, 0)
+            
+            Mu = np.einsum('kpij,kj->kpi', M[:, :, :T, :T], u)
+            vM = -fail[:, T, None, None] * M[:, batch, destination, :T]
+            # s = 1 + fail * (M u)[dest], where -(M u)[j] is the chance of
+            # entering +T rather than jumping past it; this form avoids the
+            # cancellation on chains that need billions of attempts
+            past = blessed[:, T - 1, None] * M[:, batch, destination, T - 1]
+            s = success[:, T, None] + fail[:, T, None] * past
+            
+            M[:, :, :T, :T] += Mu[..., :, None] * vM[..., None, :] / s[..., None, None]
+            M[:, :, :T, T] = -Mu / s[..., None]
+            M[:, :, T, :T] = -vM / s[..., None]
+            M[:, :, T, T] = 1.0 / s
+            
+            # Rows of the chain to +(T+1), one per start level below it
+            rows = min(starts, T + 1)
+            tables[:, :, :rows, T] = (M[:, :, :rows, :T + 1] @ weights[:, :, :T + 1]).transpose(0, 3, 2, 1)
+        
+        tables[:, :, :, protect_levels[None, :] - 1 > levels[:, None]] = np.nan
+        return tables if all_starts else tables[:, :, 0]
+    
+    def _markov_enhance(self, stop_at, protect_at, total_bonus, mat_prices, coin_cost, protect_price, base_price, use_blessed=False, guzzling=1, item_level=1, spread=False):
+        """Use Markov chain to calculate expected enhancement attempts.
+        
+        The chain solution is price-independent and shared through the chain
+        cache; only the linear pricing step below runs per call.
+        
+        protect_at is a threshold or a tuple of protected levels (see
+        protected_mask).
+        
+        With spread=True the result also has the standard deviations
+        actions_std, protect_std and cost_std, and the SPREAD_QUANTILES
+        percentiles actions_p10/p50/p90 and cost_p10/p50/p90 (see
+        _get_chain_spread).
+        """
+        attempts, protect_count, total_xp = self._solve_chain(
+            stop_at, protect_at, total_bonus, use_blessed, guzzling, item_level
+        )
+        
+        mat_cost = sum(count * price * attempts for count, price in mat_prices)
+        mat_cost += coin_cost * attempts
+        mat_cost += protect_price * protect_count
+        
+        total_cost = base_price + mat_cost
+        
+        result = {
+            'actions': attempts,
+            'protect_count': protect_count,
+            'mat_cost': mat_cost,
+            'total_cost': total_cost,
+            'total_xp': total_xp,
+        }
+        if not spread:
+            return result
+        
+        # Cost is base + per_attempt * actions + protect_price * protections
+        var_actions, var_protect, covariance, min_actions, action_quantiles = self._get_chain_spread(
+            stop_at, protect_at, total_bonus, use_blessed, guzzling
+        )
+        per_attempt = sum(count * price for count, price in mat_prices) + coin_cost
+        cost_var = (per_attempt * per_attempt * var_actions + protect_price * protect_price * var_protect
+                    + 2 * per_attempt * protect_price * covariance)
+        actions_std = max(var_actions, 0.0) ** 0.5
+        cost_std = max(cost_var, 0.0) ** 0.5
+        result['actions_std'] = actions_std
+        result['protect_std'] = max(var_protect, 0.0) ** 0.5
+        result['cost_std'] = cost_std
+        
+        # Cost percentiles take the standardized action percentiles (the exact
+        # shape of the distribution), floored at the cheapest possible run
+        min_cost = base_price + per_attempt * min_actions
+        for quantile, actions in zip(SPREAD_QUANTILES, action_quantiles):
+            name = f'p{round(quantile * 100)}'
+            z = (actions - attempts) / actions_std if actions_std > 0 else 0.0
+            result['actions_' + name] = actions
+            result['cost_' + name] = max(total_cost + z * cost_std, min_cost)
+        return result
+    
+    def _solve_chain(self, stop_at, protect_at, total_bonus, use_blessed=False, guzzling=1, item_level=1):
+        """Get (actions, protect_count, total_xp) for one enhancement chain.
+        
+        These depend only on item level, target, protection level and gear,
+        never on prices, so solutions are cached and reused across price
+        modes and across items sharing an item level. The cache holds XP
+        before gear bonuses; the profile's XP multiplier is applied here.
+        """
+        key = (item_level, stop_at, protect_at, total_bonus, use_blessed, guzzling)
+        solution = self._chain_cache.get(key)
+        if solution is None:
+            solution = self._solve_chain_matrix(stop_at, protect_at, total_bonus, use_blessed, guzzling, item_level)
+            self._chain_cache[key] = solution
+        attempts, protect_count, base_xp = solution
+        return attempts, protect_count, base_xp * self.profile.xp_multiplier
+    
+    def _get_transition_matrix(self, stop_at, protect_at, total_bonus, use_blessed, guzzling):
+        """Build the transient block Q of a chain (levels 0..stop_at-1; stop_at absorbs)."""
         Q = np.zeros((stop_at, stop_at))
+        protected = protected_mask(protect_at, stop_at).tolist()
         
         for i in range(stop_at):
             success_chance = (SUCCESS_RATE[i] / 100.0) * total_bonus
@@ -662,7 +1395,7 @@ class EnhancementCalculator:
             
             fail_chance = 1.0 - success_chance
             
-            destination = (i - 1) if i >= protect_at else 0
+            destination = (i - 1) if protected[i] else 0
             destination = max(0, destination)
             
             if i + 1 < stop_at:
@@ -670,48 +1403,157 @@ class EnhancementCalculator:
             
             Q[i, destination] += fail_chance
         
+        return Q
+    
+    def _solve_chain_matrix(self, stop_at, protect_at, total_bonus, use_blessed, guzzling, item_level):
+        """Solve one chain via the fundamental matrix M = (I - Q)^-1.
+        
+        Returns (actions, protect_count, total_xp) with XP before gear bonuses.
+        """
+        Q = self._get_transition_matrix(stop_at, protect_at, total_bonus, use_blessed, guzzling)
+        
         I = np.eye(stop_at)
         try:
             M = np.linalg.inv(I - Q)
         except np.linalg.LinAlgError:
+            if self.stats is not None:
+                self.stats.count('pinv_fallbacks')
             M = np.linalg.pinv(I - Q)
         
         attempts = np.sum(M[0, :])
         
         protect_count = 0
-        for i in range(protect_at, stop_at):
+        for i in np.flatnonzero(protected_mask(protect_at, stop_at)).tolist():
             success_chance = (SUCCESS_RATE[i] / 100.0) * total_bonus
             success_chance = min(success_chance, 1.0)
             fail_chance = 1.0 - success_chance
             protect_count += M[0, i] * fail_chance
         
-        mat_cost = sum(count * price * attempts for count, price in mat_prices)
-        mat_cost += coin_cost * attempts
-        mat_cost += protect_price * protect_count
-        
-        total_cost = base_price + mat_cost
-        
         # Calculate total XP (sum of XP at each level weighted by attempts)
         total_xp = 0
         for i in range(stop_at):
             success_chance = (SUCCESS_RATE[i] / 100.0) * total_bonus
             success_chance = min(success_chance, 1.0)
-            xp_per_action = self.get_xp_per_action(item_level, i)
+            xp_per_action = base_xp_per_action(item_level, i)
             # XP = attempts at level * (success_xp + fail_xp)
             # Success gives full XP, fail gives 10%
             total_xp += M[0, i] * xp_per_action * (success_chance + 0.1 * (1 - success_chance))
         
-        return {
-            'actions': attempts,
-            'protect_count': protect_count,
-            'mat_cost': mat_cost,
-            'total_cost': total_cost,
-            'total_xp': total_xp,
-        }
+        return attempts, protect_count, total_xp
+    
+    def _get_chain_spread(self, stop_at, protect_at, total_bonus, use_blessed=False, guzzling=1):
+        """Get (var_actions, var_protect, covariance, min_actions, action_quantiles) for one chain.
+        
+        Like _solve_chain these are price-independent; they do not depend on
+        item level beyond total_bonus, so they are cached per chain shape.
+        action_quantiles holds the SPREAD_QUANTILES percentiles of the number
+        of attempts, and min_actions the fewest attempts any run can take.
+        """
+        key = (stop_at, protect_at, total_bonus, use_blessed, guzzling)
+        spread = self._spread_cache.get(key)
+        if spread is None:
+            spread = self._solve_chain_spread(stop_at, protect_at, total_bonus, use_blessed, guzzling)
+            self._spread_cache[key] = spread
+        return spread
+    
+    def _solve_chain_spread(self, stop_at, protect_at, total_bonus, use_blessed, guzzling):
+        """Second moments and action percentiles of one chain, without simulation.
+        
+        With N = (I - Q)^-1 and r the expected per-attempt count, a count's
+        expected total from every level is t = N r. Its second moment solves
+        the same system with r + 2 E[this attempt's count * later counts]:
+        attempts give N (2 t_A - 1), protections N (r_P + 2 g) with
+        g_i = r_P,i * t_P,i-1 (a protection always lands on i-1), and the
+        cross moment N (t_P + h) with h_i = r_P,i * t_A,i-1.
+        
+        Attempt percentiles are exact: P(actions > n) = e0 Q^n 1, which is
+        decreasing in n, so each percentile is found by a binary descent over
+        Q, Q^2, Q^4, ... (one squaring per doubling of the tail length).
+        """
+        Q = self._get_transition_matrix(stop_at, protect_at, total_bonus, use_blessed, guzzling)
+        A = np.eye(stop_at) - Q
+        
+        success = np.minimum(np.array(SUCCESS_RATE[:stop_at]) / 100.0 * total_bonus, 1.0)
+        protect_rate = np.where(protected_mask(protect_at, stop_at), 1.0 - success, 0.0)
+        
+        try:
+            first = np.linalg.solve(A, np.stack([np.ones(stop_at), protect_rate], axis=1))
+            t_actions, t_protect = first[:, 0], first[:, 1]
+            below_actions = np.concatenate([[0.0], t_actions[:-1]])
+            below_protect = np.concatenate([[0.0], t_protect[:-1]])
+            second = np.linalg.solve(A, np.stack([
+                2 * t_actions - 1,
+                protect_rate + 2 * protect_rate * below_protect,
+                t_protect + protect_rate * below_actions,
+            ], axis=1))
+        except np.linalg.LinAlgError:
+            if self.stats is not None:
+                self.stats.count('pinv_fallbacks')
+            N = np.linalg.pinv(A)
+            t_actions = N.sum(axis=1)
+            t_protect = N @ protect_rate
+            below_actions = np.concatenate([[0.0], t_actions[:-1]])
+            below_protect = np.concatenate([[0.0], t_protect[:-1]])
+            second = np.stack([
+                N @ (2 * t_actions - 1),
+                N @ (protect_rate + 2 * protect_rate * below_protect),
+                N @ (t_protect + protect_rate * below_actions),
+            ], axis=1)
+        
+        mean_actions, mean_protect = t_actions[0], t_protect[0]
+        var_actions = second[0, 0] - mean_actions * mean_actions
+        var_protect = second[0, 1] - mean_protect * mean_protect
+        covariance = second[0, 2] - mean_actions * mean_protect
+        
+        # Q^(2^k) until the survival at that length is below every percentile's tail
+        tail = 1.0 - np.array(SPREAD_QUANTILES)
+        powers = [Q]
+        while powers[-1][0].sum() > tail.min() and len(powers) < 64:
+            powers.append(powers[-1] @ powers[-1])
+        
+        # Largest n with P(actions > n) above the tail, one bit at a time
+        survival = np.zeros((len(tail), stop_at))
+        survival[:, 0] = 1.0
+        counts = np.zeros(len(tail))
+        for k in range(len(powers) - 1, -1, -1):
+            candidate = survival @ powers[k]
+            keep = candidate.sum(axis=1) > tail
+            survival[keep] = candidate[keep]
+            counts[keep] += 2 ** k
+        
+        min_actions = (stop_at + 1) // 2 if use_blessed else stop_at
+        return (float(var_actions), float(var_protect), float(covariance), min_actions,
+                tuple((counts + 1).tolist()))
+    
+    def _get_result_spread(self, inputs, target_level, protect_levels):
+        """Price the cost/time spread of a profit row (ProfitResult.spread) under its protection policy."""
+        item_level = inputs['item_level']
+        total_bonus, use_blessed, guzzling = self._get_chain_params(item_level)
+        result = self._markov_enhance(
+            target_level, protect_argument(protect_levels, target_level), total_bonus,
+            inputs['mat_prices'], inputs['coin_cost'], inputs['protect_price'], inputs['base_price'],
+            use_blessed, guzzling, item_level, spread=True,
+        )
+        days_per_action = self.get_attempt_time(item_level) / 86400
+        return (
+            result['cost_std'], result['cost_p10'], result['cost_p50'], result['cost_p90'],
+            result['actions_std'] * days_per_action, result['actions_p10'] * days_per_action,
+            result['actions_p50'] * days_per_action, result['actions_p90'] * days_per_action,
+        )
     
     def calculate_profit(self, item_hrid, target_level, market_data, mode=PriceMode.PESSIMISTIC):
-        """Calculate profit for enhancing an item to target level."""
-        result = self.calculate_enhancement_cost(item_hrid, target_level, market_data, mode)
+        """Calculate profit for enhancing an item to target level.
+        
+        Returns a ProfitResult; its material and craft breakdown is only
+        built if read.
+        """
+        inputs = self.get_enhancement_inputs(item_hrid, market_data, mode)
+        if not inputs:
+            return None
+        
+        if target_level < 2:
+            return None
+        result = self._get_cached_policies(item_hrid, inputs, market_data, mode)[target_level - 1]
         if not result:
             return None
         
@@ -720,8 +1562,42 @@ class EnhancementCalculator:
         if sell_price <= 0:
             return None
         
-        # Market fee is 2% of sell price
-        market_fee = sell_price * 0.02
+        return self._build_profit_result(item_hrid, target_level, inputs, result, sell_price, market_data, mode)
+    
+    def calculate_all_targets(self, item_hrid, market_data, mode=PriceMode.PESSIMISTIC, target_levels=None):
+        """Calculate profit for enhancing an item to every target level in one pass.
+        
+        Returns a list aligned with target_levels (default +1..+20) of
+        ProfitResult or None, matching calculate_profit for each target. Prices
+        are resolved once and the protection policy of every target comes
+        from one _optimize_protection pass over the item level's start table,
+        so all 20 levels cost about as much as one.
+        """
+        if target_levels is None:
+            target_levels = range(1, len(SUCCESS_RATE) + 1)
+        target_levels = list(target_levels)
+        
+        inputs = self.get_enhancement_inputs(item_hrid, market_data, mode)
+        if not inputs:
+            return [None] * len(target_levels)
+        
+        sell_prices = [self.get_sell_price(item_hrid, target, market_data, mode) for target in target_levels]
+        return self._price_all_targets(item_hrid, inputs, target_levels, sell_prices, market_data, mode)
+    
+    def _price_all_targets(self, item_hrid, inputs, target_levels, sell_prices, market_data, mode):
+        """Price every target of an item under its optimal protection policy (None where sell_price <= 0)."""
+        results = []
+        for target, sell_price, result in zip(target_levels, sell_prices,
+                                              self._optimize_protection(target_levels, inputs)):
+            if sell_price <= 0 or not result or not np.isfinite(result['total_cost']):
+                results.append(None)
+                continue
+            results.append(self._build_profit_result(item_hrid, target, inputs, result, sell_price, market_data, mode))
+        return results
+    
+    def _build_profit_result(self, item_hrid, target_level, inputs, result, sell_price, market_data, mode):
+        """Derive the profit metrics of a priced chain result and wrap them in a ProfitResult."""
+        market_fee = sell_price * MARKET_FEE
         
         profit = sell_price - result['total_cost']
         profit_after_fee = profit - market_fee
@@ -729,51 +1605,100 @@ class EnhancementCalculator:
         roi_after_fee = (profit_after_fee / result['total_cost']) * 100 if result['total_cost'] > 0 else 0
         
         # Calculate per day metrics
-        total_time_hours = result['actions'] * result['attempt_time'] / 3600
+        attempt_time = self.get_attempt_time(inputs['item_level'])
+        total_time_hours = result['actions'] * attempt_time / 3600
         total_time_days = total_time_hours / 24
         
         profit_per_day = profit / total_time_days if total_time_days > 0 else 0
         profit_per_day_after_fee = profit_after_fee / total_time_days if total_time_days > 0 else 0
         xp_per_day = result['total_xp'] / total_time_days if total_time_days > 0 else 0
         
-        return {
-            'item_hrid': item_hrid,
-            'item_name': self.item_detail_map.get(item_hrid, {}).get('name', item_hrid),
-            'target_level': target_level,
-            'base_price': result['base_price'],
-            'base_source': result['base_source'],
-            'alt_price': result['alt_price'],
-            'alt_source': result['alt_source'],
-            'mat_cost': result['mat_cost'],
-            'total_cost': result['total_cost'],
-            'sell_price': sell_price,
-            'market_fee': market_fee,
-            'profit': profit,
-            'profit_after_fee': profit_after_fee,
-            'roi': roi,
-            'roi_after_fee': roi_after_fee,
-            'profit_per_day': profit_per_day,
-            'profit_per_day_after_fee': profit_after_fee / total_time_days if total_time_days > 0 else 0,
-            'xp_per_day': xp_per_day,
-            'total_xp': result['total_xp'],
-            'actions': result['actions'],
-            'time_hours': total_time_hours,
-            'time_days': total_time_days,
-            'protect_count': result['protect_count'],
-            'protect_at': result['protect_at'],
-            'protect_hrid': result['protect_hrid'],
-            'protect_name': result['protect_name'],
-            'protect_price': result['protect_price'],
-            'materials': result['materials'],
-            'coin_cost': result['coin_cost'],
-            'craft_materials': result['craft_materials'],
-            'mode': mode.value,
-        }
+        return ProfitResult(
+            item_hrid,
+            self.item_detail_map.get(item_hrid, {}).get('name', item_hrid),
+            target_level,
+            mode.value,
+            inputs,
+            functools.partial(self._get_cached_detail, item_hrid, market_data, mode),
+            (
+                result['mat_cost'], result['total_cost'], sell_price, market_fee,
+                profit, profit_after_fee, roi, roi_after_fee,
+                profit_per_day, profit_per_day_after_fee, xp_per_day,
+                result['total_xp'], result['actions'], total_time_hours, total_time_days,
+                result['protect_count'], result['protect_at'], result['protect_levels'],
+            ),
+            functools.partial(self._get_result_spread, inputs, target_level, result['protect_levels']),
+        )
     
-    def get_all_profits(self, market_data, target_levels=[8, 10, 12, 14], mode=PriceMode.PESSIMISTIC):
-        """Calculate profits for all enhanceable items at target levels."""
-        results = []
+    def _get_recipe_closure(self, hrid):
+        """Get every item reachable through recipe inputs and upgrade items of hrid."""
+        closure = set()
+        stack = [hrid]
+        while stack:
+            action = self.recipe_index.get(stack.pop())
+            if not action:
+                continue
+            inputs = [inp['itemHrid'] for inp in action.get('inputItems', [])]
+            if action.get('upgradeItemHrid'):
+                inputs.append(action['upgradeItemHrid'])
+            for input_hrid in inputs:
+                if input_hrid not in closure:
+                    closure.add(input_hrid)
+                    stack.append(input_hrid)
+        return closure
+    
+    def get_price_dependencies(self, item_hrid):
+        """Get every hrid whose +0 market price can change item_hrid's result.
+        
+        Covers the item itself, enhancement materials, protection options and,
+        transitively, recipe inputs and upgrade items of all of those (any +0
+        price may fall back to a craft cost). The item's own enhanced-level
+        prices matter too, but only as sell prices.
+        """
+        item = self.item_detail_map.get(item_hrid, {})
+        direct = {item_hrid, '/items/mirror_of_protection'}
+        direct.update(cost['itemHrid'] for cost in item.get('enhancementCosts', []))
+        direct.update(item.get('protectionItemHrids', []))
+        direct.discard('/items/coin')
+        
+        dependencies = set(direct)
+        for hrid in direct:
+            dependencies |= self._get_recipe_closure(hrid)
+        dependencies.discard('/items/coin')
+        return dependencies
+    
+    def get_dependency_index(self):
+        """Get the reverse dependency index {priced hrid: {enhanceable item hrids}}.
         
+        Depends only on game data, so it is built once per calculator.
+        """
+        if self._dependency_index is None:
+            index = {}
+            for item in self.enhanceable_items:
+                item_hrid = item.get('hrid')
+                if not item_hrid:
+                    continue
+                for hrid in self.get_price_dependencies(item_hrid):
+                    index.setdefault(hrid, set()).add(item_hrid)
+            self._dependency_index = index
+        return self._dependency_index
+    
+    def get_affected_items(self, changed_keys):
+        """Get the enhanceable items whose results depend on changed 'hrid:level' prices."""
+        index = self.get_dependency_index()
+        affected = set()
+        for key in changed_keys:
+            hrid, _, level = key.rpartition(':')
+            if level == '0':
+                affected |= index.get(hrid, set())
+            elif hrid in self.item_detail_map:
+                # Enhanced-level prices are only read as the item's own sell price
+                affected.add(hrid)
+        return affected
+    
+    def get_profit_items(self):
+        """Get the enhanceable items that profit rankings cover (junk items skipped)."""
+        items = []
         for item in self.enhanceable_items:
             hrid = item.get('hrid')
             if not hrid:
@@ -784,17 +1709,136 @@ class EnhancementCalculator:
             if any(skip in name for skip in ['cheese_', 'verdant_', 'wooden_', 'rough_']):
                 continue
             
-            for target in target_levels:
-                result = self.calculate_profit(hrid, target, market_data, mode)
-                if result and result['sell_price'] > 0:
-                    results.append(result)
+            items.append(item)
+        return items
+    
+    def get_all_profits(self, market_data, target_levels=[8, 10, 12, 14], mode=PriceMode.PESSIMISTIC,
+                        sort_by='profit', top_k=None, min_profit=None, max_roi=None, cost_range=None,
+                        items=None):
+        """Calculate profits for all enhanceable items at target levels.
+        
+        items restricts the run to a list of item hrids (default: every
+        get_profit_items() item, in that order).
+        
+        Results are sorted by sort_by (any numeric ProfitResult field),
+        highest first, ties in item/target order. Optional filters:
+          top_k       keep only the best top_k results
+          min_profit  keep results with profit > min_profit
+          max_roi     keep results with roi < max_roi
+          cost_range  (low, high): keep results with low <= total_cost < high;
+                      either bound may be None
+        
+        Rows that cannot pass are skipped before their chains are priced:
+        total_cost is at least the base item price, so sell_price - base_price
+        bounds profit. With top_k a heap keeps the current best results, and
+        when ranking by profit or profit_after_fee that bound also skips rows
+        that cannot enter the heap. An item with any row left is priced for
+        all its targets at once with calculate_all_targets.
+        """
+        low, high = cost_range if cost_range is not None else (None, None)
+        fee_rate = {'profit': 0.0, 'profit_after_fee': MARKET_FEE}.get(sort_by)
         
-        results.sort(key=lambda x: x['profit'], reverse=True)
+        self._prime_chain_tables([item.get('itemLevel', 1) for item in self.enhanceable_items], all_starts=True)
         
-        return results
+        if items is None:
+            items = [item['hrid'] for item in self.get_profit_items()]
+        
+        heap = []  # (key, -sequence, result); worst result on top
+        sequence = 0
+        for hrid in items:
+            inputs = self.get_enhancement_inputs(hrid, market_data, mode)
+            if not inputs:
+                continue
+            base_price = inputs['base_price']
+            if high is not None and base_price >= high:
+                continue
+            
+            sell_prices = [self.get_sell_price(hrid, target, market_data, mode) for target in target_levels]
+            item_results = None
+            for t, sell_price in enumerate(sell_prices):
+                sequence += 1
+                if sell_price <= 0:
+                    continue
+                
+                # Upper bound on profit, skip rows that cannot pass or rank
+                profit_bound = sell_price - base_price
+                if min_profit is not None and profit_bound <= min_profit:
+                    continue
+                if (top_k is not None and fee_rate is not None and heap and len(heap) >= top_k
+                        and profit_bound - sell_price * fee_rate <= heap[0][0]):
+                    continue
+                
+                if item_results is None:
+                    item_results = self._price_all_targets(hrid, inputs, target_levels, sell_prices, market_data, mode)
+                result = item_results[t]
+                if not result:
+                    continue
+                if min_profit is not None and not result.profit > min_profit:
+                    continue
+                if max_roi is not None and not result.roi < max_roi:
+                    continue
+                if low is not None and result.total_cost < low:
+                    continue
+                if high is not None and not result.total_cost < high:
+                    continue
+                
+                entry = (getattr(result, sort_by), -sequence, result)
+                if top_k is None or len(heap) < top_k:
+                    heapq.heappush(heap, entry)
+                elif heap and entry[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, entry)
+        
+        heap.sort(key=lambda entry: entry[:2], reverse=True)
+        
+        return [result for _, _, result in heap]
+    
+    def sweep_gear(self, market_data, variants=None, target_levels=[8, 10, 12, 14], mode=PriceMode.PESSIMISTIC):
+        """Report the change in best profit/day and XP/day for gear variants.
+        
+        variants maps a name to a config dict and defaults to single-step
+        upgrades of the current profile. See gear_sweep.sweep_gear.
+        """
+        from gear_sweep import sweep_gear
+        return sweep_gear(self, market_data, variants, target_levels, mode)
     
-    def get_all_profits_all_modes(self, market_data, target_levels=[8, 10, 12, 14]):
-        """Calculate profits for all items in all price modes."""
+    def scan_start_levels(self, market_data, mode=PriceMode.PESSIMISTIC, **options):
+        """Rank buy-at-+N / enhance / sell-at-+M routes across the catalog.
+        
+        See arbitrage.scan_start_levels for options.
+        """
+        from arbitrage import scan_start_levels
+        return scan_start_levels(self, market_data, mode, **options)
+    
+    def optimize_portfolio(self, market_data, budget, horizon_days=1.0, mode=PriceMode.PESSIMISTIC,
+                           target_levels=[8, 10, 12, 14], max_roi=None, items=None, **options):
+        """Pick the most profitable set of jobs for a coin budget and one action queue.
+        
+        Runs get_all_profits (profitable rows only) and solves the knapsack
+        over them. See portfolio.optimize_portfolio for options.
+        """
+        from portfolio import optimize_portfolio
+        rows = self.get_all_profits(market_data, target_levels, mode, min_profit=0, max_roi=max_roi, items=items)
+        return optimize_portfolio(rows, budget, horizon_days, **options)
+    
+    def get_price_sensitivity(self, market_data, target_levels=[8, 10, 12, 14], mode=PriceMode.PESSIMISTIC,
+                              **filters):
+        """Get the PriceSensitivity of get_all_profits results (filters as there).
+        
+        See sensitivity.PriceSensitivity for gradients, break-even prices and
+        bulk price-shock scenarios.
+        """
+        from sensitivity import PriceSensitivity
+        return PriceSensitivity(self.get_all_profits(market_data, target_levels, mode, **filters))
+    
+    def get_all_profits_all_modes(self, market_data, target_levels=[8, 10, 12, 14], workers=None):
+        """Calculate profits for all items in all price modes.
+        
+        With workers > 1, items are sharded across a process pool (see
+        parallel_profits); results are identical and in the same order.
+        """
+        if workers is not None and workers > 1:
+            from parallel_profits import get_all_profits_parallel
+            return get_all_profits_parallel(self, market_data, target_levels, workers)
         return {
             'pessimistic': self.get_all_profits(market_data, target_levels, PriceMode.PESSIMISTIC),
             'midpoint': self.get_all_profits(market_data, target_levels, PriceMode.MIDPOINT),
@@ -816,7 +1860,7 @@ def test_calculator():
     print(f"Guzzling bonus: {calc.get_guzzling_bonus():.4f}x")
     print(f"Artisan tea multiplier: {calc.get_artisan_tea_multiplier():.4f}")
     print(f"Effective level: {calc.get_effective_level():.1f}")
-    print(f"Observatory: {USER_CONFIG['observatory_level']}")
+    print(f"Observatory: {calc.profile.observatory}")
     
     test_items = [
         ('/items/acrobatic_hood', 10),
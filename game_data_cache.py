@@ -0,0 +1,183 @@
+"""
+Compact, version-keyed cache of the game data the calculator uses.
+
+init_client_info.json is several MB and EnhancementCalculator only needs a
+small slice of it: item names/levels/categories, enhancement costs,
+protection items, noncombat stats and production recipes. The first load
+extracts that slice with the same field names as the game data and writes it
+next to the source file as <name>.cache.json. Later loads read only the cache.
+
+The cache records the source's gameVersion, size and mtime. If the size or
+mtime changed, the source's gameVersion is read from the raw text (no JSON
+parse) and the cache is reused while it matches, so a game patch rebuilds
+it automatically. Bump CACHE_FORMAT when the extracted fields change.
+
+The repo's own game-data.js (written by extract_game_data.py and tracked in
+git) carries the same fields under other names. A path ending in .js is
+converted with game_data_from_static instead, so scripts that only have a
+checkout (the price cron) can build a calculator.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+CACHE_FORMAT = 1
+
+ITEM_FIELDS = (
+    'hrid', 'name', 'itemLevel', 'sortIndex', 'sellPrice', 'categoryHrid',
+    'enhancementCosts', 'protectionItemHrids',
+)
+ACTION_FIELDS = ('hrid', 'function', 'inputItems', 'outputItems', 'upgradeItemHrid')
+
+GAME_VERSION_RE = re.compile(rb'"gameVersion"\s*:\s*"([^"]*)"')
+
+STATIC_PREFIX = 'window.GAME_DATA_STATIC = '
+
+
+def get_cache_path(path):
+    """Get the cache file path for a game data file."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.cache.json")
+
+
+def extract_game_data(data):
+    """Get the subset of init_client_info.json data used by the calculator.
+
+    Returns a dict shaped like the source, {'gameVersion', 'itemDetailMap',
+    'actionDetailMap'}, with items trimmed to ITEM_FIELDS plus their
+    noncombat stats, and actions trimmed to production actions that have an
+    output (in source order, so first-match recipe lookups are unchanged).
+    """
+    items = {}
+    for hrid, item in data.get('itemDetailMap', {}).items():
+        trimmed = {key: item[key] for key in ITEM_FIELDS if key in item}
+        noncombat = item.get('equipmentDetail', {}).get('noncombatStats', {})
+        stats = {stat: value for stat, value in noncombat.items() if value != 0}
+        if stats:
+            trimmed['equipmentDetail'] = {'noncombatStats': stats}
+        items[hrid] = trimmed
+
+    actions = {}
+    for hrid, action in data.get('actionDetailMap', {}).items():
+        if action.get('function') != '/action_functions/production':
+            continue
+        if not action.get('outputItems'):
+            continue
+        actions[hrid] = {key: action[key] for key in ACTION_FIELDS if key in action}
+
+    return {
+        'gameVersion': data.get('gameVersion', ''),
+        'itemDetailMap': items,
+        'actionDetailMap': actions,
+    }
+
+
+def game_data_from_static(static):
+    """Rebuild init_client_info.json fields from game-data.js (extract_game_data.py output)."""
+    items = {}
+    for sort_index, (hrid, item) in enumerate(static['items'].items()):
+        detail = {
+            'hrid': hrid,
+            'name': item['name'],
+            'itemLevel': item['level'],
+            'sortIndex': sort_index,
+            'sellPrice': item['sellPrice'],
+            'categoryHrid': item['category'],
+        }
+        if 'enhancementCosts' in item:
+            detail['enhancementCosts'] = [
+                {'itemHrid': c['item'], 'count': c['count']} for c in item['enhancementCosts']
+            ]
+            detail['protectionItemHrids'] = item.get('protectionItems', [])
+        if 'stats' in item:
+            detail['equipmentDetail'] = {'noncombatStats': item['stats']}
+        items[hrid] = detail
+
+    actions = {}
+    for output_hrid, recipe in static['recipes'].items():
+        action_hrid = '/actions/' + output_hrid.split('/')[-1]
+        action = {
+            'hrid': action_hrid,
+            'function': '/action_functions/production',
+            'inputItems': [{'itemHrid': i['item'], 'count': i['count']} for i in recipe['inputs']],
+            'outputItems': [{'itemHrid': output_hrid, 'count': 1}],
+        }
+        if 'upgrade' in recipe:
+            action['upgradeItemHrid'] = recipe['upgrade']
+        actions[action_hrid] = action
+
+    return {'gameVersion': static.get('version', ''), 'itemDetailMap': items, 'actionDetailMap': actions}
+
+
+def read_static_game_data(path):
+    """Load a game-data.js file as extract_game_data() output."""
+    raw = Path(path).read_text(encoding='utf-8')
+    static = json.loads(raw[len(STATIC_PREFIX):].rstrip().rstrip(';'))
+    return extract_game_data(game_data_from_static(static))
+
+
+def read_game_version(path):
+    """Get a game data file's gameVersion without parsing the JSON ('' if not found)."""
+    with open(path, 'rb') as f:
+        match = GAME_VERSION_RE.search(f.read())
+    return match.group(1).decode('utf-8') if match else ''
+
+
+def _source_stat(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get('format') != CACHE_FORMAT:
+        return None
+    return cache
+
+
+def _write_cache(cache_path, cache):
+    """Write the cache atomically; an unwritable directory just means no cache."""
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, separators=(',', ':'))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def load_game_data(path, use_cache=True):
+    """Load the calculator's subset of a game data file, through the cache.
+
+    Returns the extract_game_data() dict. game-data.js files are small and
+    read directly (see read_static_game_data).
+    """
+    if Path(path).suffix == '.js':
+        return read_static_game_data(path)
+    if not use_cache:
+        with open(path, 'r', encoding='utf-8') as f:
+            return extract_game_data(json.load(f))
+
+    cache_path = get_cache_path(path)
+    source = _source_stat(path)
+    cache = _read_cache(cache_path)
+
+    if cache is not None:
+        if cache.get('source') == source:
+            return cache['data']
+        if cache['data'].get('gameVersion') and read_game_version(path) == cache['data']['gameVersion']:
+            cache['source'] = source
+            _write_cache(cache_path, cache)
+            return cache['data']
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = extract_game_data(json.load(f))
+
+    _write_cache(cache_path, {'format': CACHE_FORMAT, 'source': source, 'data': data})
+    return data
@@ -0,0 +1,172 @@
+"""
+Gear what-if sweep.
+
+Answers "which upgrade pays off most?" by evaluating gear variants over the
+whole catalog and reporting the change in best profit/day and XP/day for
+each one, relative to the current gear.
+
+Variants are USER_CONFIG-shaped dicts. Each one runs on a with_profile()
+copy of the calculator and a ProfitMatrix derived from the base matrix, so
+market prices are resolved once and chain solutions are shared through the
+chain cache. A variant costs one batched chain solve and one array
+evaluation.
+
+Usage:
+  python gear_sweep.py [init_client_info.json] [marketplace.json]
+"""
+
+import itertools
+import json
+import sys
+from enhance_calc import ENHANCE_BONUS, EnhancementCalculator, PriceMode, USER_CONFIG
+from profit_matrix import ProfitMatrix
+
+MAX_GEAR_LEVEL = len(ENHANCE_BONUS) - 1
+TEA_TIERS = ['tea_enhancing', 'tea_super_enhancing', 'tea_ultra_enhancing']
+
+# Config keys a single +1 upgrade applies to
+LEVEL_UPGRADES = {
+    'enhancing_level': '+1 enhancing level',
+    'observatory_level': '+1 observatory',
+    'enhancer_level': '+1 enhancer',
+    'enchanted_gloves_level': '+1 gloves',
+    'guzzling_pouch_level': '+1 guzzling pouch',
+    'enhancer_top_level': '+1 enhancer top',
+    'enhancer_bot_level': '+1 enhancer bottoms',
+    'philo_neck_level': '+1 philosopher\'s necklace',
+    'enhancing_buff_level': '+1 enhancing buff',
+    'experience_buff_level': '+1 experience buff',
+}
+
+# Gear pieces whose level indexes ENHANCE_BONUS and so caps at +20
+CAPPED_LEVELS = {
+    'enhancer_level', 'enchanted_gloves_level', 'guzzling_pouch_level',
+    'enhancer_top_level', 'enhancer_bot_level', 'philo_neck_level',
+}
+
+
+def upgrade_variants(config=USER_CONFIG):
+    """Get single-step upgrades of a config, keyed by a readable name."""
+    variants = {}
+
+    for key, name in LEVEL_UPGRADES.items():
+        level = config.get(key, 0)
+        if key in CAPPED_LEVELS and level >= MAX_GEAR_LEVEL:
+            continue
+        variants[name] = {**config, key: level + 1}
+
+    # Every other enhancing tea tier (only one tier is active at a time)
+    active = [tier for tier in TEA_TIERS if config.get(tier)]
+    current = active[-1] if active else None
+    names = {None: 'no', **{tier: tier.split('_')[1] for tier in TEA_TIERS}}
+    for tier in [None] + TEA_TIERS:
+        if tier == current:
+            continue
+        variant = {**config, **{other: False for other in TEA_TIERS}}
+        if tier:
+            variant[tier] = True
+        variants[f"{names[current]} -> {names[tier]} tea"] = variant
+
+    for key, name in [('tea_blessed', 'blessed tea'), ('tea_wisdom', 'wisdom tea'), ('artisan_tea', 'artisan tea')]:
+        if not config.get(key):
+            variants[f"+{name}"] = {**config, key: True}
+
+    return variants
+
+
+def grid_variants(config=USER_CONFIG, axes=None):
+    """Get the cartesian product of config values as variants.
+
+    axes maps a config key to the values to try, e.g.
+    {'enhancer_level': [12, 13, 14], 'observatory_level': [8, 9]}.
+    Variant names look like 'enhancer_level=13, observatory_level=9'.
+    """
+    axes = axes or {}
+    keys = list(axes)
+    variants = {}
+    for values in itertools.product(*(axes[key] for key in keys)):
+        name = ', '.join(f"{key}={value}" for key, value in zip(keys, values))
+        variants[name] = {**config, **dict(zip(keys, values))}
+    return variants
+
+
+def summarize(matrix, mode=PriceMode.PESSIMISTIC, max_roi=None):
+    """Get the best profit/day (after fee) and best XP/day over a matrix's valid rows."""
+    m = matrix.mode_index(mode)
+    valid = matrix.valid[:, :, m]
+    if max_roi is not None:
+        valid = valid & (matrix.roi[:, :, m] < max_roi)
+
+    summary = {
+        'best_profit_per_day': 0.0,
+        'best_item': None,
+        'best_target': None,
+        'best_xp_per_day': 0.0,
+    }
+    if not valid.any():
+        return summary
+
+    profit_per_day = matrix.profit_per_day_after_fee[:, :, m]
+    cells = valid.nonzero()
+    best = int(profit_per_day[valid].argmax())
+    i, t = int(cells[0][best]), int(cells[1][best])
+
+    summary['best_profit_per_day'] = float(profit_per_day[i, t])
+    summary['best_item'] = matrix.items[i]
+    summary['best_target'] = matrix.targets[t]
+    summary['best_xp_per_day'] = float(matrix.xp_per_day[:, :, m][valid].max())
+    return summary
+
+
+def sweep_gear(calc, market_data, variants=None, target_levels=[8, 10, 12, 14],
+               mode=PriceMode.PESSIMISTIC, max_roi=None):
+    """Evaluate gear variants and report the change versus calc's current profile.
+
+    variants maps a name to a config dict (default: upgrade_variants of the
+    current config). Returns a list of dicts with the variant name, its
+    summary and the profit/day and XP/day deltas, best profit gain first.
+    """
+    if variants is None:
+        variants = upgrade_variants(calc.profile.config)
+
+    base_matrix = ProfitMatrix(calc, market_data, target_levels, [mode])
+    base = summarize(base_matrix, mode, max_roi)
+
+    report = []
+    for name, config in variants.items():
+        matrix = base_matrix.for_profile(calc.with_profile(config))
+        summary = summarize(matrix, mode, max_roi)
+        report.append({
+            'variant': name,
+            **summary,
+            'delta_profit_per_day': summary['best_profit_per_day'] - base['best_profit_per_day'],
+            'delta_xp_per_day': summary['best_xp_per_day'] - base['best_xp_per_day'],
+        })
+
+    report.sort(key=lambda r: r['delta_profit_per_day'], reverse=True)
+    return report
+
+
+def main(game_data_path='init_client_info.json', market_path=None):
+    from generate_site import MAX_ROI, TARGET_LEVELS, format_coins
+
+    if market_path:
+        with open(market_path, encoding='utf-8') as f:
+            market_data = json.load(f)
+    else:
+        import requests
+        resp = requests.get('https://www.milkywayidle.com/game_data/marketplace.json')
+        market_data = resp.json()
+
+    calc = EnhancementCalculator(game_data_path)
+    report = sweep_gear(calc, market_data, target_levels=TARGET_LEVELS, max_roi=MAX_ROI)
+
+    print(f"{'Upgrade':<32} {'$/day':>10} {'XP/day':>10}  Best")
+    for r in report:
+        best = f"{r['best_item'].split('/')[-1]} +{r['best_target']}" if r['best_item'] else '-'
+        print(f"{r['variant']:<32} {format_coins(r['delta_profit_per_day']):>10} "
+              f"{format_coins(r['delta_xp_per_day']):>10}  {best}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -6,29 +6,43 @@ Data flow:
   2. Fetch fresh market data from MWI API
   3. Diff current vs previous prices, record changes in history
   4. Prune history entries older than 7 days
-  5. Write updated prices.js (market + history + timestamps)
-  6. Git commit & push happens externally (cron job)
+  5. Build the cheapest-acquisition table (acquisition.py) from game-data.js
+  6. Write updated prices.js (market + history + acquisition + timestamps)
+  7. Git commit & push happens externally (cron job)
 
 prices.js format (assigned to window.PRICES):
   {
     market: { "<item_hrid>": { "<level>": { a: <ask>, b: <bid> } } },
     history: { "<item_hrid>:<level>": { b: [{p, t}, ...], a: [{p, t}, ...] } },
+    acquisition: { artisan: <artisan tea multiplier>,
+                   modes: { "<mode>": { "<item_hrid>": [<price>, <source>, <craft_cost>] } } },
     ts: <market_timestamp>,
     generated: <generation_timestamp>
   }
 
 History entries are sorted newest-first. Only price *changes* are recorded.
 One baseline entry older than 7 days is kept per item for age calculation.
+acquisition is the cheapest +0 price of every item (market, craft or
+vendor) for USER_CONFIG's artisan tea, in ACQUISITION_MODES only (the
+browser always buys at ask); price-resolver.js reads it instead of
+resolving craft costs recursively. It is built from the tracked game-data.js
+(the same data the browser loads), so a plain checkout is enough, and is
+only omitted if that file is missing.
 """
 
 import json
 import requests
 from datetime import datetime
 from pathlib import Path
+from market_snapshot import MarketSnapshot
 
 OUTPUT_FILE = Path(__file__).parent / 'prices.js'
+GAME_DATA_FILE = Path(__file__).parent / 'game-data.js'
 HISTORY_WINDOW = 7 * 24 * 60 * 60  # 7 days in seconds
 
+# Acquisition modes written to prices.js: price-resolver.js only reads pessimistic
+ACQUISITION_MODES = ('pessimistic',)
+
 
 def load_previous_state():
     """Load history and last market timestamp from existing prices.js."""
@@ -83,13 +97,26 @@ def prune_history(history, now_ts):
     return pruned
 
 
-def update_history(market_data, state):
+def diff_market(old_market, new_market):
+    """
+    Get the "hrid:level" keys whose bid or ask differs between two
+    market snapshots (or marketplace.json dicts), including levels that
+    appeared or disappeared.
+    """
+    return MarketSnapshot.coerce(old_market).diff(MarketSnapshot.coerce(new_market))
+
+
+def update_history(market_data, state, changed_keys=None):
     """
     Compare fresh market data against previous state.
     Record bid/ask changes in history.
+    If changed_keys (a set) is given, the "hrid:level" key of every recorded
+    change is added to it, for incremental profit recompute.
+    market_data may be a MarketSnapshot or a marketplace.json dict.
     Returns (updated_state, is_new_data, change_count).
     """
-    market_ts = market_data.get('timestamp', 0)
+    snapshot = MarketSnapshot.coerce(market_data)
+    market_ts = snapshot.timestamp
     now_ts = int(datetime.now().timestamp())
 
     if market_ts == state.get('lastMarketTs', 0):
@@ -98,34 +125,34 @@ def update_history(market_data, state):
     history = state.get('history', {})
     changes = 0
 
-    for item_hrid, levels in market_data.get('marketData', {}).items():
-        for level_str, price_data in levels.items():
-            bid = price_data.get('b', -1)
-            ask = price_data.get('a', -1)
-
-            if bid == -1 and ask == -1:
-                continue
-
-            key = f"{item_hrid}:{level_str}"
-            entry = history.get(key, {'b': [], 'a': []})
-
-            if bid != -1:
-                b_list = entry.get('b', [])
-                current_bid = b_list[0]['p'] if b_list else None
-                if current_bid != bid:
-                    b_list.insert(0, {'p': bid, 't': market_ts})
-                    entry['b'] = b_list
-                    changes += 1
-
-            if ask != -1:
-                a_list = entry.get('a', [])
-                current_ask = a_list[0]['p'] if a_list else None
-                if current_ask != ask:
-                    a_list.insert(0, {'p': ask, 't': market_ts})
-                    entry['a'] = a_list
-                    changes += 1
-
-            history[key] = entry
+    for item_hrid, level, ask, bid, _, _ in snapshot.entries():
+        if bid == -1 and ask == -1:
+            continue
+
+        key = f"{item_hrid}:{level}"
+        entry = history.get(key, {'b': [], 'a': []})
+
+        if bid != -1:
+            b_list = entry.get('b', [])
+            current_bid = b_list[0]['p'] if b_list else None
+            if current_bid != bid:
+                b_list.insert(0, {'p': bid, 't': market_ts})
+                entry['b'] = b_list
+                changes += 1
+                if changed_keys is not None:
+                    changed_keys.add(key)
+
+        if ask != -1:
+            a_list = entry.get('a', [])
+            current_ask = a_list[0]['p'] if a_list else None
+            if current_ask != ask:
+                a_list.insert(0, {'p': ask, 't': market_ts})
+                entry['a'] = a_list
+                changes += 1
+                if changed_keys is not None:
+                    changed_keys.add(key)
+
+        history[key] = entry
 
     history = prune_history(history, now_ts)
 
@@ -135,25 +162,29 @@ def update_history(market_data, state):
     return state, True, changes
 
 
-def build_prices_js(market_data, history, market_ts):
+def build_acquisition(market_data, game_data_path=GAME_DATA_FILE):
+    """Get the prices.js acquisition table for a snapshot, or None without game data."""
+    if not Path(game_data_path).exists():
+        return None
+    from enhance_calc import EnhancementCalculator, PriceMode
+    calc = EnhancementCalculator(game_data_path)
+    modes = [PriceMode(mode) for mode in ACQUISITION_MODES]
+    return calc.get_acquisition_table(market_data).to_json(modes)
+
+
+def build_prices_js(market_data, history, market_ts, acquisition=None):
     """Build the prices.js file content."""
     now_ts = int(datetime.now().timestamp())
 
     market = {}
-    for item_hrid, levels in market_data.get('marketData', {}).items():
-        item_prices = {}
-        for level_str, prices in levels.items():
-            ask = prices.get('a', -1)
-            bid = prices.get('b', -1)
-            if ask != -1 or bid != -1:
-                level_entry = {}
-                if ask != -1:
-                    level_entry['a'] = ask
-                if bid != -1:
-                    level_entry['b'] = bid
-                item_prices[level_str] = level_entry
-        if item_prices:
-            market[item_hrid] = item_prices
+    for item_hrid, level, ask, bid, _, _ in MarketSnapshot.coerce(market_data).entries():
+        if ask != -1 or bid != -1:
+            level_entry = {}
+            if ask != -1:
+                level_entry['a'] = ask
+            if bid != -1:
+                level_entry['b'] = bid
+            market.setdefault(item_hrid, {})[str(level)] = level_entry
 
     output = {
         'market': market,
@@ -161,6 +192,8 @@ def build_prices_js(market_data, history, market_ts):
         'ts': market_ts,
         'generated': now_ts,
     }
+    if acquisition is not None:
+        output['acquisition'] = acquisition
 
     return f"window.PRICES = {json.dumps(output, separators=(',', ':'))};"
 
@@ -168,8 +201,8 @@ def build_prices_js(market_data, history, market_ts):
 def main():
     print("Fetching market data...")
     resp = requests.get('https://www.milkywayidle.com/game_data/marketplace.json')
-    market_data = resp.json()
-    market_ts = market_data.get('timestamp', 0)
+    market_data = MarketSnapshot(resp.json())
+    market_ts = market_data.timestamp
     print(f"  Market timestamp: {datetime.fromtimestamp(market_ts)}")
 
     print("Loading previous state from prices.js...")
@@ -189,8 +222,15 @@ def main():
     if is_new_data:
         print(f"  {changes} price changes recorded")
 
+    print("Building acquisition table...")
+    acquisition = build_acquisition(market_data)
+    if acquisition is None:
+        print(f"  {GAME_DATA_FILE.name} not found, skipping")
+    else:
+        print(f"  {sum(len(rows) for rows in acquisition['modes'].values())} item prices")
+
     print("Writing prices.js...")
-    prices_js = build_prices_js(market_data, state['history'], market_ts)
+    prices_js = build_prices_js(market_data, state['history'], market_ts, acquisition)
 
     OUTPUT_FILE.write_text(prices_js, encoding='utf-8')
 
@@ -1,13 +1,38 @@
 """
 Generate data.js with enhancement profit rankings.
 Includes price history tracking.
+
+Usage:
+  python generate_site.py                      # USER_CONFIG -> data.js, then git push
+  python generate_site.py --profiles guild.json
+  python generate_site.py --timings [timings.json]  # also write counters/timings
+  python generate_site.py --watch 600          # regenerate every 10 minutes
+
+--profiles evaluates several gear profiles against one market snapshot and
+writes data-<name>.js per profile (no git push). The file maps a profile
+name to USER_CONFIG overrides, e.g.
+  {"alice": {"enhancing_level": 110, "enhancer_level": 10},
+   "bob": {"tea_ultra_enhancing": false, "tea_super_enhancing": true}}
+
+--watch keeps the calculator and profit matrix loaded and, each cycle,
+recomputes only the items whose prices (or input prices) changed since the
+previous snapshot. One-shot runs do the same across processes: the matrix's
+price inputs and snapshot are saved to matrix_state.cache.json, and the next
+run refreshes them instead of evaluating the whole catalog (it falls back to
+a full evaluation when the file is missing or was saved for other game data).
 """
 
+import argparse
+import heapq
 import json
 import requests
+import time
 from datetime import datetime
 from pathlib import Path
-from enhance_calc import EnhancementCalculator, PriceMode
+from enhance_calc import EnhancementCalculator, PriceMode, USER_CONFIG
+from instrumentation import CalcStats, is_stats_file, phase
+from profit_matrix import ProfitMatrix, evaluate_profiles
+from market_snapshot import MarketSnapshot
 
 TARGET_LEVELS = [8, 10, 12, 14]
 TRACKED_LEVELS = [0, 8, 10, 12, 14]  # Levels to track in price history
@@ -15,6 +40,7 @@ MIN_PROFIT = 1_000_000
 MAX_ROI = 1000
 
 PRICE_HISTORY_FILE = Path(__file__).parent / 'price_history.json'
+MATRIX_STATE_FILE = Path(__file__).parent / 'matrix_state.cache.json'
 
 
 def load_price_history():
@@ -35,9 +61,11 @@ def update_price_history(market_data, history):
     """
     Update price history with current market data.
     Tracks prices at multiple enhancement levels using keys like 'hrid:level'.
+    market_data may be a MarketSnapshot or a marketplace.json dict.
     Returns (updated_history, is_new_data, changes_list).
     """
-    market_ts = market_data.get('timestamp', 0)
+    snapshot = MarketSnapshot.coerce(market_data)
+    market_ts = snapshot.timestamp
     now = datetime.now()
     now_iso = now.isoformat()
     now_ts = int(now.timestamp())
@@ -67,14 +95,10 @@ def update_price_history(market_data, history):
     
     changes = []
     
-    for item_hrid, levels in market_data.get('marketData', {}).items():
+    for item_hrid in snapshot.hrids:
         for level in TRACKED_LEVELS:
-            level_str = str(level)
-            if level_str not in levels:
-                continue
-            
             # Get bid price (what buyers will pay - pessimistic sell price)
-            bid = levels[level_str].get('b', -1)
+            _, bid = snapshot.quote(item_hrid, level)
             if bid == -1:
                 continue
             
@@ -148,10 +172,15 @@ def format_coins(value):
         return f"{value:.0f}"
 
 
+def serialize_modes(all_modes, limit=None):
+    """Convert ProfitResult rows to data.js dicts (optionally the first limit per mode)."""
+    return {mode: [result.to_dict() for result in results[:limit]] for mode, results in all_modes.items()}
+
+
 def generate_data_js(all_modes, player_stats, price_history_meta, game_version=''):
     """Generate the data.js file with all data as window.GAME_DATA."""
     data = {
-        'modes': all_modes,
+        'modes': serialize_modes(all_modes),
         'playerStats': player_stats,
         'lastCheckTs': price_history_meta.get('last_check_ts', 0),
         'lastMarketTs': price_history_meta.get('last_market_ts', 0),
@@ -164,11 +193,11 @@ def generate_data_js(all_modes, player_stats, price_history_meta, game_version='
     return f"window.GAME_DATA = {json_content};"
 
 
-def main():
+def fetch_market_data():
+    """Fetch market data and update price history. Returns (market_data, price_history)."""
     print("Fetching market data...")
     resp = requests.get('https://www.milkywayidle.com/game_data/marketplace.json')
-    market_data = resp.json()
-    timestamp = datetime.fromtimestamp(market_data.get('timestamp', 0))
+    market_data = MarketSnapshot(resp.json())
     
     # Update price history
     print("Updating price history...")
@@ -180,18 +209,12 @@ def main():
     else:
         print(f"  Same market data")
     
-    print("Loading game data...")
-    calc = EnhancementCalculator('init_client_info.json')
-    
-    print(f"Calculating profits for {len(calc.enhanceable_items)} items...")
-    
-    all_modes = calc.get_all_profits_all_modes(market_data, TARGET_LEVELS)
-    
-    for mode in all_modes:
-        all_modes[mode] = [r for r in all_modes[mode] if r['roi'] < MAX_ROI]
-    
-    # Enrich with price age data
-    now_ts = int(datetime.now().timestamp())
+    return market_data, price_history
+
+
+def build_modes(matrix, price_history, now_ts):
+    """Materialize emitted rows per mode and enrich them with price age data."""
+    all_modes = matrix.to_modes(max_roi=MAX_ROI)
     
     for mode in all_modes:
         for result in all_modes[mode]:
@@ -203,45 +226,173 @@ def main():
             result['last_price'] = age_info['last_price']
             result['tracked_price'] = age_info['tracked_price']
     
+    return all_modes
+
+
+def get_price_history_meta(price_history, now_ts):
+    """Timestamps for dynamic JavaScript calculation."""
+    return {
+        'last_check_ts': price_history.get('last_check_ts', now_ts),
+        'last_market_ts': price_history.get('last_market_timestamp', now_ts),
+        'update_history': price_history.get('update_history', [])
+    }
+
+
+def print_top(all_modes, mode_name='pessimistic', count=5):
+    """Print the top opportunities for a mode by $/day after fee."""
+    results = all_modes[mode_name]
+    profitable = [r for r in results if r['profit_after_fee'] > MIN_PROFIT]
+    print(f"\n=== Top {count} {mode_name.upper()} (by $/day after fee) ===")
+    top = heapq.nlargest(count, profitable, key=lambda r: r['profit_per_day_after_fee'])
+    for i, r in enumerate(top, 1):
+        print(f"{i}. {r['item_name']} +{r['target_level']}: {format_coins(r['profit_after_fee'])} profit, {format_coins(r['total_cost'])} cost, {format_coins(r['profit_per_day_after_fee'])}/day")
+
+
+def load_profiles(path):
+    """Load named USER_CONFIG overrides and merge them onto USER_CONFIG."""
+    with open(path, encoding='utf-8') as f:
+        overrides = json.load(f)
+    return {name: {**USER_CONFIG, **config} for name, config in overrides.items()}
+
+
+def main_profiles(profiles_path, stats=None):
+    """Evaluate every profile in profiles_path and write data-<name>.js for each."""
+    profiles = load_profiles(profiles_path)
+    with phase(stats, 'site.fetch_market'):
+        market_data, price_history = fetch_market_data()
+    
+    print("Loading game data...")
+    with phase(stats, 'site.load_game_data'):
+        calc = EnhancementCalculator('init_client_info.json')
+    if stats is not None:
+        calc.enable_stats(stats)
+    
+    print(f"Calculating profits for {len(calc.enhanceable_items)} items x {len(profiles)} profiles...")
+    with phase(stats, 'site.matrix'):
+        evaluated = evaluate_profiles(calc, market_data, profiles, TARGET_LEVELS)
+    
+    now_ts = int(datetime.now().timestamp())
+    price_history_meta = get_price_history_meta(price_history, now_ts)
+    
+    for name, (profile_calc, matrix) in evaluated.items():
+        with phase(stats, 'site.build_modes'):
+            all_modes = build_modes(matrix, price_history, now_ts)
+        with phase(stats, 'site.write'):
+            data_js = generate_data_js(all_modes, profile_calc.get_player_stats(), price_history_meta, calc.game_version)
+            
+            output = f'data-{name}.js'
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(data_js)
+        print(f"Generated {output}")
+        print_top(all_modes)
+
+
+def load_matrix(calc, market_data, stats=None):
+    """Get the profit matrix for market_data, refreshing the previous run's when possible."""
+    matrix = None
+    if MATRIX_STATE_FILE.exists():
+        try:
+            with open(MATRIX_STATE_FILE, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  Ignoring {MATRIX_STATE_FILE.name}: {e}")
+        else:
+            with phase(stats, 'site.refresh'):
+                matrix = ProfitMatrix.from_state(calc, state, market_data, TARGET_LEVELS)
+    
+    if matrix is None:
+        # Evaluate the whole catalog as arrays, only building rows we emit
+        with phase(stats, 'site.matrix'):
+            matrix = ProfitMatrix(calc, market_data, TARGET_LEVELS)
+    else:
+        print("  Refreshed the previous run's results")
+    return matrix
+
+
+def save_matrix(matrix, stats=None):
+    """Save the matrix's price inputs so the next run can refresh them."""
+    with phase(stats, 'site.save_state'):
+        with open(MATRIX_STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(matrix.to_state(), f)
+
+
+def write_site(calc, matrix, market_data, price_history, stats=None):
+    """Build rows from an evaluated matrix and write data.js and data.json."""
+    # Enrich with price age data
+    now_ts = int(datetime.now().timestamp())
+    with phase(stats, 'site.build_modes'):
+        all_modes = build_modes(matrix, price_history, now_ts)
+    
     profitable_count = len([r for r in all_modes['pessimistic'] if r['profit'] > MIN_PROFIT])
     print(f"Found {profitable_count} profitable opportunities (pessimistic)")
     
     # Get player stats for the gear dropdown
     player_stats = calc.get_player_stats()
     
-    # Timestamps for dynamic JavaScript calculation
-    price_history_meta = {
-        'last_check_ts': price_history.get('last_check_ts', now_ts),
-        'last_market_ts': price_history.get('last_market_timestamp', now_ts),
-        'update_history': price_history.get('update_history', [])
-    }
+    price_history_meta = get_price_history_meta(price_history, now_ts)
     
     # Generate data.js
-    data_js = generate_data_js(all_modes, player_stats, price_history_meta, calc.game_version)
-    
-    with open('data.js', 'w', encoding='utf-8') as f:
-        f.write(data_js)
-    print("Generated data.js")
-    
-    # Also keep data.json for debugging/API use
-    with open('data.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            'timestamp': market_data.get('timestamp'),
-            'generated': datetime.now().isoformat(),
-            'modes': {mode: results[:100] for mode, results in all_modes.items()},
-        }, f, indent=2)
-    print("Generated data.json")
+    with phase(stats, 'site.write'):
+        data_js = generate_data_js(all_modes, player_stats, price_history_meta, calc.game_version)
+        
+        with open('data.js', 'w', encoding='utf-8') as f:
+            f.write(data_js)
+        print("Generated data.js")
+        
+        # Also keep data.json for debugging/API use
+        with open('data.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': market_data.timestamp,
+                'generated': datetime.now().isoformat(),
+                'modes': serialize_modes(all_modes, 100),
+            }, f, indent=2)
+        print("Generated data.json")
+    
+    print_top(all_modes)
+
+
+def main(stats=None, watch=None):
+    """Generate and push the site once, or every watch seconds.
+    
+    The matrix starts from the previous run's saved state when there is one
+    (see load_matrix). With watch, the calculator and matrix stay loaded
+    between cycles. Each new snapshot is diffed against the previous one and
+    only the items whose inputs changed are recomputed (ProfitMatrix.refresh);
+    rows of all other items are kept from the previous cycle.
+    """
+    with phase(stats, 'site.fetch_market'):
+        market_data, price_history = fetch_market_data()
     
-    for mode_name in ['pessimistic']:
-        results = all_modes[mode_name]
-        profitable = [r for r in results if r['profit_after_fee'] > MIN_PROFIT]
-        print(f"\n=== Top 5 {mode_name.upper()} (by $/day after fee) ===")
-        profitable.sort(key=lambda r: r['profit_per_day_after_fee'], reverse=True)
-        for i, r in enumerate(profitable[:5], 1):
-            print(f"{i}. {r['item_name']} +{r['target_level']}: {format_coins(r['profit_after_fee'])} profit, {format_coins(r['total_cost'])} cost, {format_coins(r['profit_per_day_after_fee'])}/day")
+    print("Loading game data...")
+    with phase(stats, 'site.load_game_data'):
+        calc = EnhancementCalculator('init_client_info.json')
+    if stats is not None:
+        calc.enable_stats(stats)
     
-    # Push to GitHub Pages
-    git_push()
+    print(f"Calculating profits for {len(calc.enhanceable_items)} items...")
+    matrix = load_matrix(calc, market_data, stats)
+    
+    while True:
+        write_site(calc, matrix, market_data, price_history, stats)
+        save_matrix(matrix, stats)
+        
+        # Push to GitHub Pages
+        git_push()
+        
+        if not watch:
+            break
+        time.sleep(watch)
+        
+        previous = market_data
+        with phase(stats, 'site.fetch_market'):
+            market_data, price_history = fetch_market_data()
+        changed_keys = previous.diff(market_data)
+        if changed_keys:
+            with phase(stats, 'site.refresh'):
+                refreshed = matrix.refresh(market_data, changed_keys)
+            print(f"Recalculated {len(refreshed)} of {len(matrix.items)} items ({len(changed_keys)} changed prices)")
+        else:
+            print("No price changes, keeping previous results")
 
 
 def git_push():
@@ -278,4 +429,28 @@ def git_push():
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     allow_abbrev=False)
+    parser.add_argument('--profiles', help='JSON file of named USER_CONFIG overrides to evaluate together')
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help='keep running, refreshing only changed items every SECONDS')
+    parser.add_argument('--timings', nargs='?', const='timings.json', metavar='PATH',
+                        help='write calculator counters and phase timings as JSON (default timings.json)')
+    args = parser.parse_args()
+    if args.watch is not None and (args.watch <= 0 or args.profiles):
+        parser.error("--watch needs a positive interval and cannot be combined with --profiles")
+    if args.timings and not is_stats_file(args.timings):
+        parser.error(f"--timings: {args.timings} exists and is not a timings file, refusing to overwrite it")
+    
+    stats = CalcStats() if args.timings else None
+    if args.profiles:
+        main_profiles(args.profiles, stats)
+    else:
+        try:
+            main(stats, args.watch)
+        except KeyboardInterrupt:
+            print("Stopped")
+    
+    if stats is not None:
+        stats.write_json(args.timings)
+        print(f"Wrote {args.timings}")
@@ -26,6 +26,7 @@ import json
 import requests
 from datetime import datetime
 from pathlib import Path
+from market_snapshot import MarketSnapshot
 
 OUTPUT_FILE = Path(__file__).parent / 'volume.js'
 VOLUME_WINDOW = 24 * 60 * 60  # 24 hours in seconds
@@ -54,9 +55,11 @@ def load_previous_state():
 def update_volume(market_data, state):
     """
     Append new volume entries from market data.
+    market_data may be a MarketSnapshot or a marketplace.json dict.
     Returns (updated_state, is_new_data, new_entries_count).
     """
-    market_ts = market_data.get('timestamp', 0)
+    snapshot = MarketSnapshot.coerce(market_data)
+    market_ts = snapshot.timestamp
 
     if market_ts == state.get('lastTs', 0):
         return state, False, 0
@@ -64,19 +67,15 @@ def update_volume(market_data, state):
     vol_data = state.get('data', {})
     new_entries = 0
 
-    for item_hrid, levels in market_data.get('marketData', {}).items():
-        for level_str, price_data in levels.items():
-            v = price_data.get('v', 0)
-            p = price_data.get('p', 0)
+    for item_hrid, level, _, _, p, v in snapshot.entries():
+        if v <= 0 or p <= 0:
+            continue
 
-            if v <= 0 or p <= 0:
-                continue
-
-            key = f"{item_hrid}:{level_str}"
-            entries = vol_data.get(key, [])
-            entries.insert(0, [market_ts, p, v])
-            vol_data[key] = entries
-            new_entries += 1
+        key = f"{item_hrid}:{level}"
+        entries = vol_data.get(key, [])
+        entries.insert(0, [market_ts, p, v])
+        vol_data[key] = entries
+        new_entries += 1
 
     state['data'] = vol_data
     state['lastTs'] = market_ts
@@ -113,8 +112,8 @@ def build_volume_js(vol_data, market_ts):
 def main():
     print("Fetching market data...")
     resp = requests.get('https://www.milkywayidle.com/game_data/marketplace.json')
-    market_data = resp.json()
-    market_ts = market_data.get('timestamp', 0)
+    market_data = MarketSnapshot(resp.json())
+    market_ts = market_data.timestamp
     print(f"  Market timestamp: {datetime.fromtimestamp(market_ts)}")
 
     print("Loading previous volume data...")
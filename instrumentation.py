@@ -0,0 +1,182 @@
+"""
+Optional calculator instrumentation.
+
+EnhancementCalculator.enable_stats() swaps the calculator's class for a
+subclass whose hot methods are wrapped with counters and timers, and
+disable_stats() swaps it back. A calculator that never enables stats runs
+the plain methods, so there is no cost when disabled. The only permanent
+hooks are on the rare LinAlgError fallback paths.
+
+Collected numbers (CalcStats.to_dict()):
+  counters  method calls and cache misses (see COUNTED / SIZED), plus
+            pinv_fallbacks from the solvers
+  derived   cache hits (calls - misses)
+  timers    cumulative seconds per method (see TIMED) and per named phase
+            (CalcStats.phase, used by ProfitMatrix and generate_site)
+
+Recursive methods are timed at the outermost call only, so nested calls
+are not double counted.
+"""
+
+import contextlib
+import json
+import time
+
+# Method -> counter incremented on every call
+COUNTED = {
+    '_solve_chain': 'chain_lookups',
+    '_solve_chain_matrix': 'chain_inversions',
+    '_solve_chain_tables': 'chain_table_solve_calls',
+    'get_crafting_cost': 'crafting_cost_calls',
+    '_build_acquisition_table': 'acquisition_tables',
+    'get_item_price': 'item_price_calls',
+    '_resolve_item_price': 'item_price_misses',
+    'get_enhancement_inputs': 'enhancement_inputs_calls',
+    '_resolve_enhancement_inputs': 'enhancement_inputs_misses',
+    'get_enhancement_detail': 'detail_builds',
+    'calculate_profit': 'calculate_profit_calls',
+    '_price_all_targets': 'all_targets_pricings',
+    '_get_chain_spread': 'spread_lookups',
+    '_solve_chain_spread': 'spread_solves',
+    '_optimize_protection': 'protection_optimizations',
+    '_iterate_protection_policy': 'policy_iterations',
+}
+
+# Method -> counter incremented by the length of its first argument
+SIZED = {
+    '_solve_chain_tables': 'chain_tables',
+}
+
+# Methods whose cumulative run time is recorded
+TIMED = (
+    'get_all_profits_all_modes', 'get_all_profits', 'calculate_profit', '_price_all_targets',
+    '_optimize_protection', '_iterate_protection_policy',
+    '_solve_chain_tables', '_solve_chain_matrix', '_solve_chain_spread', '_build_acquisition_table',
+    'get_enhancement_inputs',
+    'get_enhancement_detail',
+)
+
+# (hits counter, calls counter, misses counter)
+CACHE_HITS = (
+    ('chain_cache_hits', 'chain_lookups', ('chain_inversions',)),
+    ('spread_cache_hits', 'spread_lookups', ('spread_solves',)),
+    ('item_price_hits', 'item_price_calls', ('item_price_misses',)),
+    ('enhancement_inputs_hits', 'enhancement_inputs_calls', ('enhancement_inputs_misses',)),
+)
+
+
+class CalcStats:
+    """Counters and cumulative timers for one or more calculators."""
+
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}
+        self._active = set()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a block under name (cumulative)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def to_dict(self):
+        counters = dict(sorted(self.counters.items()))
+        derived = {}
+        for hits, calls, misses in CACHE_HITS:
+            if calls in counters:
+                derived[hits] = counters[calls] - sum(counters.get(miss, 0) for miss in misses)
+        return {
+            'counters': counters,
+            'derived': derived,
+            'timers': {name: round(seconds, 6) for name, seconds in sorted(self.timers.items())},
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def is_stats_file(path):
+    """Whether path is missing or holds a CalcStats.to_dict() dump (safe to overwrite)."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return True
+    except (OSError, ValueError):
+        return False
+    return isinstance(data, dict) and set(data) == {'counters', 'derived', 'timers'}
+
+
+def phase(stats, name):
+    """stats.phase(name), or a no-op context when stats is None."""
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.phase(name)
+
+
+def _wrap(method, name):
+    counter = COUNTED.get(name)
+    sized = SIZED.get(name)
+    timed = name in TIMED
+
+    def wrapper(self, *args, **kwargs):
+        stats = self.stats
+        if counter:
+            stats.count(counter)
+        if sized:
+            stats.count(sized, len(args[0]))
+        if not timed or name in stats._active:
+            return method(self, *args, **kwargs)
+
+        stats._active.add(name)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            stats.add_time(name, time.perf_counter() - start)
+            stats._active.discard(name)
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+_instrumented_classes = {}
+
+
+def _instrumented_class(cls):
+    if cls not in _instrumented_classes:
+        names = set(COUNTED) | set(SIZED) | set(TIMED)
+        namespace = {name: _wrap(getattr(cls, name), name) for name in names if hasattr(cls, name)}
+        namespace['_instrumented_base'] = cls
+        namespace['__module__'] = cls.__module__
+        _instrumented_classes[cls] = type(cls.__name__, (cls,), namespace)
+    return _instrumented_classes[cls]
+
+
+def instrument(calc, stats=None):
+    """Enable instrumentation on calc; returns its CalcStats."""
+    if stats is None:
+        stats = calc.stats if calc.stats is not None else CalcStats()
+    base = getattr(calc, '_instrumented_base', type(calc))
+    calc.__class__ = _instrumented_class(base)
+    calc.stats = stats
+    return stats
+
+
+def uninstrument(calc):
+    """Disable instrumentation on calc; returns the CalcStats it collected (or None)."""
+    stats = calc.stats
+    calc.__class__ = getattr(calc, '_instrumented_base', type(calc))
+    calc.stats = None
+    return stats
@@ -0,0 +1,186 @@
+"""
+Compact, array-backed market snapshot.
+
+marketplace.json looks like
+  {"timestamp": ..., "marketData": {"<hrid>": {"<level>": {"a", "b", "p", "v"}}}}
+and every price lookup on it formats a level string and probes three nested
+dicts. MarketSnapshot interns each hrid to an integer id once and stores
+ask/bid/avg price/volume in flat int64 arrays (market prices are whole
+coins) indexed by id * LEVELS + level, so lookups are a dict hit plus
+array reads.
+
+The same snapshot backs the calculator (_get_buy_price / get_sell_price),
+the history diff in generate_prices.py and the volume updater in
+generate_volume.py. share() / attach() put the columns in shared memory so
+worker processes read one copy (see parallel_profits.py). Missing ask/bid are -1 and missing avg/volume are 0,
+like the .get() defaults they replace.
+
+Columns are plain array.array buffers, so the price cron (generate_prices.py,
+generate_volume.py) does not need numpy; arrays() and diff() import it when
+called.
+
+Derived per-snapshot tables (the cheapest-acquisition tables of
+acquisition.py) are memoized in snapshot.acquisition, so every calculator
+reading the snapshot builds them once.
+"""
+
+from array import array
+from multiprocessing import shared_memory
+
+LEVELS = 21  # +0 to +20
+MISSING = (-1, -1)
+
+# Per-slot columns and their array typecodes, in shared memory layout order
+COLUMNS = (('ask', 'q'), ('bid', 'q'), ('avg', 'q'), ('volume', 'q'), ('present', 'b'))
+
+
+class MarketSnapshot:
+    """Market prices for one marketplace.json timestamp."""
+    __slots__ = ('timestamp', 'hrids', 'ids', 'ask', 'bid', 'avg', 'volume', 'present', 'acquisition')
+
+    def __init__(self, market_data):
+        self.timestamp = market_data.get('timestamp', 0)
+        market = market_data.get('marketData', {})
+
+        self.hrids = list(market)
+        self.ids = {hrid: i for i, hrid in enumerate(self.hrids)}
+
+        size = len(self.hrids) * LEVELS
+        self.ask = array('q', [-1]) * size
+        self.bid = array('q', [-1]) * size
+        self.avg = array('q', [0]) * size
+        self.volume = array('q', [0]) * size
+        self.present = array('b', [0]) * size
+        self.acquisition = {}
+
+        for item_id, levels in enumerate(market.values()):
+            for level_str, prices in levels.items():
+                level = int(level_str)
+                if not 0 <= level < LEVELS:
+                    continue
+                slot = item_id * LEVELS + level
+                self.ask[slot] = prices.get('a', -1)
+                self.bid[slot] = prices.get('b', -1)
+                self.avg[slot] = prices.get('p', 0)
+                self.volume[slot] = prices.get('v', 0)
+                self.present[slot] = 1
+
+    @classmethod
+    def coerce(cls, market_data):
+        """Get a snapshot from either a snapshot or a marketplace.json dict."""
+        if isinstance(market_data, cls):
+            return market_data
+        return cls(market_data)
+
+    def __len__(self):
+        return len(self.hrids)
+
+    def __contains__(self, hrid):
+        return hrid in self.ids
+
+    def quote(self, hrid, level):
+        """Get (ask, bid) for an item level, (-1, -1) if not listed."""
+        item_id = self.ids.get(hrid)
+        if item_id is None or not 0 <= level < LEVELS:
+            return MISSING
+        slot = item_id * LEVELS + level
+        return self.ask[slot], self.bid[slot]
+
+    def entries(self):
+        """Yield (hrid, level, ask, bid, avg, volume) for every listed item level, in file order."""
+        for item_id, hrid in enumerate(self.hrids):
+            base = item_id * LEVELS
+            for level in range(LEVELS):
+                slot = base + level
+                if self.present[slot]:
+                    yield hrid, level, self.ask[slot], self.bid[slot], self.avg[slot], self.volume[slot]
+
+    def to_dict(self):
+        """Get the snapshot back in marketplace.json form (listed item levels only)."""
+        market = {}
+        for hrid, level, ask, bid, avg, volume in self.entries():
+            market.setdefault(hrid, {})[str(level)] = {'a': ask, 'b': bid, 'p': avg, 'v': volume}
+        return {'timestamp': self.timestamp, 'marketData': market}
+
+    def arrays(self):
+        """Get (ask, bid, avg, volume, present) as (items, LEVELS) numpy views without copying."""
+        import numpy as np
+
+        shape = (len(self.hrids), LEVELS)
+        return tuple(
+            np.frombuffer(getattr(self, name), dtype=typecode).reshape(shape)
+            for name, typecode in COLUMNS
+        )
+
+    def share(self):
+        """Copy the price columns into a new shared memory block.
+
+        Returns (shm, spec). spec is small and picklable; pass it to attach()
+        in other processes. The caller owns shm and must close() and unlink()
+        it once those processes are done.
+        """
+        size = len(self.hrids) * LEVELS
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size * sum(array(t).itemsize for _, t in COLUMNS)))
+        offset = 0
+        for name, typecode in COLUMNS:
+            nbytes = size * array(typecode).itemsize
+            shm.buf[offset:offset + nbytes] = memoryview(getattr(self, name)).cast('B')
+            offset += nbytes
+        return shm, (shm.name, self.timestamp, self.hrids)
+
+    @classmethod
+    def attach(cls, spec):
+        """Get a snapshot whose columns are views of a share() block.
+
+        Returns (shm, snapshot); keep shm open for as long as the snapshot is used.
+        """
+        name, timestamp, hrids = spec
+        shm = shared_memory.SharedMemory(name=name)
+        snapshot = cls.__new__(cls)
+        snapshot.timestamp = timestamp
+        snapshot.hrids = list(hrids)
+        snapshot.ids = {hrid: i for i, hrid in enumerate(snapshot.hrids)}
+        snapshot.acquisition = {}
+
+        size = len(snapshot.hrids) * LEVELS
+        offset = 0
+        for column, typecode in COLUMNS:
+            nbytes = size * array(typecode).itemsize
+            view = shm.buf[offset:offset + nbytes].cast(typecode)
+            setattr(snapshot, column, view)
+            offset += nbytes
+        return shm, snapshot
+
+    def diff(self, other):
+        """Get "hrid:level" keys whose ask or bid differ from another snapshot.
+
+        A missing level reads as ask = bid = -1, so levels that gain or lose
+        prices count as changed. Items present in both snapshots are compared
+        as arrays.
+        """
+        import numpy as np
+
+        ask, bid, _, _, _ = self.arrays()
+        other_ask, other_bid, _, _, _ = other.arrays()
+
+        shared = [hrid for hrid in self.hrids if hrid in other.ids]
+        mine = np.array([self.ids[hrid] for hrid in shared], dtype=int)
+        theirs = np.array([other.ids[hrid] for hrid in shared], dtype=int)
+
+        changed = set()
+        if shared:
+            differs = (ask[mine] != other_ask[theirs]) | (bid[mine] != other_bid[theirs])
+            for row, level in zip(*differs.nonzero()):
+                changed.add(f"{shared[row]}:{level}")
+
+        # Items only in one snapshot: every priced level changed
+        for snapshot, others in ((self, other), (other, self)):
+            snap_ask, snap_bid, _, _, _ = snapshot.arrays()
+            for hrid in snapshot.hrids:
+                if hrid not in others.ids:
+                    item_id = snapshot.ids[hrid]
+                    priced = (snap_ask[item_id] != -1) | (snap_bid[item_id] != -1)
+                    for level in priced.nonzero()[0]:
+                        changed.add(f"{hrid}:{level}")
+
+        return changed
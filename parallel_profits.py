@@ -0,0 +1,82 @@
+"""
+Parallel all-modes profit evaluation.
+
+EnhancementCalculator.get_all_profits_all_modes(..., workers=N) splits the
+profit items into contiguous shards and evaluates them in a process pool:
+
+  - The market snapshot is copied once into shared memory
+    (MarketSnapshot.share) and every worker reads it through attach().
+  - Workers build their calculator once, in the pool initializer, from the
+    compact game data cache file, so a task is just a list of item hrids.
+  - Each shard comes back sorted like get_all_profits. heapq.merge over the
+    shards in shard order reproduces the serial order exactly (profit
+    descending, ties in item/target order).
+
+Material detail is not shipped back; merged rows load it lazily from the
+parent calculator like serial rows do.
+"""
+
+import functools
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from enhance_calc import EnhancementCalculator, PriceMode
+from market_snapshot import MarketSnapshot
+
+MODES = [PriceMode.PESSIMISTIC, PriceMode.MIDPOINT, PriceMode.OPTIMISTIC]
+SHARDS_PER_WORKER = 4
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def _init_worker(game_data_path, profile, use_cache, snapshot_spec):
+    shm, snapshot = MarketSnapshot.attach(snapshot_spec)
+    _worker['shm'] = shm
+    _worker['snapshot'] = snapshot
+    _worker['calc'] = EnhancementCalculator(game_data_path, profile, use_cache)
+
+
+def _evaluate_shard(items, target_levels):
+    calc = _worker['calc']
+    snapshot = _worker['snapshot']
+    return {
+        mode.value: calc.get_all_profits(snapshot, target_levels, mode, items=items)
+        for mode in MODES
+    }
+
+
+def split_items(items, shard_count):
+    """Split items into at most shard_count contiguous, order-preserving shards."""
+    size = max(1, -(-len(items) // max(1, shard_count)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def get_all_profits_parallel(calc, market_data, target_levels=[8, 10, 12, 14], workers=2):
+    """Parallel get_all_profits_all_modes for calc; same results, same order."""
+    items = [item['hrid'] for item in calc.get_profit_items()]
+    shards = split_items(items, workers * SHARDS_PER_WORKER)
+
+    shm, spec = calc.get_snapshot(market_data).share()
+    try:
+        initargs = (calc.game_data_path, calc.profile, calc.use_cache, spec)
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+            shard_results = list(pool.map(_evaluate_shard, shards, [target_levels] * len(shards)))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    all_modes = {}
+    for mode in MODES:
+        merged = heapq.merge(
+            *(shard[mode.value] for shard in shard_results),
+            key=lambda result: result.profit, reverse=True,
+        )
+        rows = []
+        for result in merged:
+            result._load_detail = functools.partial(calc._get_cached_detail, result.item_hrid, market_data, mode)
+            result._load_spread = functools.partial(
+                calc._get_result_spread, result.inputs, result.target_level, result.protect_levels
+            )
+            rows.append(result)
+        all_modes[mode.value] = rows
+    return all_modes
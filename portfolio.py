@@ -0,0 +1,184 @@
+"""
+Budget- and time-constrained enhancement portfolio.
+
+get_all_profits ranks (item, target) jobs one by one. With limited coins and
+one enhancing action queue, the real question is which set of jobs to run
+over the next few days. That is a knapsack with two capacities: the coin
+budget (sum of total_cost) and the horizon (sum of time_days, since jobs
+share the queue). Each item is a group of alternative jobs, one per
+target, and at most one job per item is picked.
+
+The solver is a dynamic program over a (time, coins) grid. Each job's time
+and cost are rounded *up* to grid units, so every returned portfolio fits
+the real budget and horizon. Rounding wastes up to one unit per chosen
+job, so each axis's unit is a fraction of its lightest candidate job (up
+to JOB_STEPS units per job) with at least resolution steps, and the grid
+is capped at MAX_GRID_CELLS. Each item updates the whole grid with a few
+array operations per job, so the full catalog takes well under a second.
+
+Capital is counted as committed for the whole horizon. Coins from a
+finished job's sale are not reinvested.
+
+Usage:
+  python portfolio.py BUDGET [DAYS] [init_client_info.json] [marketplace.json]
+"""
+
+import argparse
+import json
+import numpy as np
+from enhance_calc import EnhancementCalculator
+
+# Minimum grid steps per axis
+RESOLUTION = 200
+# Grid units the lightest job spans on each axis, when the grid cap allows
+JOB_STEPS = 10
+# Cap on (time steps + 1) * (coin steps + 1); each item stores one byte per cell
+MAX_GRID_CELLS = 250_000
+
+
+def grid_units(time_days, costs, horizon_days, budget, resolution=RESOLUTION):
+    """Get the (time, coin) grid units for jobs of the given times and costs.
+
+    Each axis is (base, count): a weight w takes ceil(w / base * count)
+    units and the capacity floor(capacity / base * count). Rounding up
+    wastes less than one unit per chosen job, so the unit is the lightest
+    job / k with k up to JOB_STEPS, as large as MAX_GRID_CELLS allows; jobs
+    as light as the lightest then round exactly. An axis with fewer than
+    resolution steps that way uses capacity / resolution instead. If even
+    k = 1 is too fine, both axes are shrunk alike, but not below resolution.
+    """
+    axes = [(min(weights, default=capacity), capacity)
+            for weights, capacity in ((time_days, horizon_days), (costs, budget))]
+    for k in range(JOB_STEPS, 0, -1):
+        units = [(lightest, k) if capacity / lightest * k >= resolution else (capacity, resolution)
+                 for lightest, capacity in axes]
+        steps = [grid_capacity(capacity, unit) for (_, capacity), unit in zip(axes, units)]
+        if (steps[0] + 1) * (steps[1] + 1) <= MAX_GRID_CELLS:
+            return units
+
+    scale = np.sqrt(MAX_GRID_CELLS / ((steps[0] + 1) * (steps[1] + 1)))
+    steps = [max(resolution, int(n * scale)) for n in steps]
+    # An axis held at resolution leaves the rest of the cap to the other
+    limits = [MAX_GRID_CELLS // (steps[1] + 1) - 1, MAX_GRID_CELLS // (steps[0] + 1) - 1]
+    steps = [max(resolution, min(n, limit)) for n, limit in zip(steps, limits)]
+    return [(capacity, n) for (_, capacity), n in zip(axes, steps)]
+
+
+def grid_weight(weight, unit):
+    """Grid units a job of weight takes, rounded up."""
+    base, count = unit
+    return int(np.ceil(weight / base * count))
+
+
+def grid_capacity(capacity, unit):
+    """Grid units available for capacity, rounded down."""
+    base, count = unit
+    return int(np.floor(capacity / base * count))
+
+
+def optimize_portfolio(rows, budget, horizon_days=1.0, objective='profit', time_field='time_days',
+                       one_per_item=True, resolution=RESOLUTION):
+    """Pick the jobs with the highest total objective within budget and horizon_days.
+
+    rows are get_all_profits results (or dicts with item_hrid, target_level,
+    total_cost, the time_field and the objective). Only rows with a
+    positive objective that fit on their own are considered. time_field
+    may be e.g. 'time_p90_days' to plan on pessimistic durations. With
+    one_per_item=False every row is independent. resolution is the
+    minimum grid steps per axis (see grid_units).
+
+    Returns a dict: jobs (chosen rows, best objective first), objective,
+    total_value, total_cost, total_days, budget, horizon_days, candidates.
+    """
+    if budget <= 0 or horizon_days <= 0:
+        raise ValueError("budget and horizon_days must be positive")
+
+    groups = {}
+    for row in rows:
+        if row[objective] > 0 and 0 < row['total_cost'] <= budget and 0 < row[time_field] <= horizon_days:
+            key = row['item_hrid'] if one_per_item else len(groups)
+            groups.setdefault(key, []).append(row)
+    groups = list(groups.values())
+
+    # Grid weights, rounded up so the rounded plan is always feasible
+    candidates = [row for options in groups for row in options]
+    time_unit, coin_unit = grid_units([row[time_field] for row in candidates],
+                                      [row['total_cost'] for row in candidates],
+                                      horizon_days, budget, resolution)
+    time_steps, coin_steps = grid_capacity(horizon_days, time_unit), grid_capacity(budget, coin_unit)
+    weights = [
+        [(grid_weight(row[time_field], time_unit), grid_weight(row['total_cost'], coin_unit),
+          float(row[objective])) for row in options]
+        for options in groups
+    ]
+
+    # value[t, c]: best total using at most t time units and c coin units
+    shape = (time_steps + 1, coin_steps + 1)
+    value = np.zeros(shape)
+    choices = np.zeros((len(groups),) + shape, dtype=np.uint8)
+    for g, options in enumerate(weights):
+        best = value.copy()
+        for o, (t, c, v) in enumerate(options, 1):
+            candidate = value[:shape[0] - t, :shape[1] - c] + v
+            better = candidate > best[t:, c:]
+            best[t:, c:][better] = candidate[better]
+            choices[g, t:, c:][better] = o
+        value = best
+
+    # Walk back from the full grid, one group at a time
+    jobs = []
+    t, c = time_steps, coin_steps
+    for g in range(len(groups) - 1, -1, -1):
+        o = int(choices[g, t, c])
+        if o:
+            jobs.append(groups[g][o - 1])
+            t -= weights[g][o - 1][0]
+            c -= weights[g][o - 1][1]
+
+    jobs.sort(key=lambda row: row[objective], reverse=True)
+    return {
+        'jobs': jobs,
+        'objective': objective,
+        'total_value': sum(row[objective] for row in jobs),
+        'total_cost': sum(row['total_cost'] for row in jobs),
+        'total_days': sum(row[time_field] for row in jobs),
+        'budget': budget,
+        'horizon_days': horizon_days,
+        'candidates': sum(len(options) for options in groups),
+    }
+
+
+def main(budget, days=1.0, game_data_path='init_client_info.json', market_path=None):
+    from generate_site import MAX_ROI, format_coins
+
+    if market_path:
+        with open(market_path, encoding='utf-8') as f:
+            market_data = json.load(f)
+    else:
+        import requests
+        resp = requests.get('https://www.milkywayidle.com/game_data/marketplace.json')
+        market_data = resp.json()
+
+    calc = EnhancementCalculator(game_data_path)
+    plan = calc.optimize_portfolio(market_data, budget, days, max_roi=MAX_ROI)
+
+    print(f"{'Item':<36} {'Target':>6} {'Cost':>8} {'Profit':>8} {'Hours':>6}")
+    for r in plan['jobs']:
+        print(f"{r['item_name']:<36} {'+' + str(r['target_level']):>6} {format_coins(r['total_cost']):>8} "
+              f"{format_coins(r['profit']):>8} {r['time_hours']:>6.1f}")
+    print(f"\n{len(plan['jobs'])} jobs of {plan['candidates']} candidates: "
+          f"profit {format_coins(plan['total_value'])}, cost {format_coins(plan['total_cost'])} "
+          f"of {format_coins(plan['budget'])}, {plan['total_days']:.2f} of {plan['horizon_days']:g} days")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     allow_abbrev=False)
+    parser.add_argument('budget', type=float, help='coins to commit')
+    parser.add_argument('days', type=float, nargs='?', default=1.0, help='horizon in days (default 1)')
+    parser.add_argument('game_data', nargs='?', default='init_client_info.json')
+    parser.add_argument('market', nargs='?', help='marketplace.json (default: fetch the live market)')
+    args = parser.parse_args()
+    if args.budget <= 0 or args.days <= 0:
+        parser.error("BUDGET and DAYS must be positive")
+    main(args.budget, args.days, args.game_data, args.market)
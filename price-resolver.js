@@ -250,6 +250,37 @@ class PriceResolver {
         return item?.sellPrice || 0;
     }
 
+    /**
+     * Get the precomputed cheapest-acquisition row [price, source, craftCost]
+     * from prices.js (pessimistic mode), or null when it does not apply: other
+     * market prices (e.g. historical), another artisan tea multiplier, or
+     * craft subcomponents turned off.
+     */
+    _getAcquisition(hrid, marketPrices, artisanMult) {
+        const acquisition = window.PRICES?.acquisition;
+        if (!acquisition || marketPrices !== window.PRICES.market) return null;
+        if (Math.abs(acquisition.artisan - artisanMult) > 1e-9 || window.allowCraftSubcomponents === false) return null;
+        return acquisition.modes.pessimistic?.[hrid] || [0, 'none', 0];
+    }
+
+    /**
+     * Price of one recipe input or upgrade item. Always pessimistic (ask).
+     * Market or (with craft subcomponents allowed) its own craft cost,
+     * whichever is lower, else the vendor price; 0 means it cannot be priced.
+     * Same rule as acquisition.py, so live and historical costs agree.
+     */
+    _getInputPrice(hrid, marketPrices, artisanMult, depth) {
+        if (hrid === '/items/coin') return 1;
+        if (hrid.includes('trainee') && hrid.includes('charm')) return 250000;
+
+        let price = this._resolveBuyPrice(hrid, 0, marketPrices, BuyMode.PESSIMISTIC).price;
+        if (window.allowCraftSubcomponents !== false) {
+            const craft = this._getCraftingCost(hrid, marketPrices, artisanMult, depth + 1);
+            if (craft > 0 && (price <= 0 || craft < price)) price = craft;
+        }
+        return price > 0 ? price : this._getVendorPrice(hrid);
+    }
+
     /**
      * Calculate crafting cost recursively. Always pessimistic (ask).
      */
@@ -257,6 +288,9 @@ class PriceResolver {
         if (depth > 10) return 0;
         if (hrid === '/items/coin') return 1;
 
+        const acquired = this._getAcquisition(hrid, marketPrices, artisanMult);
+        if (acquired) return acquired[2];
+
         const item = this.items[hrid];
         if (!item) return 0;
 
@@ -270,37 +304,15 @@ class PriceResolver {
 
         let cost = 0;
 
-        const craftSubsAllowed = window.allowCraftSubcomponents !== false;
-
         for (const input of (recipe.inputs || [])) {
-            const count = input.count * artisanMult;
-            // Min(market, craft) for each input — respects allowCraftSubcomponents toggle
-            let inputPrice = this._resolveBuyPrice(input.item, 0, marketPrices, BuyMode.PESSIMISTIC).price;
-            if (craftSubsAllowed) {
-                const inputCraft = this._getCraftingCost(input.item, marketPrices, artisanMult, depth + 1);
-                if (inputPrice > 0 && inputCraft > 0) {
-                    inputPrice = Math.min(inputPrice, inputCraft);
-                } else if (inputPrice <= 0 && inputCraft > 0) {
-                    inputPrice = inputCraft;
-                }
-            }
-            // No vendor fallback inside craft cost — if we can't price an input,
-            // the entire craft cost is invalid (return 0)
+            // If any input cannot be priced, the entire craft cost is invalid (return 0)
+            const inputPrice = this._getInputPrice(input.item, marketPrices, artisanMult, depth);
             if (inputPrice <= 0) return 0;
-            cost += count * inputPrice;
+            cost += input.count * artisanMult * inputPrice;
         }
 
         if (recipe.upgrade) {
-            // Min(market, craft) for upgrade item too — respects allowCraftSubcomponents toggle
-            let upgradePrice = this._resolveBuyPrice(recipe.upgrade, 0, marketPrices, BuyMode.PESSIMISTIC).price;
-            if (craftSubsAllowed) {
-                const upgradeCraft = this._getCraftingCost(recipe.upgrade, marketPrices, artisanMult, depth + 1);
-                if (upgradePrice > 0 && upgradeCraft > 0) {
-                    upgradePrice = Math.min(upgradePrice, upgradeCraft);
-                } else if (upgradePrice <= 0 && upgradeCraft > 0) {
-                    upgradePrice = upgradeCraft;
-                }
-            }
+            const upgradePrice = this._getInputPrice(recipe.upgrade, marketPrices, artisanMult, depth);
             if (upgradePrice <= 0) return 0;
             cost += upgradePrice;
         }
@@ -318,6 +330,11 @@ class PriceResolver {
             return { price: 250000, source: 'vendor' };
         }
 
+        if (enhLevel === 0) {
+            const acquired = this._getAcquisition(hrid, marketPrices, artisanMult);
+            if (acquired) return { price: acquired[0], source: acquired[1] };
+        }
+
         const marketPrice = this._resolveBuyPrice(hrid, enhLevel, marketPrices, BuyMode.PESSIMISTIC).price;
 
         if (enhLevel === 0) {
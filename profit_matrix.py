@@ -0,0 +1,477 @@
+"""
+Catalog-wide profit matrix.
+
+Evaluates every profit item x target level x price mode as numpy array
+operations instead of one calculate_profit call per row:
+
+  1. Price inputs (base, materials, coin, protection, sell) are gathered once
+     per item and mode into arrays.
+  2. Chain solutions (actions, protections, XP) come from the calculator's
+     chain cache, one (target, protect_at) table per item level.
+  3. Cost for every protection level, the best protect_at, profit, fees, ROI
+     and per-day metrics are computed for the whole cube at once.
+  4. Every best protect_at is checked against per-level protection policies
+     in one pass over the start tables, as _optimize_protection does; the
+     rare cells where another policy is cheaper are priced by it.
+
+ProfitResult rows are only built for the cells that are actually emitted
+(see to_rows / to_modes), and their material breakdowns only when read.
+
+to_state() / from_state() carry the price inputs of step 1 and their market
+snapshot between processes, so a later run can refresh() only the items
+whose prices changed instead of re-resolving the whole catalog.
+"""
+
+import functools
+import numpy as np
+from enhance_calc import MARKET_FEE, SUCCESS_RATE, PriceMode, ProfitResult
+from instrumentation import phase
+from market_snapshot import MarketSnapshot
+
+MODES = [PriceMode.PESSIMISTIC, PriceMode.MIDPOINT, PriceMode.OPTIMISTIC]
+
+# Bump when the saved price inputs change meaning (see to_state)
+STATE_FORMAT = 1
+
+# Per-item price arrays filled by _load_prices, in to_state() order
+PRICE_ARRAYS = ('item_levels', 'has_inputs', 'base_price', 'mat_per_attempt', 'coin_cost',
+                'protect_price', 'sell_price')
+
+
+class ProfitMatrix:
+    """Profit metrics for items x targets x modes, stored as numpy arrays.
+
+    Array axes are (item, target, mode) unless noted. Rows without a result
+    (no priced protection, no sell price, target below +2) have valid=False.
+    """
+
+    def __init__(self, calc, market_data, target_levels=[8, 10, 12, 14], modes=MODES):
+        self.calc = calc
+        self.market_data = market_data
+        self.items = [item['hrid'] for item in calc.get_profit_items()]
+        self.targets = list(target_levels)
+        self.modes = list(modes)
+        self._details = {}
+        self._rows = {}
+
+        stats = calc.stats
+        with phase(stats, 'matrix.load_prices'):
+            self._load_prices()
+        with phase(stats, 'matrix.load_chains'):
+            self._load_chains()
+        with phase(stats, 'matrix.evaluate'):
+            self._evaluate()
+
+    def _load_prices(self):
+        """Gather per-item price inputs for every mode into arrays."""
+        calc = self.calc
+        n_items, n_targets, n_modes = len(self.items), len(self.targets), len(self.modes)
+
+        self.inputs = [[None] * n_modes for _ in range(n_items)]
+        self.item_levels = np.ones(n_items, dtype=int)
+        self.has_inputs = np.zeros((n_items, n_modes), dtype=bool)
+        self.base_price = np.zeros((n_items, n_modes))
+        self.mat_per_attempt = np.zeros((n_items, n_modes))
+        self.coin_cost = np.zeros((n_items, n_modes))
+        self.protect_price = np.zeros((n_items, n_modes))
+        self.sell_price = np.zeros((n_items, n_targets, n_modes))
+
+        for i, hrid in enumerate(self.items):
+            self.item_levels[i] = calc.item_detail_map[hrid].get('itemLevel', 1)
+            self._load_item_prices(i)
+
+    def _load_item_prices(self, i):
+        """Fill one item's row of the price arrays from the current market data."""
+        calc = self.calc
+        hrid = self.items[i]
+
+        for m, mode in enumerate(self.modes):
+            inputs = calc.get_enhancement_inputs(hrid, self.market_data, mode)
+            self.inputs[i][m] = inputs
+            self.has_inputs[i, m] = bool(inputs)
+            if inputs:
+                self.base_price[i, m] = inputs['base_price']
+                self.mat_per_attempt[i, m] = sum(count * price for count, price in inputs['mat_prices'])
+                self.coin_cost[i, m] = inputs['coin_cost']
+                self.protect_price[i, m] = inputs['protect_price']
+            for t, target in enumerate(self.targets):
+                self.sell_price[i, t, m] = calc.get_sell_price(hrid, target, self.market_data, mode)
+
+    def _load_chains(self):
+        """Build (item, target, protect level) arrays of chain solutions.
+
+        Protect levels run from +2 to the highest target; entries above an
+        item's target are NaN. They are sliced from the calculator's chain
+        table per item level, so all targets cost one batched pass. This and
+        attempt times are the only gear-dependent inputs besides craft costs.
+        """
+        calc = self.calc
+        self.attempt_time = np.array([calc.get_attempt_time(level) for level in self.item_levels.tolist()])
+        calc._prime_chain_tables(self.item_levels.tolist(), all_starts=True)
+
+        self.protect_levels = np.arange(2, max(self.targets, default=2) + 1)
+        rows = [target - 1 for target in self.targets]
+        columns = self.protect_levels - 2
+
+        tables = {}
+        for item_level in set(self.item_levels.tolist()):
+            tables[item_level] = calc._get_chain_table(item_level)[:, rows][:, :, columns]
+
+        stacked = np.array([tables[level] for level in self.item_levels.tolist()])
+        self.chain_actions = stacked[:, 0]
+        self.chain_protects = stacked[:, 1]
+        self.chain_xp = stacked[:, 2]
+
+    def _evaluate(self):
+        """Pick the cheapest protect_at and compute profit metrics for the cube."""
+        per_attempt = (self.mat_per_attempt + self.coin_cost)[:, None, :, None]
+        actions = self.chain_actions[:, :, None, :]
+        protects = self.chain_protects[:, :, None, :]
+
+        # (item, target, mode, protect level)
+        mat_cost = per_attempt * actions + self.protect_price[:, None, :, None] * protects
+        total_cost = self.base_price[:, None, :, None] + mat_cost
+        total_cost = np.where(np.isnan(total_cost), np.inf, total_cost)
+
+        best = np.argmin(total_cost, axis=3)[..., None]
+        self.protect_at = self.protect_levels[best[..., 0]]
+        self.total_cost = np.take_along_axis(total_cost, best, axis=3)[..., 0]
+        self.mat_cost = np.take_along_axis(mat_cost, best, axis=3)[..., 0]
+        n_modes = len(self.modes)
+        self.actions = np.take_along_axis(np.repeat(actions, n_modes, axis=2), best, axis=3)[..., 0]
+        self.protect_count = np.take_along_axis(np.repeat(protects, n_modes, axis=2), best, axis=3)[..., 0]
+        self.total_xp = np.take_along_axis(
+            np.repeat(self.chain_xp[:, :, None, :], n_modes, axis=2), best, axis=3
+        )[..., 0]
+        self._check_policies(best[..., 0])
+
+        self.valid = (
+            self.has_inputs[:, None, :]
+            & (self.sell_price > 0)
+            & np.isfinite(self.total_cost)
+        )
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.market_fee = self.sell_price * MARKET_FEE
+            self.profit = self.sell_price - self.total_cost
+            self.profit_after_fee = self.profit - self.market_fee
+
+            has_cost = self.total_cost > 0
+            self.roi = np.where(has_cost, self.profit / self.total_cost * 100, 0.0)
+            self.roi_after_fee = np.where(has_cost, self.profit_after_fee / self.total_cost * 100, 0.0)
+
+            self.time_hours = self.actions * self.attempt_time[:, None, None] / 3600
+            self.time_days = self.time_hours / 24
+            has_time = self.time_days > 0
+            self.profit_per_day = np.where(has_time, self.profit / self.time_days, 0.0)
+            self.profit_per_day_after_fee = np.where(has_time, self.profit_after_fee / self.time_days, 0.0)
+            self.xp_per_day = np.where(has_time, self.total_xp / self.time_days, 0.0)
+
+    def _check_policies(self, best):
+        """Replace best thresholds that another per-level protection policy beats.
+
+        With V the expected remaining cost from every level under the
+        chosen threshold (the start tables), the threshold is optimal unless
+        protect_price + V[i-1] < V[0] flips some level's choice (see
+        EnhancementCalculator._optimize_protection). Failing cells are
+        re-priced by _optimize_protection and their protected levels kept
+        in policies[(item, target, mode)].
+        """
+        calc = self.calc
+        n_items, n_targets, n_modes = best.shape
+        size = len(SUCCESS_RATE)
+        rows = [target - 1 for target in self.targets]
+        columns = self.protect_levels - 2
+
+        value = np.zeros((n_items, n_targets, n_modes, size + 1))
+        per_attempt = self.mat_per_attempt + self.coin_cost
+        item_levels, groups = np.unique(self.item_levels, return_inverse=True)
+        for g, item_level in enumerate(item_levels.tolist()):
+            idx = np.flatnonzero(groups == g)
+            actions, protects = calc._get_start_table(item_level)[:2][:, :, rows][..., columns]
+            starts = np.arange(size)[None, :, None, None]
+            cells = (starts, np.arange(n_targets)[None, None, :, None], best[idx][:, None])
+            cost = (per_attempt[idx][:, None, None, :] * actions[cells]
+                    + self.protect_price[idx][:, None, None, :] * protects[cells])
+            value[idx, :, :, :size] = cost.transpose(0, 2, 3, 1)
+
+        levels = np.arange(size + 1)
+        transient = np.broadcast_to(levels < np.array(self.targets)[:, None, None], value.shape)
+        value = np.where(transient, value, 0.0)
+        protect = transient & (levels >= self.protect_at[..., None])
+        improved = calc._improve_protection(
+            value.reshape(-1, size + 1), protect.reshape(-1, size + 1), transient.reshape(-1, size + 1),
+            np.broadcast_to(self.protect_price[:, None, :], best.shape).reshape(-1, 1),
+        ).reshape(value.shape)
+
+        checked = (self.has_inputs[:, None, :] & np.isfinite(self.total_cost)
+                   & (np.array(self.targets) >= 2)[None, :, None])
+        failed = checked & np.any(improved != protect, axis=3)
+
+        self.policies = {}
+        for i, m in sorted({(i, m) for i, _, m in np.argwhere(failed).tolist()}):
+            targets = np.flatnonzero(failed[i, :, m]).tolist()
+            results = calc._optimize_protection([self.targets[t] for t in targets], self.inputs[i][m])
+            for t, result in zip(targets, results):
+                cell = (i, t, m)
+                self.protect_at[cell] = result['protect_at']
+                self.policies[cell] = result['protect_levels']
+                for name in ('total_cost', 'mat_cost', 'actions', 'protect_count', 'total_xp'):
+                    getattr(self, name)[cell] = result[name]
+
+    def for_profile(self, calc):
+        """Evaluate the same items, targets and modes for another profile calculator.
+
+        calc should come from with_profile() on this matrix's calculator.
+        Market prices are reused unless the artisan tea multiplier differs,
+        since that changes craft costs. Only chains and the array evaluation
+        are redone.
+        """
+        other = ProfitMatrix.__new__(ProfitMatrix)
+        other.calc = calc
+        other.market_data = self.market_data
+        other.items = self.items
+        other.targets = self.targets
+        other.modes = self.modes
+        other._details = {}
+        other._rows = {}
+
+        if calc.get_artisan_tea_multiplier() == self.calc.get_artisan_tea_multiplier():
+            for name in ('inputs', 'item_levels', 'has_inputs', 'base_price', 'mat_per_attempt',
+                         'coin_cost', 'protect_price', 'sell_price'):
+                setattr(other, name, getattr(self, name))
+        else:
+            with phase(calc.stats, 'matrix.load_prices'):
+                other._load_prices()
+
+        with phase(calc.stats, 'matrix.load_chains'):
+            other._load_chains()
+        with phase(calc.stats, 'matrix.evaluate'):
+            other._evaluate()
+        return other
+
+    def to_state(self):
+        """Get the price inputs and their market snapshot as a JSON-serializable dict.
+
+        Chains and the array evaluation are not saved; from_state() redoes
+        them, so the state stays valid across gear changes that keep the
+        artisan tea multiplier (which changes craft costs).
+        """
+        calc = self.calc
+        return {
+            'format': STATE_FORMAT,
+            'game_version': calc.game_version,
+            'artisan': calc.get_artisan_tea_multiplier(),
+            'items': self.items,
+            'targets': self.targets,
+            'modes': [mode.value for mode in self.modes],
+            'market': calc.get_snapshot(self.market_data).to_dict(),
+            'inputs': self.inputs,
+            'arrays': {name: getattr(self, name).tolist() for name in PRICE_ARRAYS},
+        }
+
+    @classmethod
+    def from_state(cls, calc, state, market_data, target_levels=[8, 10, 12, 14], modes=MODES):
+        """Rebuild a matrix from to_state() and bring it up to market_data.
+
+        Like refresh(), only items whose prices changed since the saved
+        snapshot get fresh price inputs; chains and the array evaluation are
+        redone. Returns None if the state was saved for another format, game
+        version, artisan tea multiplier, item list, targets or modes.
+        """
+        items = [item['hrid'] for item in calc.get_profit_items()]
+        if (state.get('format') != STATE_FORMAT
+                or state.get('game_version') != calc.game_version
+                or state.get('artisan') != calc.get_artisan_tea_multiplier()
+                or state.get('items') != items
+                or state.get('targets') != list(target_levels)
+                or state.get('modes') != [mode.value for mode in modes]):
+            return None
+
+        matrix = cls.__new__(cls)
+        matrix.calc = calc
+        matrix.market_data = MarketSnapshot(state['market'])
+        matrix.items = items
+        matrix.targets = list(target_levels)
+        matrix.modes = list(modes)
+        matrix._details = {}
+        matrix._rows = {}
+
+        matrix.inputs = [
+            [inputs and {**inputs, 'mat_prices': [tuple(price) for price in inputs['mat_prices']]}
+             for inputs in row]
+            for row in state['inputs']
+        ]
+        for name in PRICE_ARRAYS:
+            setattr(matrix, name, np.array(state['arrays'][name]))
+        matrix.has_inputs = matrix.has_inputs.astype(bool)
+        matrix.item_levels = matrix.item_levels.astype(int)
+
+        matrix._update_prices(market_data)
+        with phase(calc.stats, 'matrix.load_chains'):
+            matrix._load_chains()
+        with phase(calc.stats, 'matrix.evaluate'):
+            matrix._evaluate()
+        return matrix
+
+    def refresh(self, market_data, changed_keys=None):
+        """Move to a new market snapshot, recomputing only affected items.
+
+        changed_keys are 'hrid:level' keys whose bid or ask changed (see
+        generate_prices.update_history / diff_market); by default they are
+        diffed from the old and new MarketSnapshot. Items depending on them
+        through the calculator's reverse dependency index get fresh prices;
+        all other rows, including already materialized ones, are kept.
+        The array evaluation is redone for the whole cube, which is cheap.
+
+        Returns the set of recomputed item hrids.
+        """
+        # Price arrays may be shared with matrices derived via for_profile
+        self.inputs = [list(row) for row in self.inputs]
+        for name in ('has_inputs', 'base_price', 'mat_per_attempt', 'coin_cost', 'protect_price', 'sell_price'):
+            setattr(self, name, getattr(self, name).copy())
+
+        indices = self._update_prices(market_data, changed_keys)
+        with phase(self.calc.stats, 'matrix.evaluate'):
+            self._evaluate()
+
+        stale = set(indices)
+        self._details = {key: detail for key, detail in self._details.items() if key[0] not in stale}
+        self._rows = {key: row for key, row in self._rows.items() if key[0] not in stale}
+
+        return {self.items[i] for i in indices}
+
+    def _update_prices(self, market_data, changed_keys=None):
+        """Move the price arrays to market_data, reloading only affected items; returns their indices."""
+        if changed_keys is None:
+            old = self.calc.get_snapshot(self.market_data)
+            changed_keys = old.diff(self.calc.get_snapshot(market_data))
+        affected = self.calc.get_affected_items(changed_keys)
+        indices = [i for i, hrid in enumerate(self.items) if hrid in affected]
+
+        self.market_data = market_data
+        with phase(self.calc.stats, 'matrix.load_prices'):
+            for i in indices:
+                self._load_item_prices(i)
+        return indices
+
+    def mode_index(self, mode):
+        """Get the mode axis index for a PriceMode or its string value."""
+        for m, candidate in enumerate(self.modes):
+            if candidate == mode or candidate.value == mode:
+                return m
+        raise KeyError(mode)
+
+    def _get_detail(self, i, m):
+        """Material and craft breakdown for an item/mode, shared by all its targets."""
+        key = (i, m)
+        if key not in self._details:
+            self._details[key] = self.calc.get_enhancement_detail(
+                self.items[i], self.inputs[i][m], self.market_data, self.modes[m]
+            )
+        return self._details[key]
+
+    def row(self, i, t, m):
+        """Materialize one cell as a ProfitResult (cached until refresh)."""
+        key = (i, t, m)
+        if key not in self._rows:
+            self._rows[key] = self._build_row(i, t, m)
+        return self._rows[key]
+
+    def _build_row(self, i, t, m):
+        hrid = self.items[i]
+        cell = (i, t, m)
+        metrics = [float(values[cell]) for values in (
+            self.mat_cost, self.total_cost, self.sell_price, self.market_fee,
+            self.profit, self.profit_after_fee, self.roi, self.roi_after_fee,
+            self.profit_per_day, self.profit_per_day_after_fee, self.xp_per_day,
+            self.total_xp, self.actions, self.time_hours, self.time_days,
+            self.protect_count,
+        )]
+        metrics.append(int(self.protect_at[cell]))
+        metrics.append(self.policies.get(cell) or list(range(metrics[-1], self.targets[t])))
+
+        return ProfitResult(
+            hrid,
+            self.calc.item_detail_map.get(hrid, {}).get('name', hrid),
+            self.targets[t],
+            self.modes[m].value,
+            self.inputs[i][m],
+            functools.partial(self._get_detail, i, m),
+            metrics,
+            functools.partial(self.calc._get_result_spread, self.inputs[i][m], self.targets[t], metrics[-1]),
+        )
+
+    def select(self, mode, sort_by='profit', top_k=None, min_profit=None, max_roi=None,
+               cost_range=None, target_levels=None, mask=None):
+        """Materialize the best valid rows for one mode, highest sort_by first.
+
+        Filters match EnhancementCalculator.get_all_profits (profit >
+        min_profit, roi < max_roi, low <= total_cost < high for cost_range),
+        plus target_levels and an optional (item, target) boolean mask. They
+        are applied to the arrays, so only the top_k surviving rows are ever
+        built. Ties keep item/target order.
+        """
+        m = self.mode_index(mode)
+        keep = self.valid[:, :, m]
+        if mask is not None:
+            keep = keep & mask
+        if target_levels is not None:
+            keep = keep & np.isin(self.targets, list(target_levels))[None, :]
+        if min_profit is not None:
+            keep = keep & (self.profit[:, :, m] > min_profit)
+        if max_roi is not None:
+            keep = keep & (self.roi[:, :, m] < max_roi)
+        if cost_range is not None:
+            low, high = cost_range
+            if low is not None:
+                keep = keep & (self.total_cost[:, :, m] >= low)
+            if high is not None:
+                keep = keep & (self.total_cost[:, :, m] < high)
+
+        cells = np.argwhere(keep)
+        values = getattr(self, sort_by)[cells[:, 0], cells[:, 1], m]
+        order = np.argsort(-values, kind='stable')[:top_k]
+        return [self.row(int(i), int(t), m) for i, t in cells[order]]
+
+    def to_rows(self, mode, mask=None):
+        """Materialize valid rows for one mode, sorted by profit (highest first).
+
+        mask is an optional (item, target) boolean array; only rows where it is
+        True are built. Ties keep item/target order, like get_all_profits.
+        """
+        return self.select(mode, mask=mask)
+
+    def to_modes(self, max_roi=None):
+        """Materialize rows for every mode, keyed by mode value.
+
+        With max_roi, rows with roi >= max_roi are dropped before any row is built.
+        """
+        modes = {}
+        for m, mode in enumerate(self.modes):
+            mask = None
+            if max_roi is not None:
+                mask = self.roi[:, :, m] < max_roi
+            modes[mode.value] = self.to_rows(mode, mask)
+        return modes
+
+
+def evaluate_profiles(calc, market_data, profiles, target_levels=[8, 10, 12, 14], modes=MODES):
+    """Evaluate several gear profiles against one market snapshot.
+
+    profiles maps a name to a GearProfile or config dict. Every profile runs
+    on a with_profile() copy of calc, so crafting costs, price lookups and
+    chain solutions are resolved once and shared.
+
+    Returns {name: (profile calculator, ProfitMatrix)} in input order.
+    """
+    results = {}
+    base = None
+    for name, profile in profiles.items():
+        profile_calc = calc.with_profile(profile)
+        if base is None:
+            base = ProfitMatrix(profile_calc, market_data, target_levels, modes)
+            results[name] = (profile_calc, base)
+        else:
+            results[name] = (profile_calc, base.for_profile(profile_calc))
+    return results
@@ -224,6 +224,98 @@ def simulate_with_blessed(start_level, target_level, prot_level, success_rate=0.
     return drops, protections_used, blessed_procs
 
 
+def simulate_enhancement_batch(start_level, target_level, prot_level, success_rate=0.35, blessed_chance=0.0,
+                               runs=10000, batch_size=100000, seed=None):
+    """
+    Simulate many independent enhancement runs at once with numpy.
+    
+    Same mechanics as simulate_with_blessed (simulate_enhancement_v2 when
+    blessed_chance is 0): success moves +1, or +2 with blessed_chance if that
+    does not pass the target; failure at L >= prot drops to L-1 (protected),
+    below prot resets to 0. success_rate is one rate for every level or a
+    sequence indexed by level (e.g. SUCCESS_RATE / 100 * total_bonus).
+    
+    Runs advance together, one attempt per step for every unfinished run.
+    Each step is one uniform roll per run and table lookups by level, with
+    the target as an absorbing level that finished runs sit on until the
+    batch is compacted. runs are
+    processed in chunks of batch_size to bound memory.
+    
+    Returns a dict of arrays, one row per run:
+      drops        (runs, target_level + 1) attempts at each level, with
+                   drops[:, target_level] = 1 like the single-run simulators
+      protections  (runs,) protections used
+      blessed      (runs,) blessed procs
+      actions      (runs,) total attempts
+    """
+    import numpy as np
+    
+    rng = np.random.default_rng(seed)
+    size = target_level + 1
+    levels = np.arange(size)
+    
+    # Per-level roll thresholds; the target level always "succeeds" onto itself
+    rates = np.asarray(success_rate, dtype=float)
+    if rates.ndim == 0:
+        rates = np.full(target_level, float(rates))
+    success_at = np.append(rates[:target_level], 2.0)
+    blessed_at = np.where(levels + 2 <= target_level, success_at * blessed_chance, 0.0)
+    protected_at = (levels >= prot_level) & (levels < target_level)
+    
+    # Transition tables indexed by level * 3 + outcome (0 blessed, 1 success, 2 fail).
+    # Protections and blessed procs are packed into one counter (blessed << 32).
+    next_level = np.stack([
+        np.minimum(levels + 2, target_level),
+        np.minimum(levels + 1, target_level),
+        np.where(protected_at, np.maximum(levels - 1, 0), 0),
+    ], axis=1).ravel()
+    counted = np.stack([
+        np.full(size, 1 << 32),
+        np.zeros(size, dtype=np.int64),
+        protected_at.astype(np.int64),
+    ], axis=1).ravel()
+    
+    drops = np.zeros((runs, size), dtype=np.int64)
+    protections = np.zeros(runs, dtype=np.int64)
+    blessed = np.zeros(runs, dtype=np.int64)
+    flat_drops = drops.reshape(-1)
+    roll = np.empty(min(batch_size, runs))
+    
+    for first in range(0, runs, batch_size):
+        active = np.arange(first, min(first + batch_size, runs))
+        offset = active * size
+        level = np.full(len(active), start_level, dtype=np.intp)
+        counters = np.zeros(len(active), dtype=np.int64)
+        
+        step = 0
+        while len(active):
+            flat_drops[offset + level] += 1
+            
+            # One roll decides blessed / success / fail
+            rolled = rng.random(out=roll[:len(active)])
+            transition = level * 3 + (rolled >= blessed_at[level]) + (rolled >= success_at[level])
+            level = next_level[transition]
+            counters += counted[transition]
+            
+            # Compact finished runs every few steps rather than every step
+            step += 1
+            if step % 32 == 0 or len(active) < 64:
+                done = level == target_level
+                if done.any():
+                    protections[active[done]] = counters[done] & 0xFFFFFFFF
+                    blessed[active[done]] = counters[done] >> 32
+                    keep = ~done
+                    active, offset, level, counters = active[keep], offset[keep], level[keep], counters[keep]
+    
+    # Steps spent parked on the target were counted there; the target is reached once
+    drops[:, target_level] = 1
+    return {
+        'drops': drops,
+        'protections': protections,
+        'blessed': blessed,
+        'actions': drops[:, :target_level].sum(axis=1),
+    }
+
 def main():
     import random
     random.seed(42)
@@ -275,6 +367,23 @@ def main():
     
     test_case("Blessed: Start at prot", 10, 14, 10, use_blessed=True)
     test_case("Blessed: Start above prot", 10, 14, 8, use_blessed=True)
+    
+    # Validate the estimator over many runs at once
+    runs = 2000
+    print("\n" + "=" * 60)
+    print(f"BATCH VALIDATION ({runs} runs per case)")
+    print("=" * 60)
+    
+    for start, target, prot, blessed_chance in [(0, 8, 5, 0), (6, 10, 5, 0), (6, 10, 5, 0.01)]:
+        batch = simulate_enhancement_batch(start, target, prot, blessed_chance=blessed_chance, runs=runs, seed=42)
+        matches = 0
+        for row, actual in zip(batch['drops'], batch['protections']):
+            drops = {level: int(count) for level, count in enumerate(row) if count}
+            result = calculate_protection_v2(drops, prot, blessed_chance=blessed_chance)
+            matches += result['protect_count'] == actual
+        print(f"Start +{start}, Target +{target}, Prot +{prot}, blessed {blessed_chance:.0%}: "
+              f"{matches}/{runs} exact, mean {batch['actions'].mean():.1f} actions, "
+              f"{batch['protections'].mean():.1f} protections")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,169 @@
+"""
+Price-shock sensitivity of profit results.
+
+With the chain quantities of a result fixed (expected actions and
+protections at its protect_at), total cost is linear in the input prices:
+
+  total_cost = base_price
+             + actions * (sum(count * material price) + coin_cost)
+             + protect_count * protect_price
+
+So each result has a constant exposure to every input item: d total_cost /
+d price, in items consumed per job (the base item counts 1, plus
+protect_count when it is its own protection; coins count actions *
+coin_cost at a price of 1). PriceSensitivity stacks these into a (results,
+items) matrix. Gradients, break-even prices and any number of "what if
+these prices move" scenarios are then array operations, with no chain
+solves.
+
+Scenarios hold protect_at fixed. Re-optimizing protection can only lower
+cost, so a scenario's profit is exact for small moves and a lower bound for
+large ones. A shock moves the price an item is used at (market, craft or
+vendor). It does not flow into crafted items that use the item as an input.
+"""
+
+import numpy as np
+from enhance_calc import MARKET_FEE
+
+# Scenario key for a relative move of every sell price
+SELL = 'sell'
+
+COIN = '/items/coin'
+
+
+class PriceSensitivity:
+    """Linear price sensitivity of a list of ProfitResults.
+
+    results are calculate_profit / get_all_profits results (they carry
+    their priced inputs). Arrays are aligned with results:
+
+      exposure    (results, items) d total_cost / d unit price of hrids[j]
+      spend       (results, items) coins spent on each input, exposure * price
+      total_cost, sell_price, profit, mat_cost  (results,)
+    """
+    __slots__ = ('results', 'hrids', 'ids', 'exposure', 'spend', 'total_cost', 'sell_price', 'profit',
+                 'mat_cost')
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.ids = {}
+        entries = []
+        for r, result in enumerate(self.results):
+            inputs = result.inputs
+            actions = result.actions
+            entries.append((r, result.item_hrid, 1.0, inputs['base_price']))
+            for hrid, (count, price) in zip(inputs['mat_hrids'], inputs['mat_prices']):
+                entries.append((r, hrid, actions * count, price))
+            if inputs['coin_cost']:
+                entries.append((r, COIN, actions * inputs['coin_cost'], 1.0))
+            entries.append((r, inputs['protect_hrid'], result.protect_count, inputs['protect_price']))
+        for _, hrid, _, _ in entries:
+            self.ids.setdefault(hrid, len(self.ids))
+        self.hrids = list(self.ids)
+
+        self.exposure = np.zeros((len(self.results), len(self.hrids)))
+        self.spend = np.zeros_like(self.exposure)
+        for r, hrid, amount, price in entries:
+            j = self.ids[hrid]
+            self.exposure[r, j] += amount
+            self.spend[r, j] += amount * price
+
+        self.total_cost = np.array([result.total_cost for result in self.results], dtype=float)
+        self.sell_price = np.array([result.sell_price for result in self.results], dtype=float)
+        self.profit = self.sell_price - self.total_cost
+        self.mat_cost = np.array([result.mat_cost for result in self.results], dtype=float)
+
+    def gradient(self, hrid):
+        """Get d profit / d unit price of hrid for every result (0 where unused)."""
+        j = self.ids.get(hrid)
+        if j is None:
+            return np.zeros(len(self.results))
+        return -self.exposure[:, j]
+
+    def break_even_price(self, hrid):
+        """Get the unit price of hrid at which each result's profit is 0 (NaN where unused)."""
+        j = self.ids.get(hrid)
+        if j is None:
+            return np.full(len(self.results), np.nan)
+        exposure = self.exposure[:, j]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            price = self.spend[:, j] / exposure
+            return np.where(exposure > 0, price + self.profit / exposure, np.nan)
+
+    def break_even_sell_price(self, after_fee=False):
+        """Get the sell price at which each result's profit (or profit_after_fee) is 0."""
+        return self.total_cost / (1 - MARKET_FEE) if after_fee else self.total_cost.copy()
+
+    def break_even_mat_cost(self):
+        """Get the mat_cost (enhancing spend) at which each result's profit is 0."""
+        return self.mat_cost + self.profit
+
+    def shock_matrix(self, scenarios):
+        """Get (input shocks, sell shocks) arrays for scenarios.
+
+        Each scenario maps hrids to relative price moves (0.2 is +20%), and
+        SELL to a relative move of every sell price. Hrids no result uses
+        are ignored.
+        """
+        shocks = np.zeros((len(scenarios), len(self.hrids)))
+        sell = np.zeros(len(scenarios))
+        for s, scenario in enumerate(scenarios):
+            for hrid, move in scenario.items():
+                if hrid == SELL:
+                    sell[s] = move
+                elif hrid in self.ids:
+                    shocks[s, self.ids[hrid]] = move
+        return shocks, sell
+
+    def evaluate(self, scenarios):
+        """Evaluate every result under every scenario (see shock_matrix).
+
+        Returns {field: (scenarios, results) array} for total_cost,
+        sell_price, profit, profit_after_fee and roi.
+        """
+        shocks, sell = self.shock_matrix(scenarios)
+        total_cost = self.total_cost + shocks @ self.spend.T
+        sell_price = self.sell_price * (1 + sell[:, None])
+        profit = sell_price - total_cost
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roi = np.where(total_cost > 0, profit / total_cost * 100, 0.0)
+        return {
+            'total_cost': total_cost,
+            'sell_price': sell_price,
+            'profit': profit,
+            'profit_after_fee': profit - sell_price * MARKET_FEE,
+            'roi': roi,
+        }
+
+    def report(self):
+        """Get one dict per result with its price sensitivities.
+
+        gradients maps each input hrid to d profit / d unit price and
+        break_even to the unit price that zeroes profit. shares is each
+        input's fraction of total cost.
+        """
+        break_even_sell = self.break_even_sell_price()
+        break_even_sell_after_fee = self.break_even_sell_price(after_fee=True)
+        break_even_mat_cost = self.break_even_mat_cost()
+        rows = []
+        for r, result in enumerate(self.results):
+            used = np.flatnonzero(self.exposure[r]).tolist()
+            exposure = self.exposure[r, used]
+            price = self.spend[r, used] / exposure
+            hrids = [self.hrids[j] for j in used]
+            rows.append({
+                'item_hrid': result.item_hrid,
+                'item_name': result.item_name,
+                'target_level': result.target_level,
+                'mode': result.mode,
+                'profit': float(self.profit[r]),
+                'total_cost': float(self.total_cost[r]),
+                'sell_price': float(self.sell_price[r]),
+                'break_even_sell_price': float(break_even_sell[r]),
+                'break_even_sell_price_after_fee': float(break_even_sell_after_fee[r]),
+                'break_even_mat_cost': float(break_even_mat_cost[r]),
+                'gradients': dict(zip(hrids, (-exposure).tolist())),
+                'break_even': dict(zip(hrids, (price + self.profit[r] / exposure).tolist())),
+                'shares': dict(zip(hrids, (self.spend[r, used] / self.total_cost[r]).tolist())),
+            })
+        return rows
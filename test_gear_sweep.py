@@ -0,0 +1,48 @@
+"""Tests for gear_sweep variants and the chain caches a sweep fills."""
+
+import json
+from pathlib import Path
+
+from enhance_calc import START_TABLE_CACHE_SIZE, USER_CONFIG, EnhancementCalculator
+from gear_sweep import TEA_TIERS, grid_variants, upgrade_variants
+from market_snapshot import MarketSnapshot
+from profit_matrix import ProfitMatrix
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+
+def active_tea(config):
+    return [tier for tier in TEA_TIERS if config.get(tier)]
+
+
+def test_ultra_tea_compares_every_other_tier():
+    config = {**USER_CONFIG, 'tea_enhancing': False, 'tea_super_enhancing': False, 'tea_ultra_enhancing': True}
+    variants = upgrade_variants(config)
+
+    assert active_tea(variants['ultra -> super tea']) == ['tea_super_enhancing']
+    assert active_tea(variants['ultra -> enhancing tea']) == ['tea_enhancing']
+    assert active_tea(variants['ultra -> no tea']) == []
+    assert not any(name.endswith('-> ultra tea') for name in variants)
+
+
+def test_no_tea_compares_every_tier():
+    config = {**USER_CONFIG, **{tier: False for tier in TEA_TIERS}}
+    variants = upgrade_variants(config)
+
+    for tier, name in zip(TEA_TIERS, ['enhancing', 'super', 'ultra']):
+        assert active_tea(variants[f"no -> {name} tea"]) == [tier]
+
+
+def test_sweep_keeps_start_tables_bounded():
+    calc = EnhancementCalculator(str(FIXTURES / 'init_client_info.json'))
+    with open(FIXTURES / 'marketplace.json', encoding='utf-8') as f:
+        market = MarketSnapshot(json.load(f))
+    base = ProfitMatrix(calc, market, target_levels=[10])
+    variants = grid_variants(USER_CONFIG, {'enhancer_level': range(8, 20), 'observatory_level': [6, 7, 8]})
+
+    for config in variants.values():
+        base.for_profile(calc.with_profile(config))
+
+    assert len(calc._start_tables) <= START_TABLE_CACHE_SIZE
+    # Evicted tables are rebuilt on demand
+    assert base.for_profile(calc).total_cost.tolist() == ProfitMatrix(calc, market, target_levels=[10]).total_cost.tolist()
@@ -0,0 +1,42 @@
+"""Tests for the prices.js acquisition table in generate_prices.py."""
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import generate_prices
+from market_snapshot import MarketSnapshot
+
+ROOT = Path(__file__).parent
+MARKET_FIXTURE = ROOT / 'fixtures' / 'marketplace.json'
+
+
+def load_market():
+    with open(MARKET_FIXTURE, encoding='utf-8') as f:
+        return MarketSnapshot(json.load(f))
+
+
+def test_acquisition_game_data_is_tracked():
+    if shutil.which('git') is None or not (ROOT / '.git').exists():
+        pytest.skip("not a git checkout")
+    name = generate_prices.GAME_DATA_FILE.relative_to(ROOT).as_posix()
+    tracked = subprocess.run(['git', 'ls-files', '--error-unmatch', name], cwd=ROOT, capture_output=True)
+    assert tracked.returncode == 0, f"{name} is not tracked, so a clean checkout has no acquisition table"
+
+
+def test_prices_js_contains_acquisition_table():
+    market = load_market()
+    acquisition = generate_prices.build_acquisition(market)
+    assert acquisition is not None
+
+    prices_js = generate_prices.build_prices_js(market, {}, market.timestamp, acquisition)
+    prices = json.loads(prices_js[len('window.PRICES = '):-1])
+
+    modes = prices['acquisition']['modes']
+    assert list(modes) == list(generate_prices.ACQUISITION_MODES)
+    rows = modes['pessimistic']
+    assert rows['/items/coin'][0] == 1
+    assert any(source == 'craft' for _, source, _ in rows.values())
@@ -0,0 +1,31 @@
+"""Tests for portfolio.optimize_portfolio."""
+
+from portfolio import MAX_GRID_CELLS, RESOLUTION, grid_capacity, grid_units, optimize_portfolio
+
+
+def small_jobs(count, budget, horizon_days):
+    """count jobs on distinct items that all fit together, each about 1/count of budget and horizon."""
+    return [
+        {'item_hrid': f'/items/job_{i}', 'target_level': 10, 'profit': 1.0,
+         'total_cost': budget / count * 0.99, 'time_days': horizon_days / count * 0.99}
+        for i in range(count)
+    ]
+
+
+def test_many_small_jobs_fill_the_budget():
+    budget, horizon_days = 1e9, 1.0
+    # At RESOLUTION steps each job would round up to 2 units, fitting only 100
+    rows = small_jobs(150, budget, horizon_days)
+
+    plan = optimize_portfolio(rows, budget, horizon_days)
+
+    assert len(plan['jobs']) == len(rows)
+    assert plan['total_cost'] <= budget
+    assert plan['total_days'] <= horizon_days
+
+
+def test_grid_is_capped():
+    time_unit, coin_unit = grid_units([1e-6], [1.0], 1.0, 1e9)
+    time_steps, coin_steps = grid_capacity(1.0, time_unit), grid_capacity(1e9, coin_unit)
+    assert (time_steps + 1) * (coin_steps + 1) <= MAX_GRID_CELLS
+    assert min(time_steps, coin_steps) >= RESOLUTION
@@ -0,0 +1,53 @@
+"""Tests for carrying ProfitMatrix price inputs between runs (to_state / from_state)."""
+
+import copy
+import json
+from pathlib import Path
+
+import numpy as np
+
+from enhance_calc import USER_CONFIG, EnhancementCalculator
+from market_snapshot import MarketSnapshot
+from profit_matrix import ProfitMatrix
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+TARGETS = [8, 10, 12, 14]
+
+
+def load_calc():
+    return EnhancementCalculator(str(FIXTURES / 'init_client_info.json'))
+
+
+def load_markets():
+    with open(FIXTURES / 'marketplace.json', encoding='utf-8') as f:
+        before = json.load(f)
+    after = copy.deepcopy(before)
+    after['timestamp'] += 1800
+    for levels in list(after['marketData'].values())[::25]:
+        for prices in levels.values():
+            if prices.get('a', -1) > 0:
+                prices['a'] = prices['a'] * 11 // 10
+    return MarketSnapshot(before), MarketSnapshot(after)
+
+
+def test_saved_state_refreshes_to_a_full_evaluation():
+    before, after = load_markets()
+    state = json.loads(json.dumps(ProfitMatrix(load_calc(), before, TARGETS).to_state()))
+
+    restored = ProfitMatrix.from_state(load_calc(), state, after, TARGETS)
+    full = ProfitMatrix(load_calc(), after, TARGETS)
+
+    for name in ('total_cost', 'profit', 'protect_at', 'xp_per_day', 'valid'):
+        assert np.array_equal(getattr(restored, name), getattr(full, name)), name
+    restored_rows = restored.to_modes(max_roi=1000)
+    full_rows = full.to_modes(max_roi=1000)
+    for mode, rows in full_rows.items():
+        assert [row.to_dict() for row in restored_rows[mode]] == [row.to_dict() for row in rows]
+
+
+def test_saved_state_is_rejected_for_other_craft_costs():
+    before, after = load_markets()
+    state = ProfitMatrix(load_calc(), before, TARGETS).to_state()
+
+    calc = load_calc().with_profile({**USER_CONFIG, 'artisan_tea': not USER_CONFIG['artisan_tea']})
+    assert ProfitMatrix.from_state(calc, state, after, TARGETS) is None